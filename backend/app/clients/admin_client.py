@@ -1,16 +1,29 @@
 # backend/app/clients/admin_client.py
 from __future__ import annotations
 import os
-from typing import List, Dict, Any, Optional
+from datetime import date
+from typing import List, Dict, Any, Iterator, Optional
 import httpx
 
 API_BASE = os.getenv("API_BASE_FOR_ETL", os.getenv("API_BASE", "http://api:8000"))
 
-def list_companies(limit: int = 100000) -> List[Dict[str, Any]]:
+def iter_companies(page_size: int = 1000, q: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """逐頁（keyset：after=上一頁最後一個 ticker）取回全部公司，邊取邊產出。"""
+    params: Dict[str, Any] = {"limit": page_size}
+    if q:
+        params["q"] = q
     with httpx.Client(timeout=20) as c:
-        r = c.get(f"{API_BASE}/api/admin/companies", params={"limit": limit})
-        r.raise_for_status()
-        return r.json()
+        while True:
+            r = c.get(f"{API_BASE}/api/admin/companies", params=params)
+            r.raise_for_status()
+            page = r.json()
+            yield from page
+            if len(page) < page_size:
+                return
+            params["after"] = page[-1]["ticker"]
+
+def list_companies() -> List[Dict[str, Any]]:
+    return list(iter_companies())
 
 def bulk_upsert_companies(items: List[Dict[str, Any]]) -> None:
     with httpx.Client(timeout=30) as c:
@@ -22,6 +35,35 @@ def bulk_upsert_prices(items: List[Dict[str, Any]]) -> None:
         r = c.post(f"{API_BASE}/api/admin/prices/bulk", json=items)
         r.raise_for_status()
 
+def price_gaps(start: date, end: date, tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """[{ticker, month: "YYYY-MM", days: [...]}]：交易日曆上 daily_price 缺的日子，依 (ticker, 月份) 彙整。"""
+    params = {"from": start.isoformat(), "to": end.isoformat()}
+    if tickers:
+        params["tickers"] = ",".join(tickers)
+    with httpx.Client(timeout=120) as c:
+        r = c.get(f"{API_BASE}/api/admin/prices/gaps", params=params)
+        r.raise_for_status()
+        return r.json()
+
+def trading_days(start: date, end: date) -> List[date]:
+    with httpx.Client(timeout=20) as c:
+        r = c.get(f"{API_BASE}/api/admin/calendar/trading_days", params={"from": start.isoformat(), "to": end.isoformat()})
+        r.raise_for_status()
+        return [date.fromisoformat(d) for d in r.json()["trading_days"]]
+
+def expected_latest_trade_date() -> date:
+    with httpx.Client(timeout=20) as c:
+        r = c.get(f"{API_BASE}/api/admin/calendar/expected_latest")
+        r.raise_for_status()
+        return date.fromisoformat(r.json()["expected_latest_trade_date"])
+
+def refresh_calendar(start: Optional[date] = None, end: Optional[date] = None) -> int:
+    params = {k: v.isoformat() for k, v in (("from", start), ("to", end)) if v is not None}
+    with httpx.Client(timeout=60) as c:
+        r = c.post(f"{API_BASE}/api/admin/calendar/refresh", params=params)
+        r.raise_for_status()
+        return int(r.json()["learned"])
+
 def ensure_schema_via_api() -> None:
     with httpx.Client(timeout=30) as c:
         r = c.post(f"{API_BASE}/api/admin/ensure_schema")
@@ -16,6 +16,49 @@ class Settings(BaseSettings):
     MARKET_CLOSE_HHMM: str = "17:05"        # 對應 .env 的 MARKET_CLOSE_HHMM
     API_BASE_FOR_ETL: str | None = None     # 若用「透過 API 回補」會用到
 
+    # 🔹 TWSE 抓取：併發 / 限速（token bucket）/ 重試
+    TWSE_CONCURRENCY: int = 4
+    TWSE_RATE_PER_SEC: float = 2.0
+    TWSE_BURST: int = 4
+    TWSE_RETRIES: int = 3
+    TWSE_MONTH_CACHE_TTL_SEC: float = 600.0   # 當月資料；已結束的月份快取 7 天
+    TWSE_MONTH_CACHE_MAXSIZE: int = 20000
+
+    # 🔹 可續跑回補（scripts/backfill_jobs.py）：yfinance 來源的併發 / 限速、單位最多嘗試次數
+    YF_CONCURRENCY: int = 2
+    YF_RATE_PER_SEC: float = 1.0
+    BACKFILL_MAX_ATTEMPTS: int = 5
+
+    # 🔹 連線池：async engine 給 API 路由（DB_*）；同步 engine 給批次工作（BATCH_DB_*：腳本、回補規劃、
+    #    指標重建、ensure_schema、日曆學習），查詢本來就長，預設不設 statement_timeout、池子小
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 30
+    DB_POOL_TIMEOUT_SEC: float = 10.0
+    DB_POOL_RECYCLE_SEC: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 15000    # 0 = 不限制
+    BATCH_DB_POOL_SIZE: int = 2
+    BATCH_DB_MAX_OVERFLOW: int = 3
+    BATCH_STATEMENT_TIMEOUT_MS: int = 0     # 0 = 不限制
+    EXPORT_STATEMENT_TIMEOUT_MS: int = 0    # /api/export 的 COPY 串流；0 = 不限制
+
+    # 🔹 daily_price 年度分區（新建表時才生效；既有一般表用 scripts/partition_daily_price.py 轉換）
+    DAILY_PRICE_PARTITIONED: bool = True
+    PRICE_PARTITION_FIRST_YEAR: int = 2000  # 更早的日期落在 DEFAULT 分區，下次 ensure_schema 會補建該年分區
+    PRICE_PARTITIONS_AHEAD: int = 1         # 預先建到今年 + N 年
+
+    # 🔹 行程內快取（ticker→id、最新價/最新日期）
+    CACHE_TTL_SEC: float = 30.0
+    CACHE_MAXSIZE: int = 10000
+    SEARCH_INDEX_TTL_SEC: float = 600.0     # /api/search 的記憶體索引；本行程寫入會立即失效，TTL 接住其他行程的寫入
+
+    # 🔹 公開單檔讀取端點的 ETag / Cache-Control（app/http_cache.py）
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_ETAG_SALT: str = "1"         # 修正舊日期的價格後換一個值，讓所有 ETag 失效
+
+    # 🔹 最新價推播（/api/stocks/{ticker}/price/stream，SSE）
+    PRICE_STREAM_HEARTBEAT_SEC: float = 15.0  # 閒置時送註解行，避免 proxy 斷線
+    PRICE_NOTIFY_ENABLED: bool = True         # 價格寫入送 NOTIFY price_updated；API 端 LISTEN 後失效快取 / 推播
+
     # 設定：讀取 .env，忽略未宣告欄位；環境變數大小寫不敏感
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -1,5 +1,32 @@
 # path: backend/app/db.py
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from .config import settings
 
-engine = create_engine(settings.DATABASE_URL, future=True)
+def _connect_args(statement_timeout_ms: int) -> dict:
+    # statement_timeout 以 libpq options 帶入，psycopg2 / psycopg 皆適用
+    if statement_timeout_ms > 0:
+        return {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return {}
+
+def _pool_kwargs(pool_size: int, max_overflow: int, statement_timeout_ms: int) -> dict:
+    return dict(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SEC,
+        pool_recycle=settings.DB_POOL_RECYCLE_SEC,
+        pool_pre_ping=True,
+        connect_args=_connect_args(statement_timeout_ms),
+    )
+
+def _async_url(url: str) -> str:
+    # compose 可能給 postgresql+psycopg2://...；async 一律改用 psycopg（v3）的 async 驅動
+    return make_url(url).set(drivername="postgresql+psycopg").render_as_string(hide_password=False)
+
+# 同步 engine：批次工作（跨多年的回補規劃、指標重建、建表），不套 API 的短 timeout，池子小
+engine = create_engine(settings.DATABASE_URL, future=True, **_pool_kwargs(
+    settings.BATCH_DB_POOL_SIZE, settings.BATCH_DB_MAX_OVERFLOW, settings.BATCH_STATEMENT_TIMEOUT_MS))
+# async engine：API 路由，短 timeout 擋住失控查詢
+async_engine = create_async_engine(_async_url(settings.DATABASE_URL), **_pool_kwargs(
+    settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.DB_STATEMENT_TIMEOUT_MS))
@@ -0,0 +1,308 @@
+# path: backend/app/etl/backfill_jobs.py
+# 可續跑的回補工作：把回補切成 (source, ticker, 月份) 單位存在 backfill_jobs 表。
+# worker 以 FOR UPDATE SKIP LOCKED 認領單位；日K 與「完成」標記在同一個交易寫入（checkpoint），
+# 失敗的單位退避後重試，超過次數標為 failed。中斷後重跑只會做還沒完成的單位；
+# 多個行程可同時跑同一份計畫（各自認領不同單位），藉此分散到多核心。
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import socket
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, Connection
+from app.config import settings
+from app.etl.fetcher import BAD_PAYLOAD, FetchPolicy, FetchResult, TokenBucket
+from app.etl.parsers.base import Bar
+from app.etl.parsers.twse import TwseDailyParser
+from app.services import cache, write_ops
+from app.services.trading_calendar import TRADING_DAYS_SQL
+
+log = logging.getLogger("fin-etl")
+
+@dataclass(frozen=True)
+class Unit:
+    id: int
+    ticker: str
+    month: date          # 該月 1 號
+    date_from: date      # 該月內要補的區間
+    date_to: date
+    attempts: int
+
+# 來源：一批單位 → {unit.id: FetchResult(data={date: bar})}；workers 為該來源同時進行的請求上限
+SourceFn = Callable[[List[Unit], int, float], Awaitable[Dict[int, FetchResult]]]
+
+# ----- schema -----
+
+def _ensure_jobs_tx(conn: Connection) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS backfill_jobs (
+            id           BIGSERIAL PRIMARY KEY,
+            source       TEXT NOT NULL,
+            ticker       TEXT NOT NULL,
+            month        DATE NOT NULL,
+            date_from    DATE NOT NULL,
+            date_to      DATE NOT NULL,
+            status       TEXT NOT NULL DEFAULT 'pending',
+            attempts     INTEGER NOT NULL DEFAULT 0,
+            rows_written INTEGER,
+            last_error   TEXT,
+            claimed_by   TEXT,
+            claimed_at   TIMESTAMP,
+            not_before   TIMESTAMP,
+            updated_at   TIMESTAMP DEFAULT now(),
+            UNIQUE (source, ticker, month)
+        );
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_backfill_jobs_claim
+        ON backfill_jobs (source, status, month, ticker);
+    """))
+
+def ensure_jobs_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _ensure_jobs_tx(conn)
+
+# ----- 計畫 / 狀態 -----
+
+def plan(engine: Engine, source: str, start: date, end: date,
+         tickers: Optional[Sequence[str]] = None, only_gaps: bool = True) -> int:
+    """把 [start, end] 切成 (ticker, 月份) 單位寫入 backfill_jobs；只含有交易日的月份。
+       only_gaps 時只排 daily_price 真的有缺的單位。已存在的單位：failed 或區間擴大時重設為 pending，
+       其餘（含已完成）不動，所以重複下同一個計畫是安全的。回傳新增/重設的單位數。"""
+    gap_join = "LEFT JOIN daily_price dp ON dp.company_id = c.id AND dp.trade_date = d.d" if only_gaps else ""
+    conds = ["dp.company_id IS NULL"] if only_gaps else []
+    if tickers:
+        conds.append("c.ticker = ANY(:ts)")
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    sql = f"""
+        WITH days AS ({TRADING_DAYS_SQL}), units AS (
+            SELECT c.ticker, date_trunc('month', d.d)::date AS month, MIN(d.d) AS lo, MAX(d.d) AS hi
+            FROM companies c
+            CROSS JOIN days d
+            {gap_join}
+            {where}
+            GROUP BY 1, 2
+        )
+        INSERT INTO backfill_jobs (source, ticker, month, date_from, date_to)
+        SELECT :src, ticker, month, lo, hi FROM units
+        ON CONFLICT (source, ticker, month) DO UPDATE SET
+            date_from = LEAST(backfill_jobs.date_from, EXCLUDED.date_from),
+            date_to = GREATEST(backfill_jobs.date_to, EXCLUDED.date_to),
+            status = 'pending', attempts = 0, last_error = NULL, not_before = NULL, updated_at = now()
+        WHERE backfill_jobs.status = 'failed'
+           OR (backfill_jobs.status = 'done' AND (EXCLUDED.date_from < backfill_jobs.date_from
+                                              OR EXCLUDED.date_to > backfill_jobs.date_to))
+    """
+    with engine.begin() as conn:
+        _ensure_jobs_tx(conn)
+        res = conn.execute(text(sql), {"cal_from": start, "cal_to": end, "src": source, "ts": list(tickers or [])})
+    return res.rowcount or 0
+
+def status(engine: Engine, source: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """{source: {status: 單位數}}。"""
+    with engine.begin() as conn:
+        _ensure_jobs_tx(conn)
+        rows = conn.execute(text("""
+            SELECT source, status, COUNT(*) FROM backfill_jobs
+            WHERE CAST(:src AS text) IS NULL OR source = :src
+            GROUP BY 1, 2 ORDER BY 1, 2
+        """), {"src": source}).all()
+    out: Dict[str, Dict[str, int]] = {}
+    for src, st, n in rows:
+        out.setdefault(src, {})[st] = int(n)
+    return out
+
+def retry_failed(engine: Engine, source: str) -> int:
+    with engine.begin() as conn:
+        res = conn.execute(text("""
+            UPDATE backfill_jobs
+            SET status = 'pending', attempts = 0, not_before = NULL, updated_at = now()
+            WHERE source = :src AND status = 'failed'
+        """), {"src": source})
+    return res.rowcount or 0
+
+def reclaim_stale(engine: Engine, source: str, older_than_sec: float) -> int:
+    """行程中斷留下的 running 單位（認領超過 older_than_sec 秒）放回 pending。"""
+    with engine.begin() as conn:
+        res = conn.execute(text("""
+            UPDATE backfill_jobs
+            SET status = 'pending', claimed_by = NULL, updated_at = now()
+            WHERE source = :src AND status = 'running'
+              AND claimed_at < now() - make_interval(secs => :sec)
+        """), {"src": source, "sec": float(older_than_sec)})
+    return res.rowcount or 0
+
+# ----- 認領 / 回報 -----
+
+# 認領順序：預設依月份（一批涵蓋多檔同月）；yf 一次下載一檔的整段區間，依 ticker 認領讓同一批多半是同檔的連續月份
+_CLAIM_ORDER: Dict[str, str] = {"yf": "ticker, month"}
+
+def _claim(engine: Engine, source: str, n: int, worker: str) -> List[Unit]:
+    order = _CLAIM_ORDER.get(source, "month, ticker")
+    with engine.begin() as conn:
+        rows = conn.execute(text(f"""
+            UPDATE backfill_jobs j
+            SET status = 'running', attempts = j.attempts + 1,
+                claimed_by = :w, claimed_at = now(), updated_at = now()
+            WHERE j.id IN (
+                SELECT id FROM backfill_jobs
+                WHERE source = :src AND status = 'pending'
+                  AND (not_before IS NULL OR not_before <= now())
+                ORDER BY {order}
+                LIMIT :n
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING j.id, j.ticker, j.month, j.date_from, j.date_to, j.attempts
+        """), {"src": source, "n": n, "w": worker}).all()
+    return [Unit(*r) for r in rows]
+
+def _next_retry_in(engine: Engine, source: str) -> Optional[float]:
+    """還有在退避中的 pending 單位時，回傳距離最早可重試的秒數；沒有則 None。"""
+    with engine.begin() as conn:
+        v = conn.execute(text("""
+            SELECT EXTRACT(EPOCH FROM MIN(COALESCE(not_before, now())) - now())
+            FROM backfill_jobs WHERE source = :src AND status = 'pending'
+        """), {"src": source}).scalar()
+    return None if v is None else max(0.0, float(v))
+
+def _complete(engine: Engine, ok: Dict[Unit, Dict[date, Bar]]) -> int:
+    """成功的單位：日K 與 done 標記同一個交易寫入。回傳寫入的日K 筆數。"""
+    items = [{"ticker": u.ticker, "trade_date": d.isoformat(), **bar}
+             for u, bars in ok.items() for d, bar in bars.items()]
+    merged = write_ops.merge_ohlcv(items)
+    with engine.begin() as conn:
+        ids = write_ops._upsert_ohlcv_tx(conn, merged) if merged else {}
+        conn.execute(text("""
+            UPDATE backfill_jobs j
+            SET status = 'done', rows_written = x.n, last_error = NULL, updated_at = now()
+            FROM unnest(CAST(:ids AS bigint[]), CAST(:ns AS int[])) AS x(id, n)
+            WHERE j.id = x.id
+        """), {"ids": [u.id for u in ok], "ns": [len(b) for b in ok.values()]})
+    write_ops._remember_ids(ids)
+    cache.invalidate_prices({t for t, _ in merged})
+    return len(merged)
+
+def _fail(engine: Engine, failed: Dict[Unit, str], max_attempts: int, backoff_sec: float) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE backfill_jobs j
+            SET status = CASE WHEN j.attempts >= :max THEN 'failed' ELSE 'pending' END,
+                last_error = x.err,
+                not_before = now() + make_interval(secs => LEAST(:base * power(2, j.attempts - 1), 3600)),
+                updated_at = now()
+            FROM unnest(CAST(:ids AS bigint[]), CAST(:errs AS text[])) AS x(id, err)
+            WHERE j.id = x.id
+        """), {"ids": [u.id for u in failed], "errs": list(failed.values()),
+               "max": max_attempts, "base": float(backoff_sec)})
+
+# ----- 來源 -----
+
+async def _fetch_twse(units: List[Unit], workers: int, rate_per_sec: float) -> Dict[int, FetchResult]:
+    # 一批單位共用 TwseDailyParser 的 AsyncFetcher（同一個連線池 + token bucket）
+    parser = TwseDailyParser(policy=FetchPolicy(
+        concurrency=workers,
+        rate_per_sec=rate_per_sec,
+        burst=settings.TWSE_BURST,
+        retries=settings.TWSE_RETRIES,
+        headers=dict(TwseDailyParser.HEADERS),
+    ))
+    res = await parser.fetch_months((u.ticker, u.month.year, u.month.month) for u in units)
+    return {u.id: res[(u.ticker, u.month.year, u.month.month)] for u in units}
+
+def _yf_symbol(ticker: str) -> str:
+    return ticker if any(ch.isalpha() for ch in ticker) else f"{ticker}.TW"
+
+def _yf_download(ticker: str, start: date, end: date) -> Dict[date, Bar]:
+    import yfinance as yf  # 只有 yf 來源需要
+    df = yf.download(_yf_symbol(ticker), start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(),
+                     progress=False, interval="1d", auto_adjust=False)
+    out: Dict[date, Bar] = {}
+    if df is None or df.empty:
+        return out
+    def num(v):
+        v = v.iloc[0] if hasattr(v, "iloc") else v  # 新版 yfinance 欄位為 MultiIndex
+        return None if v != v else float(v)
+    for ts, row in df.iterrows():
+        close = num(row["Close"])
+        if close is None:
+            continue
+        vol = num(row["Volume"])
+        out[ts.date()] = {"open": num(row["Open"]), "high": num(row["High"]), "low": num(row["Low"]),
+                          "close": close, "volume": None if vol is None else int(vol)}
+    return out
+
+async def _fetch_yf(units: List[Unit], workers: int, rate_per_sec: float) -> Dict[int, FetchResult]:
+    # yfinance 是同步 API：丟到 thread 執行，併發數與速率自己控。
+    # 同一檔的多個月份只下載一次（涵蓋所有單位的區間），再依單位切回各月。
+    sem = asyncio.Semaphore(workers)
+    bucket = TokenBucket(rate_per_sec, max(1, workers))
+    by_ticker: Dict[str, List[Unit]] = {}
+    for u in units:
+        by_ticker.setdefault(u.ticker, []).append(u)
+    async def one(ticker: str, us: List[Unit]) -> Dict[int, FetchResult]:
+        async with sem:
+            await bucket.acquire()
+            try:
+                bars = await asyncio.to_thread(_yf_download, ticker, min(u.date_from for u in us),
+                                               max(u.date_to for u in us))
+            except Exception as e:
+                r = FetchResult(ok=False, reason=BAD_PAYLOAD, error=repr(e), attempts=1)
+                return {u.id: r for u in us}
+        return {u.id: FetchResult(ok=True, data={d: b for d, b in bars.items() if u.date_from <= d <= u.date_to},
+                                  attempts=1) for u in us}
+    out: Dict[int, FetchResult] = {}
+    for r in await asyncio.gather(*(one(t, us) for t, us in by_ticker.items())):
+        out.update(r)
+    return out
+
+# source → (抓取函式, 預設併發數, 預設每秒請求數)
+SOURCES: Dict[str, Tuple[SourceFn, int, float]] = {
+    "twse": (_fetch_twse, settings.TWSE_CONCURRENCY, settings.TWSE_RATE_PER_SEC),
+    "yf": (_fetch_yf, settings.YF_CONCURRENCY, settings.YF_RATE_PER_SEC),
+}
+
+# ----- runner -----
+
+async def run(engine: Engine, source: str, workers: Optional[int] = None, rate_per_sec: Optional[float] = None,
+              batch: int = 50, max_attempts: int = settings.BACKFILL_MAX_ATTEMPTS,
+              backoff_sec: float = 30.0, stale_after_sec: float = 900.0,
+              worker_id: Optional[str] = None) -> Dict[str, int]:
+    """一直認領、抓取、寫入，直到這個來源沒有可做的單位（退避中的會等到可重試）。
+       回傳本行程的統計：{"done", "failed", "rows"}。"""
+    fetch, default_workers, default_rate = SOURCES[source]
+    workers = workers or default_workers
+    rate_per_sec = rate_per_sec or default_rate
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    ensure_jobs_table(engine)
+    n = reclaim_stale(engine, source, stale_after_sec)
+    if n:
+        log.info("backfill[%s] reclaimed %d stale units", source, n)
+    stats = {"done": 0, "failed": 0, "rows": 0}
+    while True:
+        units = _claim(engine, source, batch, worker_id)
+        if not units:
+            wait = _next_retry_in(engine, source)
+            if wait is None:
+                return stats
+            await asyncio.sleep(min(wait, 60.0) + 0.1)
+            continue
+        results = await fetch(units, workers, rate_per_sec)
+        ok: Dict[Unit, Dict[date, Bar]] = {}
+        failed: Dict[Unit, str] = {}
+        for u in units:
+            r = results[u.id]
+            if r.ok:
+                ok[u] = {d: b for d, b in (r.data or {}).items() if u.date_from <= d <= u.date_to}
+            else:
+                failed[u] = f"{r.reason}: {r.error}"
+        if ok:
+            stats["rows"] += _complete(engine, ok)
+            stats["done"] += len(ok)
+        if failed:
+            _fail(engine, failed, max_attempts, backoff_sec)
+            stats["failed"] += len(failed)
+        log.info("backfill[%s] %s: batch=%d ok=%d failed=%d rows=%d",
+                 source, worker_id, len(units), len(ok), len(failed), stats["rows"])
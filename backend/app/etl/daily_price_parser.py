@@ -1,19 +1,45 @@
 # path: backend/app/etl/daily_price_parser.py
 from __future__ import annotations
+import asyncio
 import os
 from datetime import date
-from typing import Optional
-from app.etl.parsers.base import PriceParser
+from typing import Dict, Iterable, Optional
+from app.etl.fetcher import FetchResult
+from app.etl.parsers.base import PriceParser, Bar
 from app.etl.parsers.twse import TwseDailyParser
+from app.etl.parsers.market_snapshot import MarketSnapshotParser
+from app.services.trading_calendar import TradingCalendar
 
+# twse：逐檔 STOCK_DAY（月資料）；snapshot：全市場每日行情（上市 + 上櫃各一個請求）
 _DATA_SOURCE = os.getenv("PRICE_DATA_SOURCE", "twse").lower()
 
 def _build_parser() -> PriceParser:
     if _DATA_SOURCE == "twse":
         return TwseDailyParser()
+    if _DATA_SOURCE == "snapshot":
+        return MarketSnapshotParser(fixture_dir=os.getenv("PRICE_SNAPSHOT_DIR") or None)
     return TwseDailyParser()
 
 _parser: PriceParser = _build_parser()
 
+def use_calendar(cal: TradingCalendar) -> None:
+    """換掉 parser 的交易日曆（預設只有內附假日表）；腳本從 API 取得日曆後呼叫。"""
+    _parser.calendar = cal
+
 def fetch_close_for(ticker: str, for_date: date) -> Optional[float]:
     return _parser.fetch_close(ticker, for_date)
+
+def fetch_snapshot_for(for_date: date) -> Optional[Dict[str, Bar]]:
+    """全市場單日行情；目前來源不支援時回 None。"""
+    return _parser.fetch_snapshot(for_date)
+
+def fetch_range_for(ticker: str, start: date, end: date) -> Dict[date, Bar]:
+    return _parser.fetch_range(ticker, start, end)
+
+def fetch_closes_for(tickers: Iterable[str], for_date: date) -> Dict[str, FetchResult]:
+    """同步入口：多檔併發抓同一天收盤價（給 cron 腳本用）。"""
+    return asyncio.run(_parser.fetch_closes(list(tickers), for_date))
+
+def fetch_ranges_for(tickers: Iterable[str], start: date, end: date) -> Dict[str, FetchResult]:
+    """同步入口：多檔區間日K（TWSE 以月為單位抓取並快取）。"""
+    return asyncio.run(_parser.fetch_ranges(list(tickers), start, end))
@@ -0,0 +1,149 @@
+# path: backend/app/etl/fetcher.py
+# 共用的非同步抓取引擎：單一 httpx.AsyncClient（連線池）+ 併發上限 + token bucket 限速
+# + 指數退避（含 jitter）重試；失敗時回傳結構化原因，不吞例外、不無限重打。
+from __future__ import annotations
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, Mapping, Optional, TypeVar
+import httpx
+
+log = logging.getLogger("fin-etl")
+
+T = TypeVar("T")
+K = TypeVar("K")
+
+# 失敗原因（FetchResult.reason）
+OK = "ok"
+TIMEOUT = "timeout"
+NETWORK = "network"
+HTTP_4XX = "http_4xx"
+HTTP_5XX = "http_5xx"
+RATE_LIMITED = "rate_limited"
+BAD_PAYLOAD = "bad_payload"
+
+_RETRYABLE = {TIMEOUT, NETWORK, HTTP_5XX, RATE_LIMITED}
+
+@dataclass
+class FetchResult:
+    ok: bool
+    reason: str = OK
+    data: Any = None
+    status: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+class TokenBucket:
+    """每秒補 rate 個 token，最多存 burst 個；acquire() 拿不到就等。"""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+@dataclass
+class FetchPolicy:
+    concurrency: int = 4
+    rate_per_sec: float = 2.0
+    burst: int = 4
+    retries: int = 3
+    backoff_base_sec: float = 1.0
+    backoff_max_sec: float = 30.0
+    timeout_sec: float = 10.0
+    headers: Dict[str, str] = field(default_factory=lambda: {
+        "User-Agent": "FinSiteETL/1.0",
+        "Accept": "application/json",
+    })
+
+class AsyncFetcher:
+    """用法：
+        async with AsyncFetcher(policy) as f:
+            res = await f.get_json(url, params)
+            results = await f.map(keys, lambda k: f.get_json(...))
+    """
+    def __init__(self, policy: Optional[FetchPolicy] = None):
+        self.policy = policy or FetchPolicy()
+        self._sem = asyncio.Semaphore(self.policy.concurrency)
+        self._bucket = TokenBucket(self.policy.rate_per_sec, self.policy.burst)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        p = self.policy
+        self._client = httpx.AsyncClient(
+            timeout=p.timeout_sec,
+            headers=p.headers,
+            limits=httpx.Limits(max_connections=p.concurrency, max_keepalive_connections=p.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(self.policy.backoff_max_sec, retry_after)
+        # full jitter：0 ~ base * 2^attempt
+        cap = min(self.policy.backoff_max_sec, self.policy.backoff_base_sec * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    async def get_json(self, url: str, params: Optional[Mapping[str, Any]] = None) -> FetchResult:
+        assert self._client is not None, "use `async with AsyncFetcher(...)`"
+        res = FetchResult(ok=False)
+        for attempt in range(self.policy.retries + 1):
+            res.attempts = attempt + 1
+            retry_after: Optional[float] = None
+            async with self._sem:
+                await self._bucket.acquire()
+                try:
+                    r = await self._client.get(url, params=params)
+                    res.status = r.status_code
+                    if r.status_code == 429:
+                        res.reason = RATE_LIMITED
+                        ra = r.headers.get("Retry-After")
+                        retry_after = float(ra) if ra and ra.isdigit() else None
+                    elif r.status_code >= 500:
+                        res.reason = HTTP_5XX
+                    elif r.status_code >= 400:
+                        res.reason = HTTP_4XX
+                    else:
+                        try:
+                            res.data = r.json()
+                        except ValueError as e:
+                            # TWSE 被擋時常回 HTML 而非 JSON
+                            res.reason, res.error = BAD_PAYLOAD, str(e)
+                            return res
+                        res.ok, res.reason, res.error = True, OK, None
+                        return res
+                    res.error = f"HTTP {r.status_code}"
+                except httpx.TimeoutException as e:
+                    res.reason, res.error = TIMEOUT, repr(e)
+                except httpx.TransportError as e:
+                    res.reason, res.error = NETWORK, repr(e)
+            if res.reason not in _RETRYABLE or attempt == self.policy.retries:
+                break
+            delay = self._backoff(attempt, retry_after)
+            log.debug("retry %s %s in %.2fs (%s)", url, dict(params or {}), delay, res.reason)
+            await asyncio.sleep(delay)
+        return res
+
+    async def map(self, keys: Iterable[K], fn: Callable[[K], Awaitable[T]]) -> Dict[K, T]:
+        """對每個 key 併發執行 fn（併發數與速率由 policy 控制），回傳 {key: 結果}。"""
+        keys = list(keys)
+        results = await asyncio.gather(*(fn(k) for k in keys))
+        return dict(zip(keys, results))
@@ -1,11 +1,52 @@
 # path: backend/app/etl/parsers/base.py
 from __future__ import annotations
+import asyncio
 from abc import ABC, abstractmethod
 from datetime import date
-from typing import Optional
+from typing import Any, Dict, Iterable, Optional
+from app.etl.fetcher import FetchResult
+from app.services.trading_calendar import TradingCalendar, bundled_calendar
+
+# 單日 K 棒：{"open", "high", "low", "close", "volume"}，缺值為 None
+Bar = Dict[str, Any]
 
 class PriceParser(ABC):
+    # 非交易日不發請求；預設只有內附假日表，呼叫端可換成 DB / API 拿到的日曆
+    calendar: TradingCalendar = bundled_calendar()
+
     @abstractmethod
     def fetch_close(self, ticker: str, for_date: date) -> Optional[float]:
         """回傳指定日期的收盤價；休市/無資料時回 None。"""
         raise NotImplementedError
+
+    def fetch_snapshot(self, for_date: date) -> Optional[Dict[str, Bar]]:
+        """該日全市場 {ticker: bar}；不支援全市場模式的來源回 None（呼叫端改逐檔抓）。"""
+        return None
+
+    def fetch_range(self, ticker: str, start: date, end: date) -> Dict[date, Bar]:
+        """[start, end] 區間有資料的日期 → K 棒。預設逐個交易日呼叫 fetch_close（只有收盤價）。"""
+        out: Dict[date, Bar] = {}
+        for d in self.calendar.trading_days(start, end):
+            px = self.fetch_close(ticker, d)
+            if px is not None:
+                out[d] = {"open": None, "high": None, "low": None, "close": px, "volume": None}
+        return out
+
+    async def fetch_closes(self, tickers: Iterable[str], for_date: date) -> Dict[str, FetchResult]:
+        """多檔同一天的收盤價；FetchResult.data 為收盤價（無資料為 None）。
+           預設逐檔在 thread 裡呼叫 fetch_close，子類別可覆寫成真正的併發實作。"""
+        out: Dict[str, FetchResult] = {}
+        if not self.calendar.is_trading_day(for_date):
+            return {t: FetchResult(ok=True, data=None) for t in tickers}
+        for t in tickers:
+            px = await asyncio.to_thread(self.fetch_close, t, for_date)
+            out[t] = FetchResult(ok=True, data=px, attempts=1)
+        return out
+
+    async def fetch_ranges(self, tickers: Iterable[str], start: date, end: date) -> Dict[str, FetchResult]:
+        """多檔區間日K；FetchResult.data 為 {date: bar}。預設逐檔在 thread 裡呼叫 fetch_range。"""
+        out: Dict[str, FetchResult] = {}
+        for t in tickers:
+            bars = await asyncio.to_thread(self.fetch_range, t, start, end)
+            out[t] = FetchResult(ok=True, data=bars, attempts=1)
+        return out
@@ -0,0 +1,183 @@
+# path: backend/app/etl/parsers/market_snapshot.py
+# 全市場每日收盤行情：TWSE MI_INDEX（上市）+ TPEx 上櫃日收盤行情，一天各一個請求拿到所有代號的 OHLCV。
+# 以 CSV 逐行串流解析（不把整份回應讀進記憶體）；設定 fixture_dir 時改讀本機檔案（離線重播 / 驗證用）。
+from __future__ import annotations
+import asyncio
+import codecs
+import csv
+import logging
+import os
+from datetime import date
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+import httpx
+from app.config import settings
+from app.etl.fetcher import FetchResult, NETWORK
+from app.etl.parsers.base import PriceParser, Bar
+from app.services.cache import TTLCache
+
+log = logging.getLogger("fin-etl")
+
+_CODE_HEADERS = ("證券代號", "代號")
+_COLUMNS = {
+    "open": ("開盤價", "開盤"),
+    "high": ("最高價", "最高"),
+    "low": ("最低價", "最低"),
+    "close": ("收盤價", "收盤"),
+    "volume": ("成交股數",),
+}
+
+def _cell(x: str) -> str:
+    # TWSE CSV 會把代號寫成 ="0050" 以保留前導 0
+    return x.strip().lstrip("=").strip('"').strip()
+
+def _num(x: str) -> Optional[float]:
+    x = _cell(x).replace(",", "")
+    if x in ("", "--", "---", "----", "除權息", "除息", "除權"):
+        return None
+    try:
+        return float(x)
+    except ValueError:
+        return None
+
+def _split_lines(chunks: Iterable[str]) -> Iterator[str]:
+    buf = ""
+    for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split("\n")
+        for ln in lines:
+            yield ln.rstrip("\r")
+    if buf:
+        yield buf.rstrip("\r")
+
+def parse_snapshot_csv(lines: Iterable[str]) -> Dict[str, Bar]:
+    """從每日行情 CSV 找出個股區段（表頭含「證券代號」/「代號」），逐行轉成 {ticker: bar}。
+       欄位依表頭名稱對應，TWSE 與 TPEx 格式皆適用；其餘區段（指數、註解）略過。"""
+    out: Dict[str, Bar] = {}
+    idx: Optional[Dict[str, int]] = None
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        head = [_cell(c) for c in row]
+        if head[0] in _CODE_HEADERS:
+            idx = {}
+            for field, names in _COLUMNS.items():
+                for i, h in enumerate(head):
+                    if h in names:
+                        idx[field] = i
+                        break
+            if "close" not in idx:
+                idx = None
+            continue
+        if idx is None:
+            continue
+        if len(row) <= max(idx.values()):
+            continue
+        code = head[0]
+        if not code:
+            continue
+        close = _num(row[idx["close"]])
+        if close is None:
+            continue
+        vol = _num(row[idx["volume"]]) if "volume" in idx else None
+        out[code] = {
+            "open": _num(row[idx["open"]]) if "open" in idx else None,
+            "high": _num(row[idx["high"]]) if "high" in idx else None,
+            "low": _num(row[idx["low"]]) if "low" in idx else None,
+            "close": close,
+            "volume": None if vol is None else int(vol),
+        }
+    return out
+
+class MarketSnapshotParser(PriceParser):
+    TWSE_URL = "https://www.twse.com.tw/exchangeReport/MI_INDEX"
+    TPEX_URL = "https://www.tpex.org.tw/web/stock/aftertrading/otc_quotes_no1430/stk_wn1430_result.php"
+    ENCODING = "cp950"
+    HEADERS = {"User-Agent": "FinSiteETL/1.0"}
+
+    def __init__(self, timeout_sec: float = 30.0, markets: Sequence[str] = ("twse", "tpex"),
+                 fixture_dir: Optional[str] = None):
+        self.timeout_sec = timeout_sec
+        self.markets = tuple(markets)
+        self.fixture_dir = fixture_dir
+        self._past = TTLCache("snapshot_past_days", 400, 7 * 86400)
+        self._today = TTLCache("snapshot_today", 4, settings.TWSE_MONTH_CACHE_TTL_SEC)
+
+    def _request(self, market: str, d: date):
+        if market == "twse":
+            return self.TWSE_URL, {"response": "csv", "date": d.strftime("%Y%m%d"), "type": "ALLBUT0999"}
+        roc = f"{d.year - 1911}/{d.month:02d}/{d.day:02d}"
+        return self.TPEX_URL, {"l": "zh-tw", "o": "csv", "d": roc, "se": "EW"}
+
+    def _parse_market(self, market: str, d: date) -> Dict[str, Bar]:
+        if self.fixture_dir:
+            # 本機檔名：{market}_{YYYYMMDD}.csv（與上游相同的 cp950 編碼）
+            path = os.path.join(self.fixture_dir, f"{market}_{d:%Y%m%d}.csv")
+            if not os.path.exists(path):
+                return {}
+            with open(path, encoding=self.ENCODING, errors="replace", newline="") as f:
+                return parse_snapshot_csv(f)
+        url, params = self._request(market, d)
+        with httpx.Client(timeout=self.timeout_sec, headers=self.HEADERS) as client:
+            with client.stream("GET", url, params=params) as r:
+                r.raise_for_status()
+                chunks = codecs.iterdecode(r.iter_bytes(), self.ENCODING, errors="replace")
+                return parse_snapshot_csv(_split_lines(chunks))
+
+    def fetch_snapshot(self, for_date: date) -> Dict[str, Bar]:
+        """該日全市場 {ticker: bar}；休市日為空 dict（日曆上的非交易日不發請求）。結果以日期快取；抓取失敗時丟出 httpx.HTTPError。"""
+        if not self.calendar.is_trading_day(for_date):
+            return {}
+        cache = self._today if for_date >= date.today() else self._past
+        hit = cache.get(for_date)
+        if hit is not None:
+            return hit
+        out: Dict[str, Bar] = {}
+        for m in self.markets:
+            out.update(self._parse_market(m, for_date))
+        cache.set(for_date, out)
+        return out
+
+    def fetch_close(self, ticker: str, for_date: date) -> Optional[float]:
+        try:
+            bar = self.fetch_snapshot(for_date).get(ticker)
+        except httpx.HTTPError as e:
+            log.warning("snapshot %s failed: %r", for_date, e)
+            return None
+        return bar["close"] if bar else None
+
+    def _snapshots(self, start: date, end: date) -> Tuple[Dict[date, Dict[str, Bar]], Optional[httpx.HTTPError]]:
+        """區間內每個交易日的全市場行情；抓取失敗的日子略過，回傳最後一個錯誤。"""
+        snaps: Dict[date, Dict[str, Bar]] = {}
+        err: Optional[httpx.HTTPError] = None
+        for d in self.calendar.trading_days(start, end):
+            try:
+                snaps[d] = self.fetch_snapshot(d)
+            except httpx.HTTPError as e:
+                log.warning("snapshot %s failed: %r", d, e)
+                err = e
+        return snaps, err
+
+    def fetch_range(self, ticker: str, start: date, end: date) -> Dict[date, Bar]:
+        snaps, _ = self._snapshots(start, end)
+        return {d: snap[ticker] for d, snap in snaps.items() if snap.get(ticker)}
+
+    async def fetch_closes(self, tickers: Iterable[str], for_date: date) -> Dict[str, FetchResult]:
+        tickers = list(tickers)
+        try:
+            snap = await asyncio.to_thread(self.fetch_snapshot, for_date)
+        except httpx.HTTPError as e:
+            return {t: FetchResult(ok=False, reason=NETWORK, error=repr(e), attempts=1) for t in tickers}
+        return {t: FetchResult(ok=True, data=(snap.get(t) or {}).get("close"), attempts=1) for t in tickers}
+
+    async def fetch_ranges(self, tickers: Iterable[str], start: date, end: date) -> Dict[str, FetchResult]:
+        """多檔區間日K；每天只抓一次全市場行情。任何一天失敗即全部標為失敗（已抓到的日子仍保留在 data）。"""
+        tickers = list(tickers)
+        snaps, err = await asyncio.to_thread(self._snapshots, start, end)
+        out: Dict[str, FetchResult] = {}
+        for t in tickers:
+            bars = {d: snap[t] for d, snap in snaps.items() if snap.get(t)}
+            if err is None:
+                out[t] = FetchResult(ok=True, data=bars, attempts=1)
+            else:
+                out[t] = FetchResult(ok=False, reason=NETWORK, data=bars, error=repr(err), attempts=1)
+        return out
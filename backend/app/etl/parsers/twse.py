@@ -1,15 +1,43 @@
 # path: backend/app/etl/parsers/twse.py
 from __future__ import annotations
 from datetime import date
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import random
+import time
 import httpx
+from app.config import settings
+from app.etl.fetcher import AsyncFetcher, FetchPolicy, FetchResult
+from app.etl.parsers.base import PriceParser, Bar
+from app.services.cache import TTLCache
 
-class TwseDailyParser:
+log = logging.getLogger("fin-etl")
+
+MonthKey = Tuple[str, int, int]  # (ticker, year, month)
+
+class TwseDailyParser(PriceParser):
+    """STOCK_DAY 一次回整個月；以 (ticker, year, month) 為單位快取解析後的月資料。
+       已結束的月份不會再變，快取較久；當月資料 TTL 較短。"""
     BASE_URL = "https://www.twse.com.tw/exchangeReport/STOCK_DAY"
+    HEADERS = {
+        "User-Agent": "FinSiteETL/1.0",
+        "Accept": "application/json",
+    }
 
-    def __init__(self, timeout_sec: float = 8.0, retries: int = 2):
+    def __init__(self, timeout_sec: float = 8.0, retries: int = 2, policy: Optional[FetchPolicy] = None):
         self.timeout_sec = timeout_sec
         self.retries = retries
+        self.policy = policy or FetchPolicy(
+            concurrency=settings.TWSE_CONCURRENCY,
+            rate_per_sec=settings.TWSE_RATE_PER_SEC,
+            burst=settings.TWSE_BURST,
+            retries=settings.TWSE_RETRIES,
+            timeout_sec=timeout_sec,
+            headers=dict(self.HEADERS),
+        )
+        self._client: Optional[httpx.Client] = None
+        self._past_months = TTLCache("twse_past_months", settings.TWSE_MONTH_CACHE_MAXSIZE, 7 * 86400)
+        self._open_months = TTLCache("twse_open_months", settings.TWSE_MONTH_CACHE_MAXSIZE, settings.TWSE_MONTH_CACHE_TTL_SEC)
 
     @staticmethod
     def _yyyymmdd(d: date) -> str:
@@ -32,30 +60,151 @@ class TwseDailyParser:
         except Exception:
             return None
 
-    def fetch_close(self, ticker: str, for_date: date) -> Optional[float]:
-        params = {"response": "json", "stockNo": ticker, "date": self._yyyymmdd(for_date)}
-        headers = {
-            "User-Agent": "FinSiteETL/1.0",
-            "Accept": "application/json",
-        }
-        last_exc = None
-        for _ in range(self.retries + 1):
+    def _params(self, ticker: str, year: int, month: int) -> Dict[str, str]:
+        return {"response": "json", "stockNo": ticker, "date": self._yyyymmdd(date(year, month, 1))}
+
+    def _parse_month(self, j: Dict[str, Any]) -> Dict[date, Bar]:
+        # 欄位：日期, 成交股數, 成交金額, 開盤價, 最高價, 最低價, 收盤價, 漲跌價差, 成交筆數
+        out: Dict[date, Bar] = {}
+        for row in j.get("data") or []:
+            if not row or len(row) < 7:
+                continue
             try:
-                with httpx.Client(timeout=self.timeout_sec, headers=headers) as client:
-                    r = client.get(self.BASE_URL, params=params)
-                    r.raise_for_status()
-                    j = r.json()
-                    data = j.get("data") or []
-                    for row in data:
-                        if not row or len(row) < 6:
-                            continue
-                        roc_date = row[0]
-                        close_str = row[5]  # 第 6 欄為收盤價（1-based）
-                        g_date = self._roc_to_gregorian(roc_date)
-                        if g_date == for_date:
-                            return self._to_float(close_str)
-                    return None
-            except Exception as e:
-                last_exc = e
+                d = self._roc_to_gregorian(row[0])
+            except ValueError:
+                continue
+            close = self._to_float(row[6])
+            if close is None:
                 continue
+            vol = self._to_float(row[1])
+            out[d] = {
+                "open": self._to_float(row[3]),
+                "high": self._to_float(row[4]),
+                "low": self._to_float(row[5]),
+                "close": close,
+                "volume": None if vol is None else int(vol),
+            }
+        return out
+
+    # ----- month cache -----
+
+    def _cache_for(self, year: int, month: int) -> TTLCache:
+        today = date.today()
+        return self._open_months if (year, month) >= (today.year, today.month) else self._past_months
+
+    def _cached_month(self, key: MonthKey) -> Optional[Dict[date, Bar]]:
+        return self._cache_for(key[1], key[2]).get(key)
+
+    def _store_month(self, key: MonthKey, bars: Dict[date, Bar]) -> None:
+        self._cache_for(key[1], key[2]).set(key, bars)
+
+    @staticmethod
+    def _is_future(year: int, month: int) -> bool:
+        today = date.today()
+        return (year, month) > (today.year, today.month)
+
+    # ----- sync API -----
+
+    def _sync_client(self) -> httpx.Client:
+        # 同一個 parser 重用連線，不再每次重試都新建 Client
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout_sec, headers=self.HEADERS)
+        return self._client
+
+    def fetch_month(self, ticker: str, year: int, month: int) -> Optional[Dict[date, Bar]]:
+        """整個月的日K（{date: bar}）；抓取失敗回 None（不寫入快取），未來月份回空 dict。"""
+        if self._is_future(year, month):
+            return {}
+        key = (ticker, year, month)
+        hit = self._cached_month(key)
+        if hit is not None:
+            return hit
+        last_exc: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            try:
+                r = self._sync_client().get(self.BASE_URL, params=self._params(ticker, year, month))
+                r.raise_for_status()
+                bars = self._parse_month(r.json())
+                self._store_month(key, bars)
+                return bars
+            except (httpx.HTTPError, ValueError) as e:
+                last_exc = e
+                if attempt < self.retries:
+                    time.sleep(random.uniform(0, self.policy.backoff_base_sec * (2 ** attempt)))
+        log.warning("twse fetch_month %s %04d-%02d failed after %d attempts: %r", ticker, year, month, self.retries + 1, last_exc)
         return None
+
+    def _months_with_trading(self, start: date, end: date) -> List[Tuple[int, int]]:
+        # 區間內一個交易日都沒有的月份（例如整段落在春節）不必打上游
+        return sorted({(d.year, d.month) for d in self.calendar.trading_days(start, end)})
+
+    def fetch_range(self, ticker: str, start: date, end: date) -> Dict[date, Bar]:
+        out: Dict[date, Bar] = {}
+        for y, m in self._months_with_trading(start, end):
+            for d, bar in (self.fetch_month(ticker, y, m) or {}).items():
+                if start <= d <= end:
+                    out[d] = bar
+        return out
+
+    def fetch_close(self, ticker: str, for_date: date) -> Optional[float]:
+        if not self.calendar.is_trading_day(for_date):
+            return None
+        bar = (self.fetch_month(ticker, for_date.year, for_date.month) or {}).get(for_date)
+        return bar["close"] if bar else None
+
+    # ----- async API -----
+
+    async def fetch_months(self, keys: Iterable[MonthKey]) -> Dict[MonthKey, FetchResult]:
+        """多個 (ticker, year, month) 併發抓取；快取命中或未來月份不發請求。data 為 {date: bar}。"""
+        out: Dict[MonthKey, FetchResult] = {}
+        todo: List[MonthKey] = []
+        for key in dict.fromkeys(keys):
+            hit = {} if self._is_future(key[1], key[2]) else self._cached_month(key)
+            if hit is not None:
+                out[key] = FetchResult(ok=True, data=hit)
+            else:
+                todo.append(key)
+        if todo:
+            async with AsyncFetcher(self.policy) as f:
+                async def one(key: MonthKey) -> FetchResult:
+                    res = await f.get_json(self.BASE_URL, self._params(*key))
+                    if res.ok:
+                        res.data = self._parse_month(res.data or {})
+                        self._store_month(key, res.data)
+                    return res
+                out.update(await f.map(todo, one))
+        return out
+
+    async def fetch_closes(self, tickers: Iterable[str], for_date: date) -> Dict[str, FetchResult]:
+        """多檔同一天收盤價；data 為收盤價。非交易日直接回無資料，不發請求。"""
+        if not self.calendar.is_trading_day(for_date):
+            return {t: FetchResult(ok=True, data=None) for t in tickers}
+        keys = {t: (t, for_date.year, for_date.month) for t in tickers}
+        months = await self.fetch_months(keys.values())
+        out: Dict[str, FetchResult] = {}
+        for t, key in keys.items():
+            src = months[key]
+            bar = (src.data or {}).get(for_date) if src.ok else None
+            out[t] = FetchResult(ok=src.ok, reason=src.reason, data=bar["close"] if bar else None,
+                                 status=src.status, attempts=src.attempts, error=src.error)
+        return out
+
+    async def fetch_ranges(self, tickers: Iterable[str], start: date, end: date) -> Dict[str, FetchResult]:
+        """多檔區間日K；data 為 {date: bar}，任何一個月份失敗即標為失敗（已抓到的部分仍保留在 data）。"""
+        tickers = list(tickers)
+        months = self._months_with_trading(start, end)
+        res = await self.fetch_months((t, y, m) for t in tickers for y, m in months)
+        out: Dict[str, FetchResult] = {}
+        for t in tickers:
+            bars: Dict[date, Bar] = {}
+            agg = FetchResult(ok=True)
+            for y, m in months:
+                r = res[(t, y, m)]
+                agg.attempts += r.attempts
+                if not r.ok:
+                    agg.ok, agg.reason, agg.status, agg.error = False, r.reason, r.status, r.error
+                    continue
+                bars.update({d: b for d, b in r.data.items() if start <= d <= end})
+            agg.data = bars
+            out[t] = agg
+        return out
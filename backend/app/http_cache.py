@@ -0,0 +1,102 @@
+# path: backend/app/http_cache.py
+# 公開單檔讀取端點的 HTTP 快取（ASGI middleware）：弱 ETag + Cache-Control / stale-while-revalidate，
+# 讓 CDN 與 Next.js fetch cache 吃掉大部分重複讀取。
+# - ETag 由 (端點, ticker, 最新入庫交易日, 最新收盤, 查詢參數) 推得，不看回應內容；If-None-Match 相符時直接回 304，不跑查詢。
+#   帶上最新收盤：同一天重抓 / 修正當日價格時交易日不變，ETag 仍要跟著變（/price、序列的最後一點）。
+# - 兩者都走快取（cache.last_date / latest_close：本行程寫入即失效，其他行程的寫入經 price_notify 失效）。
+# - 回補 / 修正「較舊」日期不會改變最新交易日，ETag 也不變；這類修正後改 HTTP_CACHE_ETAG_SALT 讓快取全部失效。
+from __future__ import annotations
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+from app.config import settings
+from app.db import async_engine
+from app.services import read_ops_async
+
+log = logging.getLogger("fin-api")
+
+_ROUTE = re.compile(r"^/api/stocks/(?P<ticker>[^/]+)/(?P<kind>series|indicators|fundamental|price)$")
+
+# 端點 → (max-age, stale-while-revalidate) 秒
+CACHE_POLICY: Dict[str, Tuple[int, int]] = {
+    "series": (60, 3600),
+    "indicators": (60, 3600),
+    "fundamental": (3600, 86400),
+    "price": (15, 60),
+}
+
+def make_etag(kind: str, ticker: str, version: Tuple[Any, ...], query_string: bytes) -> str:
+    params = sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    key = repr((settings.HTTP_CACHE_ETAG_SALT, kind, ticker, version, params)).encode()
+    return 'W/"' + hashlib.blake2b(key, digest_size=12).hexdigest() + '"'
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """弱比較：忽略 W/ 前綴；支援逗號分隔多個與 *。"""
+    if not if_none_match:
+        return False
+    bare = etag.removeprefix("W/")
+    for t in if_none_match.split(","):
+        t = t.strip()
+        if t == "*" or t.removeprefix("W/") == bare:
+            return True
+    return False
+
+def cache_control(kind: str) -> str:
+    max_age, swr = CACHE_POLICY[kind]
+    return f"public, max-age={max_age}, stale-while-revalidate={swr}"
+
+async def _version(kind: str, ticker: str) -> Optional[Tuple[Any, ...]]:
+    """None → 查無價格（不加驗證器）。"""
+    last_date = await read_ops_async.last_price_date(async_engine, ticker)
+    if last_date is None:
+        return None
+    if kind == "fundamental":
+        return (last_date,)
+    return (last_date, await read_ops_async.latest_price(async_engine, ticker))
+
+def _header(scope, name: bytes) -> str:
+    for k, v in scope["headers"]:
+        if k == name:
+            return v.decode("latin-1")
+    return ""
+
+class HTTPCacheMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not settings.HTTP_CACHE_ENABLED:
+            return await self.app(scope, receive, send)
+        m = _ROUTE.match(scope["path"])
+        if not m:
+            return await self.app(scope, receive, send)
+        kind, ticker = m["kind"], m["ticker"]
+        try:
+            version = await _version(kind, ticker)
+        except Exception as e:
+            # 取不到版本就不加驗證器，照常回完整內容
+            log.warning("http cache: version lookup failed for %s: %s", ticker, e)
+            version = None
+        if version is None:
+            return await self.app(scope, receive, send)
+
+        etag = make_etag(kind, ticker, version, scope.get("query_string", b""))
+        headers: List[Tuple[bytes, bytes]] = [
+            (b"etag", etag.encode()),
+            (b"cache-control", cache_control(kind).encode()),
+        ]
+        if etag_matches(etag, _header(scope, b"if-none-match")):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_validators(message):
+            # 只幫 200 加驗證器；路由自己帶的 ETag / Cache-Control 以這裡為準
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                kept = [(k, v) for k, v in message.get("headers", []) if k.lower() not in (b"etag", b"cache-control")]
+                message = {**message, "headers": kept + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
@@ -1,13 +1,15 @@
 # path: backend/app/main.py
 from fastapi import FastAPI, HTTPException, Body, Query
 from fastapi.middleware.cors import CORSMiddleware
-from .db import engine
+from .db import async_engine
 from .config import settings
 from .schemas import CompanyOut, FundamentalOut, PriceOut
 from typing import List, Optional
-from app.services import read_ops, write_ops
+from app.services import read_ops_async as read_ops, write_ops_async as write_ops, trading_calendar, company_index, price_notify
 from app.routers.admin import router as admin_router
 from app.routers.public import router as public_router
+from app.routers.export import router as export_router
+from app.http_cache import HTTPCacheMiddleware
 import time
 import logging
 
@@ -16,7 +18,10 @@ app = FastAPI(title="FinSite API (Stage 2)")
 
 app.include_router(public_router)
 app.include_router(admin_router)
+app.include_router(export_router)
 
+# 先加的在內層：304 也要經過 CORS 補上標頭
+app.add_middleware(HTTPCacheMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[settings.ALLOW_ORIGINS, "http://127.0.0.1:3000"],
@@ -25,62 +30,85 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def _warm_search_index():
+    # 先把公司搜尋索引載好；DB 還沒就緒就等第一次 /api/search 再載
+    try:
+        await company_index.get_index(async_engine)
+    except Exception as e:
+        log.warning("company search index not loaded at startup: %s", e)
+
+@app.on_event("startup")
+async def _start_price_listener():
+    # 其他行程（scheduler / 腳本 / 其他 worker）的價格寫入：LISTEN price_updated 轉成快取失效與推播
+    price_notify.start()
+
+@app.on_event("shutdown")
+async def _dispose_engine():
+    await price_notify.stop()
+    await async_engine.dispose()
+
 @app.get("/")
 def root(): return {"service": "FinSite API", "docs": "/docs", "health": "/healthz"}
 @app.get("/healthz")
 def healthz(): return {"ok": True}
 @app.get("/health/db")
-def health_db():
+async def health_db():
     from sqlalchemy import text
-    with engine.connect() as conn:
-        v = conn.execute(text("SELECT 1")).scalar()
+    async with async_engine.connect() as conn:
+        v = (await conn.execute(text("SELECT 1"))).scalar()
     return {"db": "ok", "select1": int(v)}
 
 # ----- Public -----
 @app.get("/api/stocks/{ticker}/fundamental", response_model=FundamentalOut)
-def get_fundamental(ticker: str):
-    data = read_ops.latest_fundamental(engine, ticker)
+async def get_fundamental(ticker: str):
+    data = await read_ops.latest_fundamental(async_engine, ticker)
     if not data: raise HTTPException(status_code=404, detail="ticker not found")
     return data
 
 @app.get("/api/stocks/{ticker}/price", response_model=PriceOut)
-def get_price(ticker: str):
-    px = read_ops.latest_price(engine, ticker)
+async def get_price(ticker: str):
+    px = await read_ops.latest_price(async_engine, ticker)
     if px is None: raise HTTPException(status_code=404, detail="price not found or NULL")
-    return {"ticker": ticker, "price": float(px), "ts": int(time.time()*1000)}
+    d = await read_ops.last_price_date(async_engine, ticker)
+    return {"ticker": ticker, "price": float(px), "ts": int(time.time()*1000), "trade_date": d}
 
 # ----- Admin -----
 @app.get("/api/admin/companies", response_model=List[CompanyOut])
-def list_companies(q: Optional[str] = None, limit: int = 1000, offset: int = 0):
-    return read_ops.list_companies(engine, q, limit, offset)
+async def list_companies(q: Optional[str] = None, limit: int = 1000, offset: int = 0,
+                         after: Optional[str] = Query(None, description="keyset 游標：上一頁最後一個 ticker")):
+    return await read_ops.list_companies(async_engine, q, limit, offset, after)
 
 @app.get("/api/admin/stocks/{ticker}/last_price_date")
-def api_last_price_date(ticker: str):
-    s = read_ops.last_price_date(engine, ticker)
-    return {"ticker": ticker, "last_trade_date": s}
+async def api_last_price_date(ticker: str):
+    s = await read_ops.last_price_date(async_engine, ticker)
+    cal = await trading_calendar.get_calendar_async(async_engine)
+    expected = cal.expected_latest_trade_date().isoformat()
+    return {"ticker": ticker, "last_trade_date": s, "expected_trade_date": expected,
+            "stale": s is None or s < expected}
 
 @app.post("/api/admin/companies", response_model=CompanyOut, status_code=201)
-def create_company(
+async def create_company(
     ticker: str = Body(..., embed=True),
     name: Optional[str] = Body(None),
     sector: Optional[str] = Body(None),
 ):
-    write_ops.ensure_company(engine, ticker, name, sector)
-    arr = read_ops.list_companies(engine, q=ticker, limit=1, offset=0)
+    await write_ops.ensure_company(async_engine, ticker, name, sector)
+    arr = await read_ops.list_companies(async_engine, q=ticker, limit=1, offset=0)
     if not arr: raise HTTPException(status_code=500, detail="failed to create company")
     return arr[0]
 
 @app.delete("/api/admin/companies/{ticker}", status_code=204)
-def delete_company(ticker: str):
-    if not write_ops.delete_company_cascade(engine, ticker):
+async def delete_company(ticker: str):
+    if not await write_ops.delete_company_cascade(async_engine, ticker):
         raise HTTPException(status_code=404, detail="not found")
     return
 
 @app.delete("/api/admin/prices", status_code=204)
-def delete_prices(
+async def delete_prices(
     start: str = Query(..., description="YYYY-MM-DD inclusive"),
     end: str = Query(..., description="YYYY-MM-DD inclusive"),
     tickers: Optional[str] = Query(None, description="comma-separated tickers"),
 ):
-    write_ops.delete_prices_range(engine, start, end, tickers.split(",") if tickers else None)
+    await write_ops.delete_prices_range(async_engine, start, end, tickers.split(",") if tickers else None)
     return
@@ -1,11 +1,13 @@
 # app/routers/admin.py
 from __future__ import annotations
-from fastapi import APIRouter, Body, HTTPException
+from datetime import date, timedelta
+from fastapi import APIRouter, Body, HTTPException, Query
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
+import anyio
 from sqlalchemy import text
-from app.db import engine
-from app.services import read_ops, write_ops
+from app.db import engine, async_engine
+from app.services import read_ops_async, write_ops_async, cache, trading_calendar, indicator_store, schema, price_bus
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -24,66 +26,30 @@ class PriceIn(BaseModel):
     volume: Optional[int] = None
 
 @router.get("/db/ping")
-def db_ping():
+async def db_ping():
     try:
-        with engine.begin() as conn:
-            v = conn.execute(text("SELECT 1")).scalar()
+        async with async_engine.connect() as conn:
+            v = (await conn.execute(text("SELECT 1"))).scalar()
         return {"ok": True, "select1": v}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"db ping failed: {e}")
 
+@router.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+@router.get("/stream/stats")
+def stream_stats():
+    return price_bus.stats()
+
 @router.post("/ensure_schema", status_code=204)
 def ensure_schema():
     """
-    Idempotent schema creation using plain DDL; no psycopg, no DO $$.
+    Idempotent schema creation (tables, indexes, yearly daily_price partitions); see services/schema.py.
     Safe to call multiple times.
     """
     try:
-        with engine.begin() as conn:
-            # 1) companies（若你早就有，這行不會重建）
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS companies (
-                    id      SERIAL PRIMARY KEY,
-                    ticker  TEXT NOT NULL,
-                    name    TEXT,
-                    sector  TEXT
-                );
-            """))
-            # 確保代號唯一
-            conn.execute(text("""
-                CREATE UNIQUE INDEX IF NOT EXISTS ux_companies_ticker
-                ON companies(ticker);
-            """))
-            # 2) daily_price（OHLCV + PK）
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS daily_price (
-                    company_id INTEGER NOT NULL,
-                    trade_date DATE    NOT NULL,
-                    open   NUMERIC(12,2),
-                    high   NUMERIC(12,2),
-                    low    NUMERIC(12,2),
-                    close  NUMERIC(12,2),
-                    volume BIGINT,
-                    PRIMARY KEY (company_id, trade_date)
-                );
-            """))
-            # 3) （可選）外鍵：若你的流量很大可先省略；要開就用這段
-            conn.execute(text("""
-                DO $$
-                BEGIN
-                  IF NOT EXISTS (
-                    SELECT 1 FROM information_schema.table_constraints
-                    WHERE constraint_type='FOREIGN KEY'
-                      AND table_name='daily_price'
-                      AND constraint_name='fk_daily_price_company'
-                  ) THEN
-                    ALTER TABLE daily_price
-                      ADD CONSTRAINT fk_daily_price_company
-                      FOREIGN KEY (company_id) REFERENCES companies(id)
-                      ON DELETE CASCADE;
-                  END IF;
-                END $$;
-            """))
+        schema.ensure_schema(engine)
         return
     except Exception as e:
         # 在 logs 看得到完整原因
@@ -92,18 +58,61 @@ def ensure_schema():
         raise HTTPException(status_code=500, detail=f"ensure_schema failed: {e}")
 
 @router.post("/prices/bulk", status_code=204)
-def bulk_upsert_prices(items: List[PriceIn] = Body(...)):
-    for it in items:
-        # 先走 close-only；若五欄都有就改呼叫 upsert_ohlcv
-        if it.close is None:
-            raise HTTPException(status_code=400, detail="close is required")
-        write_ops.upsert_price(engine, it.ticker, it.trade_date, float(it.close), trigger_revalidate=False)
+async def bulk_upsert_prices(items: List[PriceIn] = Body(...)):
+    # OHLCV 整批一個交易、一條 INSERT；缺的欄位保留 DB 既有值
+    if any(it.close is None for it in items):
+        raise HTTPException(status_code=400, detail="close is required")
+    await write_ops_async.upsert_ohlcv(async_engine, [it.model_dump() for it in items])
     return
 
+@router.get("/prices/gaps")
+async def price_gaps(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    tickers: Optional[str] = Query(None, description="comma-separated tickers"),
+):
+    # 回補工作清單：每個 (ticker, 月份) 在交易日曆上缺哪些日子
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="to must be >= from")
+    ts = [t.strip() for t in tickers.split(",") if t.strip()] if tickers else None
+    return await read_ops_async.missing_price_months(async_engine, date_from, date_to, ts)
+
+@router.post("/indicators/rebuild")
+async def rebuild_indicators(tickers: Optional[str] = Query(None, description="comma-separated tickers（預設全部）")):
+    ts = [t.strip() for t in tickers.split(",") if t.strip()] if tickers else None
+    n = await anyio.to_thread.run_sync(indicator_store.rebuild, engine, ts)
+    return {"rows": n}
+
 @router.post("/companies/bulk", status_code=204)
-def bulk_upsert_companies(items: List[CompanyIn] = Body(...)):
+async def bulk_upsert_companies(items: List[CompanyIn] = Body(...)):
     if not items:
         raise HTTPException(status_code=400, detail="no items")
-    for it in items:
-        write_ops.upsert_company(engine, it.ticker, it.name, it.sector)
+    await write_ops_async.upsert_companies(async_engine, [it.model_dump() for it in items])
     return
+
+@router.get("/calendar/trading_days")
+async def calendar_trading_days(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="to must be >= from")
+    if date_to - date_from > timedelta(days=3660):
+        raise HTTPException(status_code=400, detail="range too large")
+    cal = await trading_calendar.get_calendar_async(async_engine)
+    return {"from": date_from.isoformat(), "to": date_to.isoformat(),
+            "trading_days": [d.isoformat() for d in cal.trading_days(date_from, date_to)]}
+
+@router.get("/calendar/expected_latest")
+async def calendar_expected_latest():
+    cal = await trading_calendar.get_calendar_async(async_engine)
+    return {"expected_latest_trade_date": cal.expected_latest_trade_date().isoformat()}
+
+@router.post("/calendar/refresh")
+async def calendar_refresh(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+):
+    # 由 daily_price 重新學習開市日（補班週六等；預設整張表）。休市日只來自內附假日表
+    n = await trading_calendar.learn_from_prices_async(async_engine, date_from, date_to)
+    return {"learned": n}
@@ -0,0 +1,29 @@
+# app/routers/export.py
+from __future__ import annotations
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.db import async_engine
+from app.services.export_ops import stream_prices_csv
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+@router.get("/prices")
+async def export_prices(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    tickers: Optional[str] = Query(None, description="comma-separated tickers（預設全部）"),
+    compress: str = Query("gzip", pattern="^(gzip|none)$"),
+):
+    """daily_price 串流匯出（CSV：ticker,trade_date,open,high,low,close,volume）。"""
+    if date_from and date_to and date_to < date_from:
+        raise HTTPException(status_code=400, detail="to must be >= from")
+    ts = [t.strip() for t in tickers.split(",") if t.strip()] if tickers else None
+    gz = compress == "gzip"
+    name = f"prices_{date_from or 'all'}_{date_to or 'all'}.csv" + (".gz" if gz else "")
+    return StreamingResponse(
+        stream_prices_csv(async_engine, date_from, date_to, ts, gzip=gz),
+        media_type="application/gzip" if gz else "text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
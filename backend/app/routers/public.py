@@ -1,21 +1,125 @@
 # backend/app/routers/public.py
 from __future__ import annotations
-from fastapi import APIRouter, Query
-from app.db import engine
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from app.db import async_engine
 
 router = APIRouter(prefix="/api", tags=["public"])
 
-from app.services.series_ops import fetch_series, build_indicators
-from app.db import engine
+from app.services.series_ops_async import (fetch_series, build_indicators, fetch_series_many, build_indicators_many,
+                                           fetch_series_columns, build_indicator_columns)
+from app.services.screener import screen_async
+from app.services import company_index, price_bus, read_ops_async
+from app.config import settings
 
-@router.get("/stocks/{ticker}/series")
-def get_series(ticker: str, date_from: str = Query(..., alias="from"), date_to: str = Query(..., alias="to")):
-    return fetch_series(engine, ticker, date_from, date_to)
+# format=columnar：{"ticker", "dates": [epoch-day...], "close"/指標: [float32...]}，NaN → null；
+# 直接以 orjson 序列化 NumPy 陣列，不經 jsonable_encoder
+FORMAT_QUERY = Query("json", pattern="^(json|columnar)$", description="json（預設）| columnar")
+# timeframe：1d（預設，日 K 收盤）| 1w / 1M / 1Q（DB 端彙總的週 / 月 / 季 K，OHLCV；date 為週期第一天）
+TIMEFRAME_QUERY = Query("1d", pattern="^(1d|1w|1M|1Q)$", description="1d | 1w | 1M | 1Q")
+# max_points：點數超過時以 LTTB 依收盤降採樣，dates 與各欄同步挑點
+MAX_POINTS_QUERY = Query(None, ge=3, le=20000, description="降採樣後最多點數（LTTB）")
 
-@router.get("/stocks/{ticker}/indicators")
-def get_indicators(ticker: str, date_from: str = Query(..., alias="from"), date_to: str = Query(..., alias="to"),
-                   ma: str | None = "5,20,60", macd: str = "12,26,9", rsiperiod: int = 14, bb: str | None = "20,2"):
+BATCH_MAX_TICKERS = 200
+
+def _batch_tickers(tickers: str | None, sector: str | None) -> list[str] | None:
+    ts = [t.strip() for t in tickers.split(",") if t.strip()] if tickers else None
+    if not ts and not sector:
+        raise HTTPException(status_code=400, detail="tickers or sector is required")
+    if ts and sector:
+        raise HTTPException(status_code=400, detail="tickers and sector are mutually exclusive")
+    if ts and len(ts) > BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"at most {BATCH_MAX_TICKERS} tickers per request")
+    return ts
+
+def _indicator_cfg(ma: str | None, macd: str | None, bb: str | None):
     ma_windows = [int(x) for x in ma.split(",")] if ma else None
     macd_cfg = tuple(int(x) for x in macd.split(",")) if macd else None
     bb_cfg = tuple(float(x) for x in bb.split(",")) if bb else None
-    return build_indicators(engine, ticker, date_from, date_to, ma_windows, macd_cfg, rsiperiod, bb_cfg)
+    return ma_windows, macd_cfg, bb_cfg
+
+# ETag / Cache-Control / 304 由 app.http_cache 的 middleware 統一處理（不必先跑查詢再雜湊內容）
+def _columnar_response(payload) -> Response:
+    return Response(content=orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), media_type="application/json")
+
+# 批次：/stocks/series 與單檔的 /stocks/{ticker}/series 段數不同，不會互相吃到
+@router.get("/stocks/series")
+async def get_series_batch(tickers: str | None = Query(None, description="comma-separated tickers"),
+                     sector: str | None = None,
+                     date_from: str = Query(..., alias="from"), date_to: str = Query(..., alias="to")):
+    return await fetch_series_many(async_engine, date_from, date_to, tickers=_batch_tickers(tickers, sector), sector=sector)
+
+@router.get("/stocks/indicators")
+async def get_indicators_batch(tickers: str | None = Query(None, description="comma-separated tickers"),
+                         sector: str | None = None,
+                         date_from: str = Query(..., alias="from"), date_to: str = Query(..., alias="to"),
+                         ma: str | None = "5,20,60", macd: str = "12,26,9", rsiperiod: int = 14, bb: str | None = "20,2"):
+    ma_windows, macd_cfg, bb_cfg = _indicator_cfg(ma, macd, bb)
+    return await build_indicators_many(async_engine, date_from, date_to, tickers=_batch_tickers(tickers, sector), sector=sector,
+                                 ma_windows=ma_windows, macd_cfg=macd_cfg, rsi_period=rsiperiod, bb_cfg=bb_cfg)
+
+@router.get("/stocks/{ticker}/series")
+async def get_series(ticker: str, date_from: str = Query(..., alias="from"), date_to: str = Query(..., alias="to"),
+                     format: str = FORMAT_QUERY, timeframe: str = TIMEFRAME_QUERY, max_points: int | None = MAX_POINTS_QUERY):
+    if format == "columnar":
+        return _columnar_response(await fetch_series_columns(async_engine, ticker, date_from, date_to, timeframe, max_points))
+    return await fetch_series(async_engine, ticker, date_from, date_to, timeframe, max_points)
+
+@router.get("/stocks/{ticker}/indicators")
+async def get_indicators(ticker: str, date_from: str = Query(..., alias="from"), date_to: str = Query(..., alias="to"),
+                   ma: str | None = "5,20,60", macd: str = "12,26,9", rsiperiod: int = 14, bb: str | None = "20,2",
+                   format: str = FORMAT_QUERY, timeframe: str = TIMEFRAME_QUERY, max_points: int | None = MAX_POINTS_QUERY):
+    ma_windows, macd_cfg, bb_cfg = _indicator_cfg(ma, macd, bb)
+    if format == "columnar":
+        return _columnar_response(await build_indicator_columns(
+            async_engine, ticker, date_from, date_to, ma_windows, macd_cfg, rsiperiod, bb_cfg, timeframe, max_points))
+    return await build_indicators(async_engine, ticker, date_from, date_to, ma_windows, macd_cfg, rsiperiod, bb_cfg,
+                                  timeframe, max_points)
+
+@router.get("/screener")
+async def get_screener(where: str | None = Query(None, description="e.g. close>ma20,rsi14<30"),
+                       date: str | None = Query(None, description="YYYY-MM-DD（預設最新交易日）"),
+                       sector: str | None = None,
+                       sort: str | None = Query(None, description="欄位名，前綴 - 為遞減，e.g. -chg_pct"),
+                       limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """單日全市場截面篩選（指標為預設參數的物化值）。"""
+    try:
+        return await screen_async(async_engine, date, where, sector, sort, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/search")
+async def search_companies(q: str = Query(..., min_length=1, max_length=50),
+                           limit: int = Query(10, ge=1, le=50)):
+    """公司 typeahead：代號前綴、名稱子字串、拼音 / 注音（記憶體索引，不查 DB）。"""
+    return await company_index.search(async_engine, q, limit)
+
+@router.get("/stocks/{ticker}/price/stream")
+async def stream_price(request: Request, ticker: str):
+    """最新價 SSE：先送目前值，之後每次入庫 commit 推一筆（event: price）；閒置時送 heartbeat 註解行。"""
+    px = await read_ops_async.latest_price(async_engine, ticker)
+    d = await read_ops_async.last_price_date(async_engine, ticker)
+    if px is None or d is None:
+        raise HTTPException(status_code=404, detail="price not found or NULL")
+
+    async def events():
+        sub = price_bus.subscribe(ticker, {"trade_date": d, "price": px, "ts": None})
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                msg = await sub.get(timeout=settings.PRICE_STREAM_HEARTBEAT_SEC)
+                if sub.closed:
+                    # 公司已刪除：告知前端後結束（EventSource 收到 deleted 後自行 close，不再重連）
+                    yield "event: deleted\ndata: {}\n\n"
+                    break
+                if msg is None:
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {msg['trade_date']}\nevent: price\ndata: {orjson.dumps(msg).decode()}\n\n"
+        finally:
+            price_bus.unsubscribe(sub)
+
+    # X-Accel-Buffering：nginx 預設會緩衝回應，SSE 要關掉
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
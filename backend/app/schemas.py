@@ -12,6 +12,7 @@ class PriceOut(BaseModel):
     ticker: str
     price: float
     ts: int
+    trade_date: str | None = None   # 價格所屬交易日；ts 只是回應時間，判斷價格是否變動看這個
 
 class CompanyOut(BaseModel):
     ticker: str
@@ -0,0 +1,75 @@
+# path: backend/app/services/cache.py
+# 行程內快取：有上限（LRU）+ TTL + 命中統計；write_ops 寫入後主動失效。
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+from app.config import settings
+
+_MISSING = object()
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int, ttl_sec: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or item[0] < now:
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_sec, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """keys 為 None 時清空整個快取。"""
+        with self._lock:
+            if keys is None:
+                self._data.clear()
+                return
+            for k in keys:
+                self._data.pop(k, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "ttl_sec": self.ttl_sec,
+                    "hits": self.hits, "misses": self.misses}
+
+# ticker → company_id；公司很少被刪，TTL 拉長
+company_ids = TTLCache("company_ids", settings.CACHE_MAXSIZE, settings.CACHE_TTL_SEC * 10)
+# ticker → 最新收盤價 / 最新交易日（isoformat）
+latest_close = TTLCache("latest_close", settings.CACHE_MAXSIZE, settings.CACHE_TTL_SEC)
+last_date = TTLCache("last_date", settings.CACHE_MAXSIZE, settings.CACHE_TTL_SEC)
+
+_ALL = (company_ids, latest_close, last_date)
+
+def invalidate_prices(tickers: Optional[Iterable[str]] = None) -> None:
+    """價格異動：清掉最新價 / 最新日期；tickers 為 None 代表全部。"""
+    ts = None if tickers is None else list(tickers)
+    latest_close.invalidate(ts)
+    last_date.invalidate(ts)
+
+def invalidate_company(ticker: str) -> None:
+    for c in _ALL:
+        c.invalidate([ticker])
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {c.name: c.stats() for c in _ALL}
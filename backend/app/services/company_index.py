@@ -0,0 +1,156 @@
+# path: backend/app/services/company_index.py
+# 公司搜尋（typeahead）用的行程內索引：companies 只有幾千列，整份放記憶體，/api/search 不碰 DB。
+# - 代號：前綴 / 子字串
+# - 名稱：NFKC + casefold 後做子字串（全形英數、大小寫不敏感）
+# - 拼音 / 注音：全拼（taijidian）、首字母（tjd）、無聲調注音（ㄊㄞㄐㄧㄉㄧㄢ）與注音首字（ㄊㄐㄉ）
+# write_ops 新增 / 刪除公司後 invalidate()，下一次搜尋重新載入；另有 TTL 接住其他行程（腳本）的寫入。
+from __future__ import annotations
+import asyncio
+import heapq
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import anyio
+from pypinyin import Style, lazy_pinyin
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+
+_SEP = "\x1f"
+_TONES = str.maketrans("", "", "ˉˊˇˋ˙")
+
+# 排名（越小越前面）：(欄位, 比對種類) → rank；種類 0 = 整串相等、1 = 前綴、2 = 子字串
+_RANK = {
+    ("ticker", 0): 0, ("ticker", 1): 1,
+    ("name", 0): 2, ("name", 1): 3,
+    ("phonetic", 0): 4, ("phonetic", 1): 4,
+    ("name", 2): 5, ("ticker", 2): 6, ("phonetic", 2): 7,
+}
+# 依 rank 由小到大的查找順序
+_STAGES = (("ticker", "prefix"), ("name", "prefix"), ("phonetic", "prefix"),
+           ("name", "substring"), ("ticker", "substring"), ("phonetic", "substring"))
+
+def normalize(s: Optional[str]) -> str:
+    """全形轉半形、大小寫不敏感、去掉控制字元與前後空白。"""
+    s = unicodedata.normalize("NFKC", s or "").casefold()
+    return "".join(ch for ch in s if ch.isprintable()).strip()
+
+def phonetic_keys(name: str) -> List[str]:
+    """名稱 → 拼音 / 注音鍵（全拼、首字母、無聲調注音、注音首字）；非中文的片段原樣保留。"""
+    if not name:
+        return []
+    keys = [
+        "".join(lazy_pinyin(name)),
+        "".join(lazy_pinyin(name, style=Style.FIRST_LETTER)),
+        "".join(lazy_pinyin(name, style=Style.BOPOMOFO)).translate(_TONES),
+        "".join(lazy_pinyin(name, style=Style.BOPOMOFO_FIRST)),
+    ]
+    out: List[str] = []
+    for k in (normalize(k).replace(" ", "") for k in keys):
+        if k and k != name and k not in out:
+            out.append(k)
+    return out
+
+class _Field:
+    """一個欄位的所有鍵：排序陣列給前綴（bisect），串成一條的字串給子字串（str.find 在 C 層掃）。"""
+
+    def __init__(self, pairs: Iterable[Tuple[str, int]]):
+        pairs = sorted((k, o) for k, o in pairs if k)
+        self.keys = [k for k, _ in pairs]
+        self.owners = [o for _, o in pairs]
+        self.starts: List[int] = []
+        pos = 0
+        for k in self.keys:
+            self.starts.append(pos)
+            pos += len(k) + 1
+        self.text = _SEP.join(self.keys)
+
+    def prefix(self, q: str) -> Iterator[Tuple[int, int]]:
+        """產出 (owner, 種類)：0 = 整串相等、1 = 前綴。"""
+        i = bisect_left(self.keys, q)
+        while i < len(self.keys) and self.keys[i].startswith(q):
+            yield self.owners[i], 0 if len(self.keys[i]) == len(q) else 1
+            i += 1
+
+    def substring(self, q: str) -> Iterator[Tuple[int, int]]:
+        """產出 (owner, 2)；開頭就相符的已由 prefix 處理，略過。"""
+        i = self.text.find(q)
+        while i != -1:
+            k = bisect_right(self.starts, i) - 1
+            if i != self.starts[k]:
+                yield self.owners[k], 2
+            i = self.text.find(q, i + 1)
+
+class CompanyIndex:
+    def __init__(self, rows: List[Dict[str, Any]], phonetics: Dict[str, List[str]]):
+        self.rows = rows
+        self.fields = {
+            "ticker": _Field((normalize(r["ticker"]), i) for i, r in enumerate(rows)),
+            "name": _Field((normalize(r["name"]), i) for i, r in enumerate(rows)),
+            "phonetic": _Field((k, i) for i, r in enumerate(rows) for k in phonetics.get(r["name"] or "", [])),
+        }
+
+    def search(self, q: str, limit: int = 10) -> List[Dict[str, Any]]:
+        q = normalize(q)
+        if not q:
+            return []
+        best: Dict[int, int] = {}
+        for field, mode in _STAGES:
+            f = self.fields[field]
+            needle = q.replace(" ", "") if field == "phonetic" else q
+            for owner, kind in (f.prefix(needle) if mode == "prefix" else f.substring(needle)):
+                rank = _RANK[(field, kind)]
+                if rank < best.get(owner, 99):
+                    best[owner] = rank
+            # 各階段的 rank 遞增：湊滿 limit 筆後，後面的階段不可能再擠進前 limit 名
+            if len(best) >= limit:
+                break
+        rows = self.rows
+        top = heapq.nsmallest(limit, best, key=lambda i: (best[i], len(rows[i]["ticker"]), rows[i]["ticker"]))
+        return [rows[i] for i in top]
+
+# ----- 行程內單例 -----
+
+_index: Optional[CompanyIndex] = None
+_loaded_at = 0.0
+_stale = True
+_lock = asyncio.Lock()
+_phonetic_memo: Dict[str, List[str]] = {}  # 名稱 → 拼音鍵；重新載入時只算新名稱
+
+def invalidate() -> None:
+    """公司新增 / 刪除 / 改名後呼叫；下一次搜尋重新載入。"""
+    global _stale
+    _stale = True
+
+def _load_tx(conn: Connection) -> List[Dict[str, Any]]:
+    rows = conn.execute(text("SELECT ticker, name, sector FROM companies ORDER BY ticker")).mappings().all()
+    return [dict(r) for r in rows]
+
+def _build(rows: List[Dict[str, Any]]) -> CompanyIndex:
+    names = {r["name"] for r in rows if r["name"]}
+    for n in names - _phonetic_memo.keys():
+        _phonetic_memo[n] = phonetic_keys(n)
+    return CompanyIndex(rows, {n: _phonetic_memo[n] for n in names})
+
+async def get_index(aengine: AsyncEngine) -> CompanyIndex:
+    global _index, _loaded_at, _stale
+    if _index is not None and not _stale and time.monotonic() - _loaded_at < settings.SEARCH_INDEX_TTL_SEC:
+        return _index
+    async with _lock:
+        if _index is None or _stale or time.monotonic() - _loaded_at >= settings.SEARCH_INDEX_TTL_SEC:
+            _stale = False
+            try:
+                async with aengine.begin() as conn:
+                    rows = await conn.run_sync(_load_tx)
+                # 拼音轉換是純 CPU，第一次載入幾千個名稱約數百毫秒，丟 worker thread
+                _index = await anyio.to_thread.run_sync(_build, rows)
+            except Exception:
+                _stale = True
+                raise
+            _loaded_at = time.monotonic()
+    return _index
+
+async def search(aengine: AsyncEngine, q: str, limit: int = 10) -> List[Dict[str, Any]]:
+    return (await get_index(aengine)).search(q, limit)
@@ -0,0 +1,42 @@
+# path: backend/app/services/downsample.py
+# 圖表用的伺服端降採樣：Largest-Triangle-Three-Buckets（LTTB）。
+# 只挑「保留折線外型」的點的 index，呼叫端再用同一組 index 同步切 dates 與各指標陣列。
+from __future__ import annotations
+from typing import Any
+import numpy as np
+
+def lttb_indices(y: np.ndarray, n: int) -> np.ndarray:
+    """回傳要保留的 index（遞增，含頭尾，最多 n 個，n >= 3）。x 軸為交易日序號；y 中的 NaN 不參與挑選。"""
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(y))
+    if n >= len(valid):
+        return valid
+    xs = valid.astype(np.float64)
+    ys = y[valid]
+    m = len(ys)
+    # 中間 m-2 點切成 n-2 桶；每桶的平均點一次用 reduceat 算好（向量化），迴圈只剩逐桶 argmax
+    edges = np.linspace(1, m - 1, n - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(xs[:-1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(ys[:-1], edges[:-1]) / counts
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, m - 1
+    a = 0
+    for b in range(n - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # 下一桶的平均點；最後一桶對最後一點
+        cx, cy = (avg_x[b + 1], avg_y[b + 1]) if b + 1 < n - 2 else (xs[-1], ys[-1])
+        area = np.abs((xs[a] - cx) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (cy - ys[a]))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return valid[out]
+
+def take(payload: Any, idx: np.ndarray, length: int) -> Any:
+    """把 payload（dict / list / ndarray 巢狀）中長度為 length 的陣列都切成 idx；其他值（ticker 等）原樣保留。"""
+    if isinstance(payload, dict):
+        return {k: take(v, idx, length) for k, v in payload.items()}
+    if isinstance(payload, np.ndarray) and payload.ndim == 1 and len(payload) == length:
+        return payload[idx]
+    if isinstance(payload, list) and len(payload) == length:
+        return [payload[i] for i in idx.tolist()]
+    return payload
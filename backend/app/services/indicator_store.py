@@ -0,0 +1,218 @@
+# path: backend/app/services/indicator_store.py
+# 預設參數（MA 5/20/60、MACD 12,26,9、RSI 14、BB 20,2）的指標物化表 indicator_daily。
+# write_ops 寫入 / 刪除日K 時，在同一個交易內從「最早異動日」往後增量更新：
+#   EMA 接續前一日存下的 ema12 / ema26 / signal 狀態，MA / RSI / BB 只需異動日前最多 TAIL 筆收盤（滑動視窗），
+# 不重算整段歷史。預設參數的讀取變成單純的區間掃描；其他參數仍走 series_ops 即時計算。
+# 注意：物化值的 EMA 從該檔第一筆資料起算，與即時計算（只往前暖身 4 倍週期）會有極小差異（< 0.1%）。
+from __future__ import annotations
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from .ta import sma_array, ema_array, rsi_array, bollinger_array
+
+MA_WINDOWS = (5, 20, 60)
+MACD_CFG = (12, 26, 9)
+RSI_PERIOD = 14
+BB_CFG = (20, 2.0)
+# 增量更新時，異動日之前要帶的收盤筆數（最長視窗）
+TAIL = max(MA_WINDOWS[-1], RSI_PERIOD + 1, BB_CFG[0])
+
+COLUMNS = ("ma5", "ma20", "ma60", "ema12", "ema26", "macd_dif", "macd_signal", "macd_hist",
+           "rsi14", "bb_mid", "bb_upper", "bb_lower")
+
+_FULL = date(1, 1, 1)  # 「從頭重算」的異動日
+
+def _ensure_indicator_tx(conn: Connection) -> None:
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS indicator_daily (
+            company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+            trade_date DATE    NOT NULL,
+            {", ".join(f"{c} DOUBLE PRECISION" for c in COLUMNS)},
+            PRIMARY KEY (company_id, trade_date)
+        );
+    """))
+    # 截面查詢（screener：某一天的全市場）
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_indicator_daily_date ON indicator_daily(trade_date)"))
+
+def is_default(ma_windows, macd_cfg, rsi_period, bb_cfg) -> bool:
+    """請求的參數是否都能由物化表提供（MA 可為 5/20/60 的子集，其餘為預設值或不要求）。"""
+    if ma_windows and not set(int(w) for w in ma_windows) <= set(MA_WINDOWS):
+        return False
+    if macd_cfg and tuple(int(x) for x in macd_cfg) != MACD_CFG:
+        return False
+    if rsi_period and int(rsi_period) != RSI_PERIOD:
+        return False
+    if bb_cfg and (int(bb_cfg[0]), float(bb_cfg[1])) != BB_CFG:
+        return False
+    return True
+
+# ----- 計算 -----
+
+def _compute(tail: np.ndarray, new: np.ndarray, state: Optional[Tuple[float, float, float]]) -> Dict[str, np.ndarray]:
+    """tail：異動日前的收盤（最多 TAIL 筆）；new：異動日起的收盤；state：前一日的 (ema12, ema26, signal)。
+       回傳與 new 等長的各欄陣列。"""
+    x = np.concatenate([tail, new])
+    n0 = len(tail)
+    out: Dict[str, np.ndarray] = {f"ma{w}": sma_array(x, w)[n0:] for w in MA_WINDOWS}
+    f, s, sg = MACD_CFG
+    e_f = ema_array(new, f, seed=state[0] if state else None)
+    e_s = ema_array(new, s, seed=state[1] if state else None)
+    dif = e_f - e_s
+    sig = ema_array(dif, sg, seed=state[2] if state else None)
+    out.update(ema12=e_f, ema26=e_s, macd_dif=dif, macd_signal=sig, macd_hist=dif - sig)
+    out["rsi14"] = rsi_array(x, RSI_PERIOD)[n0:]
+    bb = bollinger_array(x, BB_CFG[0], BB_CFG[1])
+    out.update(bb_mid=bb["mid"][n0:], bb_upper=bb["upper"][n0:], bb_lower=bb["lower"][n0:])
+    return out
+
+# ----- 增量更新（給 write_ops 在同一個交易內呼叫）-----
+
+# pg_advisory_xact_lock(ns, company_id) 的命名空間，和其他 advisory lock 分開
+_LOCK_NS = 16
+
+def _table_exists(conn: Connection) -> bool:
+    return conn.execute(text("SELECT to_regclass('indicator_daily') IS NOT NULL")).scalar()
+
+def _load_inputs(conn: Connection, since: Dict[int, date]):
+    cids = list(since)
+    ds = [since[c] for c in cids]
+    heads = conn.execute(text("""
+        SELECT c.cid, s.trade_date, s.ema12, s.ema26, s.macd_signal, t.last_date, t.closes
+        FROM unnest(CAST(:cids AS int[]), CAST(:ds AS date[])) AS c(cid, d)
+        LEFT JOIN LATERAL (
+            SELECT trade_date, ema12, ema26, macd_signal FROM indicator_daily
+            WHERE company_id = c.cid AND trade_date < c.d
+            ORDER BY trade_date DESC LIMIT 1
+        ) s ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT MAX(trade_date) AS last_date, array_agg(close::float8 ORDER BY trade_date) AS closes
+            FROM (SELECT trade_date, close FROM daily_price
+                  WHERE company_id = c.cid AND trade_date < c.d
+                  ORDER BY trade_date DESC LIMIT :tail) x
+        ) t ON TRUE
+    """), {"cids": cids, "ds": ds, "tail": TAIL}).all()
+    news = conn.execute(text("""
+        SELECT dp.company_id, array_agg(dp.trade_date ORDER BY dp.trade_date), array_agg(dp.close::float8 ORDER BY dp.trade_date)
+        FROM daily_price dp
+        JOIN unnest(CAST(:cids AS int[]), CAST(:ds AS date[])) AS c(cid, d)
+          ON dp.company_id = c.cid AND dp.trade_date >= c.d
+        GROUP BY dp.company_id
+    """), {"cids": cids, "ds": ds}).all()
+    return heads, {cid: (dates, closes) for cid, dates, closes in news}
+
+def _lock_companies_tx(conn: Connection, cids) -> None:
+    """同一檔的重算序列化到交易結束（依 company_id 排序取鎖，避免互鎖）。
+       兩個交易同時寫同一檔（不同月份的回補單位、重疊的 /prices/bulk）時，後到的會等前一個 commit，
+       再以已提交的價格與 EMA 狀態重算；否則兩邊的 INSERT 會撞 PK，後 commit 的那邊也會用到過時的狀態。"""
+    conn.execute(text("""
+        SELECT pg_advisory_xact_lock(:ns, cid)
+        FROM (SELECT cid FROM unnest(CAST(:cids AS int[])) AS cid ORDER BY cid) x
+    """), {"ns": _LOCK_NS, "cids": sorted(cids)})
+
+def _refresh_tx(conn: Connection, since: Dict[int, date]) -> int:
+    """since：{company_id: 最早異動日}。刪掉各檔異動日起的物化列，再從異動日往後重算寫回。回傳寫入列數。"""
+    if not since or not _table_exists(conn):
+        return 0
+    # 先取鎖再讀輸入：READ COMMITTED 下取鎖後的查詢才看得到前一個寫入者已提交的結果
+    _lock_companies_tx(conn, since)
+    heads, news = _load_inputs(conn, since)
+    redo: Dict[int, date] = {}
+    rows: Dict[str, List[Any]] = {"cids": [], "ds": [], **{c: [] for c in COLUMNS}}
+    for cid, s_date, e12, e26, sig, last_date, tail in heads:
+        if tail and s_date != last_date:
+            # 異動日前有價格、卻沒有對應的狀態列（物化表建立前的舊資料）→ 這檔整段重算
+            redo[cid] = _FULL
+            continue
+        dates, closes = news.get(cid, ([], []))
+        if not dates:
+            continue
+        state = (e12, e26, sig) if tail else None
+        cols = _compute(np.asarray(tail or [], dtype=np.float64), np.asarray(closes, dtype=np.float64), state)
+        rows["cids"] += [cid] * len(dates)
+        rows["ds"] += dates
+        for c in COLUMNS:
+            rows[c] += [None if np.isnan(v) else float(v) for v in cols[c].tolist()]
+    conn.execute(text("""
+        DELETE FROM indicator_daily i
+        USING unnest(CAST(:cids AS int[]), CAST(:ds AS date[])) AS c(cid, d)
+        WHERE i.company_id = c.cid AND i.trade_date >= c.d
+    """), {"cids": [c for c in since if c not in redo], "ds": [since[c] for c in since if c not in redo]})
+    n = 0
+    if rows["cids"]:
+        conn.execute(text(f"""
+            INSERT INTO indicator_daily (company_id, trade_date, {", ".join(COLUMNS)})
+            SELECT * FROM unnest(
+                CAST(:cids AS int[]), CAST(:ds AS date[]),
+                {", ".join(f"CAST(:{c} AS float8[])" for c in COLUMNS)}
+            )
+        """), rows)
+        n = len(rows["cids"])
+    return n + (_refresh_tx(conn, redo) if redo else 0)
+
+def company_since(pairs, ids: Dict[str, int]) -> Dict[int, date]:
+    """[(ticker, trade_date), ...] → {company_id: 最早異動日}。"""
+    since: Dict[int, date] = {}
+    for t, d in pairs:
+        cid = ids[t]
+        d = date.fromisoformat(str(d)[:10])
+        if cid not in since or d < since[cid]:
+            since[cid] = d
+    return since
+
+def rebuild(engine: Engine, tickers: Optional[List[str]] = None, chunk: int = 100) -> int:
+    """整段重算（初次建立物化表、或手動修復）；tickers 為 None 代表全部公司。每 chunk 檔一個交易。"""
+    with engine.begin() as conn:
+        _ensure_indicator_tx(conn)
+        cids = conn.execute(text("""
+            SELECT id FROM companies WHERE CAST(:ts AS text[]) IS NULL OR ticker = ANY(:ts) ORDER BY id
+        """), {"ts": tickers}).scalars().all()
+    n = 0
+    for i in range(0, len(cids), chunk):
+        with engine.begin() as conn:
+            n += _refresh_tx(conn, {int(c): _FULL for c in cids[i:i + chunk]})
+    return n
+
+# ----- 讀取 -----
+
+def _read_tx(conn: Connection, ticker: str, date_from: str, date_to: str) -> Optional[Tuple[List[date], Dict[str, List[Optional[float]]]]]:
+    """[from, to] 的物化指標；有任何一天缺物化列（尚未建立 / 更新中）回 None，呼叫端改即時計算。"""
+    if not _table_exists(conn):
+        return None
+    rows = conn.execute(text(f"""
+        SELECT dp.trade_date, i.company_id IS NOT NULL AS ok, dp.close::float8, {", ".join(f"i.{c}" for c in COLUMNS)}
+        FROM companies c
+        JOIN daily_price dp ON dp.company_id = c.id
+        LEFT JOIN indicator_daily i ON i.company_id = dp.company_id AND i.trade_date = dp.trade_date
+        WHERE c.ticker = :t AND dp.trade_date BETWEEN :f AND :to
+        ORDER BY dp.trade_date
+    """), {"t": ticker, "f": date_from, "to": date_to}).all()
+    if not all(r[1] for r in rows):
+        return None
+    dates = [r[0] for r in rows]
+    # close 一併帶回（降採樣挑點用），shape() 不會輸出它
+    cols = {"close": [r[2] for r in rows], **{c: [r[3 + i] for r in rows] for i, c in enumerate(COLUMNS)}}
+    return dates, cols
+
+def read(engine: Engine, ticker: str, date_from: str, date_to: str):
+    with engine.begin() as conn:
+        return _read_tx(conn, ticker, date_from, date_to)
+
+async def read_async(aengine: AsyncEngine, ticker: str, date_from: str, date_to: str):
+    async with aengine.begin() as conn:
+        return await conn.run_sync(_read_tx, ticker, date_from, date_to)
+
+def shape(cols: Dict[str, Any], ma_windows, macd_cfg, rsi_period, bb_cfg) -> Dict[str, Any]:
+    """物化欄位 → 與 series_ops 相同的指標結構（ma / macd / rsi / bb），只放有要求的部分。"""
+    p: Dict[str, Any] = {}
+    if ma_windows:
+        p["ma"] = {str(w): cols[f"ma{int(w)}"] for w in ma_windows}
+    if macd_cfg:
+        p["macd"] = {"dif": cols["macd_dif"], "signal": cols["macd_signal"], "hist": cols["macd_hist"]}
+    if rsi_period:
+        p["rsi"] = cols["rsi14"]
+    if bb_cfg:
+        p["bb"] = {"mid": cols["bb_mid"], "upper": cols["bb_upper"], "lower": cols["bb_lower"]}
+    return p
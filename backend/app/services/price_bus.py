@@ -0,0 +1,120 @@
+# path: backend/app/services/price_bus.py
+# 行程內的最新價 pub/sub：每個 ticker 一個 topic，write_ops commit 後 publish，
+# /api/stocks/{ticker}/price/stream（SSE）訂閱。開再多個儀表板，每次入庫也只是一次 publish，不再輪詢 DB。
+# - coalescing / 背壓：每個訂閱者只有一格「最新值」，慢的訂閱者直接跳過中間值，記憶體不會無限累積。
+# - 沒有訂閱者的 ticker，publish 只是一次 dict 查找。
+# - 只涵蓋本行程的寫入；其他行程（ETL 腳本）的寫入要靠 DB 端通知轉進來。
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+class Subscription:
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self._latest: Optional[Dict[str, Any]] = None
+        self._event = asyncio.Event()
+        self.closed = False   # ticker 被刪除：串流端送完結束事件後關閉
+
+    def offer(self, msg: Dict[str, Any]) -> None:
+        # 只留最新一筆：還沒被取走的舊值直接覆蓋
+        self._latest = msg
+        self._event.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """等下一筆；timeout 到了回 None（呼叫端拿來送 heartbeat）。"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._event.clear()
+        msg, self._latest = self._latest, None
+        return msg
+
+_topics: Dict[str, Set[Subscription]] = {}
+_last: Dict[str, Dict[str, Any]] = {}      # 有訂閱者的 ticker → 最後一筆送出的值（新訂閱者的起始值、擋掉較舊日期的回補）
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+def subscribe(ticker: str, snapshot: Optional[Dict[str, Any]] = None) -> Subscription:
+    """在 event loop 內呼叫。snapshot 為 DB 讀到的目前最新值（{trade_date, price}），比 topic 上的新時採用。"""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    sub = Subscription(ticker)
+    with _lock:
+        _topics.setdefault(ticker, set()).add(sub)
+        if snapshot is not None and _newer(snapshot, _last.get(ticker)):
+            _last[ticker] = {"ticker": ticker, **snapshot}
+        if ticker in _last:
+            sub.offer(_last[ticker])
+    return sub
+
+def unsubscribe(sub: Subscription) -> None:
+    with _lock:
+        subs = _topics.get(sub.ticker)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        if not subs:
+            del _topics[sub.ticker]
+            _last.pop(sub.ticker, None)
+
+def _newer(msg: Dict[str, Any], prev: Optional[Dict[str, Any]]) -> bool:
+    return prev is None or msg["trade_date"] >= prev["trade_date"]
+
+def _deliver(msg: Dict[str, Any]) -> None:
+    with _lock:
+        subs = _topics.get(msg["ticker"])
+        if not subs or not _newer(msg, _last.get(msg["ticker"])):
+            return
+        _last[msg["ticker"]] = msg
+        subs = list(subs)
+    for sub in subs:
+        sub.offer(msg)
+
+def _drop(ticker: str) -> None:
+    with _lock:
+        subs = _topics.pop(ticker, set())
+        _last.pop(ticker, None)
+    for sub in subs:
+        sub.closed = True
+        sub._event.set()
+
+def _call_in_loop(fn, *args) -> None:
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        fn(*args)
+    else:
+        loop.call_soon_threadsafe(fn, *args)
+
+def drop(ticker: str) -> None:
+    """公司刪除後呼叫：拿掉 topic 與最後值，通知訂閱者結束；可在 event loop 內或 worker thread 中呼叫。"""
+    if ticker in _topics:
+        _call_in_loop(_drop, ticker)
+
+def publish(ticker: str, trade_date: str, price: float) -> None:
+    """commit 後呼叫；可在 event loop 內或 worker thread 中呼叫。"""
+    if ticker not in _topics:
+        return
+    msg = {"ticker": ticker, "trade_date": str(trade_date), "price": float(price), "ts": int(time.time() * 1000)}
+    _call_in_loop(_deliver, msg)
+
+def publish_rows(merged: Dict[tuple, Dict[str, Any]]) -> None:
+    """upsert_ohlcv 的合併結果：每檔取本批有收盤價的最新一天。"""
+    latest: Dict[str, tuple] = {}
+    for (t, d), row in merged.items():
+        if t in _topics and row.get("close") is not None and (t not in latest or d > latest[t][0]):
+            latest[t] = (d, row["close"])
+    for t, (d, px) in latest.items():
+        publish(t, d, px)
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {"topics": len(_topics), "subscribers": sum(len(s) for s in _topics.values())}
@@ -0,0 +1,139 @@
+# path: backend/app/services/price_notify.py
+# 跨行程的價格異動通知：Postgres LISTEN/NOTIFY（channel price_updated）。
+# - 寫入端：write_ops 的 _xxx_tx 在同一個交易內 pg_notify，commit 才送出、rollback 不送；
+#   payload 列出異動的 (ticker, 起日, 迄日, 迄日收盤)，超過 NOTIFY 上限（8000 bytes）時切成多則。
+# - 公司刪除另送 {"deleted": ticker}：其他行程丟掉 ticker→id 快取（否則下一次寫入會拿舊 id 撞外鍵）、最新價與推播 topic。
+# - 接收端：API 啟動時開一條 LISTEN 連線（不佔 pool），把通知轉成 cache 失效與 price_bus 推播；
+#   scheduler / 腳本 / 其他 uvicorn worker 的寫入因此也能即時反映，不必輪詢。
+# - 自己送出的通知略過：本行程的 write_ops 已在 commit 後直接失效 / 推播。
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+import orjson
+import psycopg
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, make_url
+from app.config import settings
+from . import cache, company_index, price_bus
+
+log = logging.getLogger("fin-api")
+
+CHANNEL = "price_updated"
+_MAX_PAYLOAD = 7500
+# 每個行程（含每個 uvicorn worker）一個來源 id
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+# ----- 寫入端（在寫入交易內呼叫）-----
+
+def _payloads(rows: Optional[List[list]]) -> Iterator[str]:
+    if rows is None:
+        yield orjson.dumps({"o": ORIGIN, "r": None}).decode()
+        return
+    chunk: List[list] = []
+    size = 0
+    for r in rows:
+        n = len(orjson.dumps(r)) + 1
+        if chunk and size + n > _MAX_PAYLOAD:
+            yield orjson.dumps({"o": ORIGIN, "r": chunk}).decode()
+            chunk, size = [], 0
+        chunk.append(r)
+        size += n
+    if chunk:
+        yield orjson.dumps({"o": ORIGIN, "r": chunk}).decode()
+
+def _notify_tx(conn: Connection, rows: Optional[List[list]]) -> None:
+    """rows：[[ticker, 起日, 迄日, 迄日收盤或 None], ...]；None 代表全部 ticker。"""
+    if not settings.PRICE_NOTIFY_ENABLED:
+        return
+    for p in _payloads(rows):
+        conn.execute(text("SELECT pg_notify(:ch, :p)"), {"ch": CHANNEL, "p": p})
+
+def _notify_company_deleted_tx(conn: Connection, ticker: str) -> None:
+    """公司連同價格刪除：其他行程要丟掉 ticker→id、最新價與推播 topic。"""
+    if not settings.PRICE_NOTIFY_ENABLED:
+        return
+    conn.execute(text("SELECT pg_notify(:ch, :p)"),
+                 {"ch": CHANNEL, "p": orjson.dumps({"o": ORIGIN, "deleted": ticker}).decode()})
+
+def rows_from_merged(merged: Dict[tuple, Dict[str, Any]]) -> List[list]:
+    """upsert_ohlcv 的合併結果 → 每檔一列（日期範圍 + 範圍內最後一天的收盤）。"""
+    span: Dict[str, list] = {}
+    for (t, d), row in merged.items():
+        r = span.get(t)
+        if r is None:
+            span[t] = [t, d, d, row.get("close")]
+            continue
+        if d < r[1]:
+            r[1] = d
+        if d > r[2]:
+            r[2], r[3] = d, row.get("close")
+    return [[t, lo, hi, None if px is None else float(px)] for t, lo, hi, px in span.values()]
+
+# ----- 接收端（API 行程）-----
+
+def _apply(payload: str) -> None:
+    msg = orjson.loads(payload)
+    if msg.get("o") == ORIGIN:
+        return
+    if "deleted" in msg:
+        t = msg["deleted"]
+        cache.invalidate_company(t)
+        company_index.invalidate()
+        price_bus.drop(t)
+        return
+    rows = msg.get("r")
+    if rows is None:
+        cache.invalidate_prices(None)
+        return
+    cache.invalidate_prices({r[0] for r in rows})
+    for t, _lo, hi, px in rows:
+        if px is not None:
+            price_bus.publish(t, hi, px)
+
+def _dsn() -> str:
+    return make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+async def _listen_forever() -> None:
+    delay = 1.0
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(_dsn(), autocommit=True) as conn:
+                await conn.execute(f"LISTEN {CHANNEL}")
+                log.info("listening on %s (origin %s)", CHANNEL, ORIGIN)
+                delay = 1.0
+                # 斷線期間可能漏掉通知：（重新）連上後先整體失效一次（含公司刪除對應的 ticker→id）
+                cache.invalidate_prices(None)
+                cache.company_ids.invalidate()
+                async for n in conn.notifies():
+                    try:
+                        _apply(n.payload)
+                    except Exception as e:
+                        log.warning("bad %s payload: %s", CHANNEL, e)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("%s listener disconnected, retry in %.0fs: %s", CHANNEL, delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+_task: Optional[asyncio.Task] = None
+
+def start() -> None:
+    global _task
+    if settings.PRICE_NOTIFY_ENABLED and _task is None:
+        _task = asyncio.get_running_loop().create_task(_listen_forever())
+
+async def stop() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
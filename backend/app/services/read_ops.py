@@ -1,80 +1,254 @@
 # path: backend/app/services/read_ops.py
 from __future__ import annotations
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import date, timedelta
+import numpy as np
 from sqlalchemy import text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, Connection
+from . import cache
+from .trading_calendar import TRADING_DAYS_SQL
 
-def list_companies(engine: Engine, q: Optional[str], limit: int, offset: int) -> List[Dict[str, Any]]:
-    with engine.begin() as conn:
-        if q:
-            rows = conn.execute(text("""
-                SELECT ticker, name, sector
-                FROM companies
-                WHERE ticker ILIKE :kw OR name ILIKE :kw
-                ORDER BY ticker ASC
-                LIMIT :limit OFFSET :offset
-            """), {"kw": f"%{q}%", "limit": limit, "offset": offset}).mappings().all()
-        else:
-            rows = conn.execute(text("""
-                SELECT ticker, name, sector
-                FROM companies
-                ORDER BY ticker ASC
-                LIMIT :limit OFFSET :offset
-            """), {"limit": limit, "offset": offset}).mappings().all()
+# 每個查詢分成 _xxx_tx(conn, ...)（只負責 SQL，可被 read_ops_async 以 run_sync 重用）
+# 與同步包裝 xxx(engine, ...)（開交易、處理快取）。
+
+def _list_companies_tx(conn: Connection, q: Optional[str], limit: int, offset: int,
+                       after: Optional[str] = None) -> List[Dict[str, Any]]:
+    """依 ticker 排序的公司清單。after 為游標（上一頁最後一個 ticker，keyset 分頁，不受深度影響）；
+       offset 保留給舊呼叫端。q 全為數字時走代號前綴（ticker text_pattern_ops 索引），
+       其餘對 ticker / name 做 ILIKE '%q%'（pg_trgm GIN 索引）。"""
+    conds, params = [], {"limit": limit, "offset": 0 if after is not None else offset}
+    if q and q.isdigit():
+        conds.append("ticker LIKE :prefix")
+        params["prefix"] = q + "%"
+    elif q:
+        conds.append("(ticker ILIKE :kw OR name ILIKE :kw)")
+        params["kw"] = f"%{q}%"
+    if after is not None:
+        conds.append("ticker > :after")
+        params["after"] = after
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    rows = conn.execute(text(f"""
+        SELECT ticker, name, sector
+        FROM companies
+        {where}
+        ORDER BY ticker ASC
+        LIMIT :limit OFFSET :offset
+    """), params).mappings().all()
     return [dict(r) for r in rows]
 
+def list_companies(engine: Engine, q: Optional[str], limit: int, offset: int,
+                   after: Optional[str] = None) -> List[Dict[str, Any]]:
+    with engine.begin() as conn:
+        return _list_companies_tx(conn, q, limit, offset, after)
+
+
+def _last_price_date_tx(conn: Connection, ticker: str) -> Optional[str]:
+    row = conn.execute(text("""
+        SELECT dp.trade_date
+        FROM companies c
+        JOIN daily_price dp ON dp.company_id = c.id
+        WHERE c.ticker = :t
+        ORDER BY dp.trade_date DESC
+        LIMIT 1
+    """), {"t": ticker}).mappings().first()
+    return row["trade_date"].isoformat() if row else None
+
 def last_price_date(engine: Engine, ticker: str) -> Optional[str]:
+    hit = cache.last_date.get(ticker)
+    if hit is not None:
+        return hit
     with engine.begin() as conn:
-        row = conn.execute(text("""
-            SELECT dp.trade_date
-            FROM companies c
-            JOIN daily_price dp ON dp.company_id = c.id
-            WHERE c.ticker = :t
-            ORDER BY dp.trade_date DESC
+        d = _last_price_date_tx(conn, ticker)
+    if d is not None:
+        cache.last_date.set(ticker, d)
+    return d
+
+def _latest_price_tx(conn: Connection, ticker: str) -> Optional[float]:
+    row = conn.execute(text("""
+        SELECT dp.close
+        FROM companies c
+        JOIN LATERAL (
+            SELECT close FROM daily_price
+            WHERE company_id = c.id
+            ORDER BY trade_date DESC
             LIMIT 1
-        """), {"t": ticker}).mappings().first()
-    return row["trade_date"].isoformat() if row else None
+        ) dp ON TRUE
+        WHERE c.ticker = :t
+    """), {"t": ticker}).mappings().first()
+    return float(row["close"]) if row and row["close"] is not None else None
 
 def latest_price(engine: Engine, ticker: str) -> Optional[float]:
+    hit = cache.latest_close.get(ticker)
+    if hit is not None:
+        return hit
     with engine.begin() as conn:
-        row = conn.execute(text("""
-            SELECT dp.close
-            FROM companies c
-            JOIN LATERAL (
-                SELECT close FROM daily_price
-                WHERE company_id = c.id
-                ORDER BY trade_date DESC
-                LIMIT 1
-            ) dp ON TRUE
-            WHERE c.ticker = :t
-        """), {"t": ticker}).mappings().first()
-    return float(row["close"]) if row and row["close"] is not None else None
+        px = _latest_price_tx(conn, ticker)
+    if px is not None:
+        cache.latest_close.set(ticker, px)
+    return px
+
+def _latest_fundamental_tx(conn: Connection, ticker: str) -> Optional[dict]:
+    row = conn.execute(text("""
+        SELECT c.ticker, c.name, c.sector, f.pe, f.pb
+        FROM companies c
+        LEFT JOIN LATERAL (
+            SELECT pe, pb
+            FROM fundamentals f
+            WHERE f.company_id = c.id
+            ORDER BY fiscal_year DESC, fiscal_quarter DESC
+            LIMIT 1
+        ) f ON TRUE
+        WHERE c.ticker = :t
+    """), {"t": ticker}).mappings().first()
+    return dict(row) if row else None
 
 def latest_fundamental(engine: Engine, ticker: str) -> Optional[dict]:
     with engine.begin() as conn:
-        row = conn.execute(text("""
-            SELECT c.ticker, c.name, c.sector, f.pe, f.pb
-            FROM companies c
-            LEFT JOIN LATERAL (
-                SELECT pe, pb
-                FROM fundamentals f
-                WHERE f.company_id = c.id
-                ORDER BY fiscal_year DESC, fiscal_quarter DESC
-                LIMIT 1
-            ) f ON TRUE
-            WHERE c.ticker = :t
-        """), {"t": ticker}).mappings().first()
-    return dict(row) if row else None
+        return _latest_fundamental_tx(conn, ticker)
 
 
-def get_close_series(engine: Engine, ticker: str, date_from: str, date_to: str) -> List[Dict[str, Any]]:
+def _get_close_series_tx(conn: Connection, ticker: str, date_from: str, date_to: str, lookback: int = 0) -> List[Dict[str, Any]]:
+    """[from, to] 的收盤序列；lookback > 0 時同一個查詢再多帶 from 之前最近的 lookback 筆（指標暖身用）。"""
     sql = """
-        SELECT dp.trade_date::text AS date, dp.close::float AS close
+        SELECT x.date, x.close FROM (
+            (SELECT dp.trade_date, dp.trade_date::text AS date, dp.close::float AS close
+             FROM daily_price dp
+             JOIN companies c ON c.id = dp.company_id
+             WHERE c.ticker = :t AND dp.trade_date < :f
+             ORDER BY dp.trade_date DESC
+             LIMIT :lb)
+            UNION ALL
+            (SELECT dp.trade_date, dp.trade_date::text AS date, dp.close::float AS close
+             FROM daily_price dp
+             JOIN companies c ON c.id = dp.company_id
+             WHERE c.ticker = :t AND dp.trade_date BETWEEN :f AND :to)
+        ) x
+        ORDER BY x.trade_date
+    """
+    rows = conn.execute(text(sql), {"t": ticker, "f": date_from, "to": date_to, "lb": max(0, int(lookback))}).mappings().all()
+    return [dict(r) for r in rows]
+
+def _get_close_columns_tx(conn: Connection, ticker: str, date_from: str, date_to: str,
+                          lookback: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """同 _get_close_series_tx，但回傳平行陣列 (epoch-day int32, close float64)；
+       DB 端 array_agg 成一列，不逐列建 dict、不把日期轉字串。"""
+    sql = """
+        SELECT array_agg(x.trade_date - DATE '1970-01-01' ORDER BY x.trade_date),
+               array_agg(x.close ORDER BY x.trade_date)
+        FROM (
+            (SELECT dp.trade_date, dp.close::float8 AS close
+             FROM daily_price dp
+             JOIN companies c ON c.id = dp.company_id
+             WHERE c.ticker = :t AND dp.trade_date < :f
+             ORDER BY dp.trade_date DESC
+             LIMIT :lb)
+            UNION ALL
+            (SELECT dp.trade_date, dp.close::float8 AS close
+             FROM daily_price dp
+             JOIN companies c ON c.id = dp.company_id
+             WHERE c.ticker = :t AND dp.trade_date BETWEEN :f AND :to)
+        ) x
+    """
+    days, closes = conn.execute(text(sql), {"t": ticker, "f": date_from, "to": date_to, "lb": max(0, int(lookback))}).one()
+    return (np.asarray(days or [], dtype=np.int32),
+            np.asarray([np.nan if v is None else v for v in closes or []], dtype=np.float64))
+
+def get_close_columns(engine: Engine, ticker: str, date_from: str, date_to: str,
+                      lookback: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    with engine.begin() as conn:
+        return _get_close_columns_tx(conn, ticker, date_from, date_to, lookback)
+
+def get_close_series(engine: Engine, ticker: str, date_from: str, date_to: str, lookback: int = 0) -> List[Dict[str, Any]]:
+    with engine.begin() as conn:
+        return _get_close_series_tx(conn, ticker, date_from, date_to, lookback)
+
+def _get_close_series_many_tx(conn: Connection, date_from: str, date_to: str, tickers: Optional[List[str]] = None,
+                          sector: Optional[str] = None, lookback: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    """多檔收盤序列，一次查詢；以 tickers 或 sector 選公司。回傳 {ticker: [{date, close}, ...]}。"""
+    where = "c.ticker = ANY(:ts)" if tickers else "c.sector = :sector"
+    sql = f"""
+        SELECT c.ticker, dp.trade_date::text AS date, dp.close::float AS close
+        FROM companies c
+        JOIN LATERAL (
+            (SELECT trade_date, close FROM daily_price
+             WHERE company_id = c.id AND trade_date < :f
+             ORDER BY trade_date DESC
+             LIMIT :lb)
+            UNION ALL
+            (SELECT trade_date, close FROM daily_price
+             WHERE company_id = c.id AND trade_date BETWEEN :f AND :to)
+        ) dp ON TRUE
+        WHERE {where}
+        ORDER BY c.ticker, dp.trade_date
+    """
+    params = {"f": date_from, "to": date_to, "lb": max(0, int(lookback)), "ts": list(tickers or []), "sector": sector}
+    out: Dict[str, List[Dict[str, Any]]] = {t: [] for t in (tickers or [])}
+    for t, d, px in conn.execute(text(sql), params):
+        out.setdefault(t, []).append({"date": d, "close": px})
+    return out
+
+def get_close_series_many(engine: Engine, date_from: str, date_to: str, tickers: Optional[List[str]] = None,
+                          sector: Optional[str] = None, lookback: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    with engine.begin() as conn:
+        return _get_close_series_many_tx(conn, date_from, date_to, tickers, sector, lookback)
+
+# 重新取樣的 K 棒週期 → Postgres date_trunc 單位（週一為一週起點，與 date.weekday() 一致）
+TIMEFRAMES = {"1w": "week", "1M": "month", "1Q": "quarter"}
+
+def period_start(d: str, timeframe: str, back: int = 0) -> date:
+    """d 所在週期的第一天；back > 0 時再往前推 back 個週期。"""
+    x = date.fromisoformat(str(d)[:10])
+    if timeframe == "1w":
+        return x - timedelta(days=x.weekday() + 7 * back)
+    step = 3 if timeframe == "1Q" else 1
+    m = (x.year * 12 + x.month - 1) // step * step - back * step
+    return date(m // 12, m % 12 + 1, 1)
+
+def _get_bars_tx(conn: Connection, ticker: str, date_from: str, date_to: str, timeframe: str,
+                 lookback: int = 0) -> List[Dict[str, Any]]:
+    """週 / 月 / 季 K：DB 端依 date_trunc 分組彙總 OHLCV（首開、最高、最低、末收、量加總），
+       沿 PK (company_id, trade_date) 做區間掃描。date 為週期第一天；lookback 為 from 之前多帶的週期數。"""
+    sql = """
+        SELECT date_trunc(:unit, dp.trade_date)::date::text AS date,
+               ((array_agg(dp.open  ORDER BY dp.trade_date)      FILTER (WHERE dp.open  IS NOT NULL))[1])::float8 AS open,
+               MAX(dp.high)::float8 AS high,
+               MIN(dp.low)::float8  AS low,
+               ((array_agg(dp.close ORDER BY dp.trade_date DESC) FILTER (WHERE dp.close IS NOT NULL))[1])::float8 AS close,
+               SUM(dp.volume)::float8 AS volume
         FROM daily_price dp
         JOIN companies c ON c.id = dp.company_id
-        WHERE c.ticker = :t AND dp.trade_date BETWEEN :f AND :to
-        ORDER BY dp.trade_date
+        WHERE c.ticker = :t AND dp.trade_date >= :lo AND dp.trade_date <= :to
+        GROUP BY 1
+        ORDER BY 1
     """
-    with engine.begin() as conn:
-        rows = conn.execute(text(sql), {"t": ticker, "f": date_from, "to": date_to}).mappings().all()
+    lo = period_start(date_from, timeframe, max(0, int(lookback)))
+    rows = conn.execute(text(sql), {"unit": TIMEFRAMES[timeframe], "t": ticker, "lo": lo, "to": date_to}).mappings().all()
     return [dict(r) for r in rows]
+
+def get_bars(engine: Engine, ticker: str, date_from: str, date_to: str, timeframe: str,
+             lookback: int = 0) -> List[Dict[str, Any]]:
+    with engine.begin() as conn:
+        return _get_bars_tx(conn, ticker, date_from, date_to, timeframe, lookback)
+
+def _missing_price_months_tx(conn: Connection, date_from: str, date_to: str,
+                             tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """缺口偵測（一條 SQL）：公司 × 交易日曆，anti-join daily_price，依 (ticker, 月份) 彙整缺的日期。
+       回傳 [{ticker, month: "YYYY-MM", days: ["YYYY-MM-DD", ...]}]，依月份再依代號排序。"""
+    only = "AND c.ticker = ANY(:ts)" if tickers else ""
+    sql = f"""
+        WITH days AS ({TRADING_DAYS_SQL})
+        SELECT c.ticker, to_char(d.d, 'YYYY-MM') AS month, array_agg(d.d::text ORDER BY d.d) AS days
+        FROM companies c
+        CROSS JOIN days d
+        LEFT JOIN daily_price dp ON dp.company_id = c.id AND dp.trade_date = d.d
+        WHERE dp.company_id IS NULL {only}
+        GROUP BY c.ticker, month
+        ORDER BY month, c.ticker
+    """
+    rows = conn.execute(text(sql), {"cal_from": date_from, "cal_to": date_to, "ts": list(tickers or [])}).all()
+    return [{"ticker": t, "month": m, "days": list(ds)} for t, m, ds in rows]
+
+def missing_price_months(engine: Engine, date_from: str, date_to: str,
+                         tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    with engine.begin() as conn:
+        return _missing_price_months_tx(conn, date_from, date_to, tickers)
@@ -0,0 +1,60 @@
+# path: backend/app/services/read_ops_async.py
+# read_ops 的 async 版：SQL 沿用 read_ops._xxx_tx，透過 AsyncConnection.run_sync 在 psycopg async 連線上執行。
+# 快取命中時不向 pool 借連線。
+from __future__ import annotations
+from typing import Optional, List, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncEngine
+from . import cache
+from . import read_ops as ro
+
+async def list_companies(aengine: AsyncEngine, q: Optional[str], limit: int, offset: int,
+                         after: Optional[str] = None) -> List[Dict[str, Any]]:
+    async with aengine.begin() as conn:
+        return await conn.run_sync(ro._list_companies_tx, q, limit, offset, after)
+
+async def last_price_date(aengine: AsyncEngine, ticker: str) -> Optional[str]:
+    hit = cache.last_date.get(ticker)
+    if hit is not None:
+        return hit
+    async with aengine.begin() as conn:
+        d = await conn.run_sync(ro._last_price_date_tx, ticker)
+    if d is not None:
+        cache.last_date.set(ticker, d)
+    return d
+
+async def latest_price(aengine: AsyncEngine, ticker: str) -> Optional[float]:
+    hit = cache.latest_close.get(ticker)
+    if hit is not None:
+        return hit
+    async with aengine.begin() as conn:
+        px = await conn.run_sync(ro._latest_price_tx, ticker)
+    if px is not None:
+        cache.latest_close.set(ticker, px)
+    return px
+
+async def latest_fundamental(aengine: AsyncEngine, ticker: str) -> Optional[dict]:
+    async with aengine.begin() as conn:
+        return await conn.run_sync(ro._latest_fundamental_tx, ticker)
+
+async def get_close_series(aengine: AsyncEngine, ticker: str, date_from: str, date_to: str, lookback: int = 0) -> List[Dict[str, Any]]:
+    async with aengine.begin() as conn:
+        return await conn.run_sync(ro._get_close_series_tx, ticker, date_from, date_to, lookback)
+
+async def get_close_columns(aengine: AsyncEngine, ticker: str, date_from: str, date_to: str, lookback: int = 0):
+    async with aengine.begin() as conn:
+        return await conn.run_sync(ro._get_close_columns_tx, ticker, date_from, date_to, lookback)
+
+async def get_close_series_many(aengine: AsyncEngine, date_from: str, date_to: str, tickers: Optional[List[str]] = None,
+                                sector: Optional[str] = None, lookback: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    async with aengine.begin() as conn:
+        return await conn.run_sync(ro._get_close_series_many_tx, date_from, date_to, tickers, sector, lookback)
+
+async def get_bars(aengine: AsyncEngine, ticker: str, date_from: str, date_to: str, timeframe: str,
+                   lookback: int = 0) -> List[Dict[str, Any]]:
+    async with aengine.begin() as conn:
+        return await conn.run_sync(ro._get_bars_tx, ticker, date_from, date_to, timeframe, lookback)
+
+async def missing_price_months(aengine: AsyncEngine, date_from: str, date_to: str,
+                               tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    async with aengine.begin() as conn:
+        return await conn.run_sync(ro._missing_price_months_tx, date_from, date_to, tickers)
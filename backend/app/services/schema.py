@@ -0,0 +1,217 @@
+# path: backend/app/services/schema.py
+# 唯一的建表 / 索引 / 分區管理（/api/admin/ensure_schema 與 scripts/init_db.py 都呼叫這裡），可重複執行。
+#
+# daily_price：
+#   - 新建時為依 trade_date 的年度 range 分區表（daily_price_y2024 ...）+ DEFAULT 分區接住範圍外的日期；
+#     既有的一般表不會自動搬，需手動跑 scripts/partition_daily_price.py（一次性、整表複製）。
+#   - PK (company_id, trade_date) INCLUDE (close)：單檔收盤序列可走 index-only scan。
+#   - (trade_date, company_id) INCLUDE (close)：「某一天全市場」的截面查詢與依日期區間的刪除。
+#     不用 BRIN：回補會打亂實體順序，BRIN 的區塊範圍很快就失去選擇性。
+from __future__ import annotations
+import logging
+from datetime import date
+from typing import List
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, Connection
+from app.config import settings
+from . import trading_calendar, indicator_store
+
+log = logging.getLogger("fin-api")
+
+PRICE_COLUMNS = ("company_id", "trade_date", "open", "high", "low", "close", "volume", "created_at")
+
+_DAILY_PRICE_COLUMNS_DDL = """
+    company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    trade_date DATE    NOT NULL,
+    open   NUMERIC(12,2),
+    high   NUMERIC(12,2),
+    low    NUMERIC(12,2),
+    close  NUMERIC(12,2),
+    volume BIGINT,
+    created_at TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (company_id, trade_date) INCLUDE (close)
+"""
+
+def _relkind(conn: Connection, name: str):
+    """'r' 一般表、'p' 分區表、None 不存在。"""
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:n)"), {"n": name}).scalar()
+
+# ----- companies / fundamentals -----
+
+def _ensure_companies_tx(conn: Connection) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS companies (
+            id      SERIAL PRIMARY KEY,
+            ticker  TEXT NOT NULL,
+            name    TEXT,
+            sector  TEXT
+        );
+    """))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_companies_ticker ON companies(ticker)"))
+    # 數字代號的前綴查詢（LIKE '23%'）；預設 collation 的 btree 用不到 LIKE
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_companies_ticker_prefix ON companies (ticker text_pattern_ops)"))
+    _ensure_trgm_tx(conn)
+
+def _ensure_trgm_tx(conn: Connection) -> None:
+    """ticker / name 的 ILIKE '%q%' 用 pg_trgm GIN 索引。沒有建 extension 的權限時略過（查詢照常，只是掃全表）。"""
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        log.warning("pg_trgm not available, company search falls back to sequential scan: %s", getattr(e, "orig", e))
+        return
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_companies_ticker_trgm ON companies USING gin (ticker gin_trgm_ops)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_companies_name_trgm ON companies USING gin (name gin_trgm_ops)"))
+
+def _ensure_fundamentals_tx(conn: Connection) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS fundamentals (
+            id SERIAL PRIMARY KEY,
+            company_id INT REFERENCES companies(id),
+            fiscal_year INT NOT NULL,
+            fiscal_quarter INT NOT NULL,
+            pe NUMERIC,
+            pb NUMERIC,
+            created_at TIMESTAMP DEFAULT now()
+        );
+    """))
+    conn.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_fundamentals_company_period
+        ON fundamentals (company_id, fiscal_year, fiscal_quarter)
+    """))
+
+# ----- daily_price -----
+
+def _partition_name(year: int) -> str:
+    return f"daily_price_y{year}"
+
+def _ensure_partition_tx(conn: Connection, year: int) -> bool:
+    """建立 year 的分區；DEFAULT 分區裡已有該年資料時先搬過去再 ATTACH。回傳是否新建。"""
+    name = _partition_name(year)
+    if _relkind(conn, name) is not None:
+        return False
+    lo, hi = date(year, 1, 1), date(year + 1, 1, 1)
+    conn.execute(text(f"CREATE TABLE {name} (LIKE daily_price INCLUDING DEFAULTS)"))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM daily_price_default WHERE trade_date >= :lo AND trade_date < :hi RETURNING *
+        )
+        INSERT INTO {name} ({", ".join(PRICE_COLUMNS)}) SELECT {", ".join(PRICE_COLUMNS)} FROM moved
+    """), {"lo": lo, "hi": hi})
+    conn.execute(text(f"ALTER TABLE daily_price ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')"))
+    return True
+
+def _partition_years_tx(conn: Connection) -> List[int]:
+    """要有分區的年份：設定的起始年（或 DEFAULT 分區裡最早的資料）到今年 + PRICE_PARTITIONS_AHEAD。"""
+    first = int(settings.PRICE_PARTITION_FIRST_YEAR)
+    lo = conn.execute(text("SELECT EXTRACT(YEAR FROM MIN(trade_date))::int FROM daily_price_default")).scalar()
+    hi = conn.execute(text("SELECT EXTRACT(YEAR FROM MAX(trade_date))::int FROM daily_price_default")).scalar()
+    last = date.today().year + int(settings.PRICE_PARTITIONS_AHEAD)
+    return list(range(min(first, lo or first), max(last, hi or last) + 1))
+
+def _ensure_partitions_tx(conn: Connection) -> List[str]:
+    """分區維護：補齊缺的年度分區。回傳新建的分區名稱。"""
+    if _relkind(conn, "daily_price") != "p":
+        return []
+    return [_partition_name(y) for y in _partition_years_tx(conn) if _ensure_partition_tx(conn, y)]
+
+def _create_daily_price_tx(conn: Connection, partitioned: bool) -> None:
+    if partitioned:
+        conn.execute(text(f"CREATE TABLE daily_price ({_DAILY_PRICE_COLUMNS_DDL}) PARTITION BY RANGE (trade_date)"))
+        conn.execute(text("CREATE TABLE daily_price_default PARTITION OF daily_price DEFAULT"))
+    else:
+        conn.execute(text(f"CREATE TABLE daily_price ({_DAILY_PRICE_COLUMNS_DDL})"))
+
+def _ensure_daily_price_tx(conn: Connection) -> None:
+    if _relkind(conn, "daily_price") is None:
+        _create_daily_price_tx(conn, settings.DAILY_PRICE_PARTITIONED)
+    else:
+        # 舊版一般表：補欄位與外鍵
+        conn.execute(text("""
+            ALTER TABLE daily_price
+              ADD COLUMN IF NOT EXISTS open   NUMERIC(12,2),
+              ADD COLUMN IF NOT EXISTS high   NUMERIC(12,2),
+              ADD COLUMN IF NOT EXISTS low    NUMERIC(12,2),
+              ADD COLUMN IF NOT EXISTS volume BIGINT,
+              ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
+        """))
+        conn.execute(text("""
+            DO $$
+            BEGIN
+              IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = 'daily_price'::regclass AND contype = 'f'
+              ) THEN
+                ALTER TABLE daily_price
+                  ADD CONSTRAINT fk_daily_price_company
+                  FOREIGN KEY (company_id) REFERENCES companies(id)
+                  ON DELETE CASCADE;
+              END IF;
+            END $$;
+        """))
+    _ensure_partitions_tx(conn)
+    _ensure_price_indexes_tx(conn)
+
+def _pk_covers_close(conn: Connection) -> bool:
+    return bool(conn.execute(text("""
+        SELECT i.indnatts > i.indnkeyatts FROM pg_index i
+        WHERE i.indrelid = 'daily_price'::regclass AND i.indisprimary
+    """)).scalar())
+
+def _ensure_price_indexes_tx(conn: Connection) -> None:
+    # 分區表上建的索引會自動建到每個分區（含之後新建的分區）
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_daily_price_date_company
+        ON daily_price (trade_date, company_id) INCLUDE (close)
+    """))
+    if not _pk_covers_close(conn):
+        # 舊表的 PK 沒有 INCLUDE，另建一個 covering 索引給收盤序列
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_daily_price_company_date_close
+            ON daily_price (company_id, trade_date) INCLUDE (close)
+        """))
+
+def _ensure_schema_tx(conn: Connection) -> None:
+    _ensure_companies_tx(conn)
+    _ensure_fundamentals_tx(conn)
+    _ensure_daily_price_tx(conn)
+    # 交易日曆（含內附假日表）
+    trading_calendar._ensure_calendar_tx(conn)
+    # 預設參數的物化指標（建表後以 /indicators/rebuild 補齊既有歷史）
+    indicator_store._ensure_indicator_tx(conn)
+
+def ensure_schema(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _ensure_schema_tx(conn)
+    trading_calendar.invalidate()
+
+# ----- 一般表 → 分區表（一次性）-----
+
+def partition_daily_price(engine: Engine) -> int:
+    """把既有的一般 daily_price 改成年度分區表：同一個交易內改名、建分區表、整表複製、刪舊表。
+       回傳搬移列數；已是分區表回 0。期間 daily_price 被鎖住，請在停寫時段執行。"""
+    with engine.begin() as conn:
+        if _relkind(conn, "daily_price") != "r":
+            return 0
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        conn.execute(text("LOCK TABLE daily_price IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text("ALTER TABLE daily_price RENAME TO daily_price_heap"))
+        # 索引名稱與新表衝突：舊表的索引先改名（連同 PK）
+        for (idx,) in conn.execute(text("""
+            SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = 'daily_price_heap'::regclass
+        """)).all():
+            conn.execute(text(f'ALTER INDEX {idx} RENAME TO "{idx.strip(chr(34))}_heap"'))
+        _create_daily_price_tx(conn, partitioned=True)
+        years = conn.execute(text("""
+            SELECT EXTRACT(YEAR FROM MIN(trade_date))::int, EXTRACT(YEAR FROM MAX(trade_date))::int FROM daily_price_heap
+        """)).one()
+        for y in range(years[0] or date.today().year, (years[1] or date.today().year) + 1):
+            _ensure_partition_tx(conn, y)
+        _ensure_partitions_tx(conn)
+        n = conn.execute(text(f"""
+            INSERT INTO daily_price ({", ".join(PRICE_COLUMNS)})
+            SELECT {", ".join(PRICE_COLUMNS)} FROM daily_price_heap
+        """)).rowcount
+        conn.execute(text("DROP TABLE daily_price_heap"))
+        _ensure_price_indexes_tx(conn)
+    return n
@@ -0,0 +1,105 @@
+# path: backend/app/services/screener.py
+# 截面選股：某一交易日、全市場（或單一產業）的 OHLCV + 物化指標（indicator_store）一次查出，
+# 條件 / 排序 / 分頁都在 DB 端完成，只回傳一頁。指標只支援預設參數（indicator_daily 的欄位）。
+from __future__ import annotations
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from .indicator_store import COLUMNS
+
+# 可用欄位 → SQL 運算式（白名單，條件字串不會直接進 SQL）
+FIELDS: Dict[str, str] = {
+    "open": "dp.open::float8", "high": "dp.high::float8", "low": "dp.low::float8",
+    "close": "dp.close::float8", "volume": "dp.volume::float8",
+    "chg_pct": "(dp.close / NULLIF(pv.close, 0) - 1)::float8 * 100",
+    **{c: f"i.{c}" for c in COLUMNS},
+}
+OPS = {"<": "<", "<=": "<=", ">": ">", ">=": ">=", "=": "=", "!=": "<>"}
+_COND = re.compile(r"^\s*([a-z_0-9]+)\s*(<=|>=|!=|<|>|=)\s*([a-z_0-9]+|-?\d+(?:\.\d+)?)\s*$")
+
+MAX_CONDITIONS = 10
+
+def parse_conditions(where: Optional[str]) -> Tuple[List[str], Dict[str, Any]]:
+    """'close>ma20,rsi14<30' → (SQL 片段, 綁定參數)。右邊可為欄位或數字；不合法丟 ValueError。"""
+    parts = [p for p in (where or "").split(",") if p.strip()]
+    if len(parts) > MAX_CONDITIONS:
+        raise ValueError(f"at most {MAX_CONDITIONS} conditions")
+    sqls: List[str] = []
+    params: Dict[str, Any] = {}
+    for k, p in enumerate(parts):
+        m = _COND.match(p.lower())
+        if not m:
+            raise ValueError(f"bad condition: {p.strip()}")
+        lhs, op, rhs = m.groups()
+        if lhs not in FIELDS:
+            raise ValueError(f"unknown field: {lhs}")
+        if rhs in FIELDS:
+            right = FIELDS[rhs]
+        else:
+            try:
+                params[f"v{k}"] = float(rhs)
+            except ValueError:
+                raise ValueError(f"unknown field: {rhs}")
+            right = f":v{k}"
+        sqls.append(f"{FIELDS[lhs]} {OPS[op]} {right}")
+    return sqls, params
+
+def parse_sort(sort: Optional[str]) -> str:
+    """'-rsi14' → 'rsi14 DESC'；預設依代號。"""
+    if not sort:
+        return "ticker"
+    desc = sort.startswith("-")
+    key = sort.lstrip("+-").lower()
+    if key != "ticker" and key not in FIELDS:
+        raise ValueError(f"unknown sort field: {key}")
+    return f"{key} {'DESC' if desc else 'ASC'} NULLS LAST, ticker"
+
+def _screen_tx(conn: Connection, on: Optional[str], where: Optional[str], sector: Optional[str],
+               sort: Optional[str], limit: int, offset: int) -> Dict[str, Any]:
+    conds, params = parse_conditions(where)
+    order = parse_sort(sort)
+    # on 不是交易日（或指標尚未算到）時，取 on 之前最近有物化指標的一天
+    d = conn.execute(text("""
+        SELECT MAX(trade_date) FROM indicator_daily
+        WHERE CAST(:on AS date) IS NULL OR trade_date <= CAST(:on AS date)
+    """), {"on": on}).scalar()
+    if d is None:
+        return {"date": None, "total": 0, "items": []}
+    if sector:
+        conds.append("c.sector = :sector")
+        params["sector"] = sector
+    rows = conn.execute(text(f"""
+        SELECT *, COUNT(*) OVER () AS _total FROM (
+            SELECT c.ticker, c.name, c.sector,
+                   {", ".join(f"{expr} AS {name}" for name, expr in FIELDS.items())}
+            FROM indicator_daily i
+            JOIN daily_price dp ON dp.company_id = i.company_id AND dp.trade_date = i.trade_date
+            JOIN companies c ON c.id = i.company_id
+            LEFT JOIN LATERAL (
+                SELECT close FROM daily_price
+                WHERE company_id = i.company_id AND trade_date < i.trade_date
+                ORDER BY trade_date DESC LIMIT 1
+            ) pv ON TRUE
+            WHERE i.trade_date = :d {"".join(f" AND ({c})" for c in conds)}
+        ) s
+        ORDER BY {order}
+        LIMIT :limit OFFSET :offset
+    """), {**params, "d": d, "limit": limit, "offset": offset}).mappings().all()
+    items = [dict(r) for r in rows]
+    total = items[0]["_total"] if items else 0
+    for it in items:
+        del it["_total"]
+    return {"date": d.isoformat(), "total": total, "items": items}
+
+def screen(engine: Engine, on: Optional[str] = None, where: Optional[str] = None, sector: Optional[str] = None,
+           sort: Optional[str] = None, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+    with engine.begin() as conn:
+        return _screen_tx(conn, on, where, sector, sort, limit, offset)
+
+async def screen_async(aengine: AsyncEngine, on: Optional[str] = None, where: Optional[str] = None,
+                       sector: Optional[str] = None, sort: Optional[str] = None,
+                       limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+    async with aengine.begin() as conn:
+        return await conn.run_sync(_screen_tx, on, where, sector, sort, limit, offset)
@@ -1,26 +1,216 @@
 # services/series_ops.py
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from bisect import bisect_left
+from datetime import date
+import numpy as np
 from sqlalchemy.engine import Engine
-from .read_ops import get_close_series
-from .ta import sma, macd as ta_macd, rsi, bollinger
+from .read_ops import get_close_series, get_close_series_many, get_close_columns, get_bars, period_start
+from .ta import sma_array, macd_array, rsi_array, bollinger_array, to_list
+from .downsample import lttb_indices, take
+from . import indicator_store
 
-def fetch_series(engine: Engine, ticker: str, date_from: str, date_to: str):
-    return get_close_series(engine, ticker, date_from, date_to)
+def _thin(payload: Any, closes, max_points: Optional[int]) -> Any:
+    """max_points 有給且點數超過時，依收盤挑 LTTB 點，payload 內所有等長陣列同步切（dates 與各線對齊）。"""
+    if not max_points or len(closes) <= max_points:
+        return payload
+    return take(payload, lttb_indices(_nan_array(closes, np.float64), max_points), len(closes))
 
-def build_indicators(engine: Engine, ticker: str, date_from: str, date_to: str,
-                     ma_windows=None, macd_cfg=(12,26,9), rsi_period=14, bb_cfg=(20,2)) -> Dict[str, Any]:
-    rows = get_close_series(engine, ticker, date_from, date_to)
-    dates = [r["date"] for r in rows]
-    closes = [float(r["close"]) for r in rows]
-    out: Dict[str, Any] = {"dates": dates}
+def _tail(closes, n: int):
+    """含暖身的收盤序列 → 與輸出等長的尾段（暖身一定在前面）。"""
+    return closes[len(closes) - n:]
+
+def fetch_series(engine: Engine, ticker: str, date_from: str, date_to: str, timeframe: str = "1d",
+                 max_points: Optional[int] = None):
+    # 日 K 只回收盤；週 / 月 / 季 K 回 DB 端彙總好的 OHLCV
+    if timeframe != "1d":
+        rows = get_bars(engine, ticker, date_from, date_to, timeframe)
+    else:
+        rows = get_close_series(engine, ticker, date_from, date_to)
+    return _thin(rows, [r["close"] for r in rows], max_points)
+
+# EMA 以第一筆當種子，需約 4 倍週期才收斂到與種子無關（殘差 < 0.1%）
+EMA_WARMUP_FACTOR = 4
+
+def warmup_bars(ma_windows=None, macd_cfg=None, rsi_period=None, bb_cfg=None) -> int:
+    """各指標在 from 之前需要的歷史筆數，取最大值。"""
+    need = [0]
     if ma_windows:
-        out["ma"] = {str(w): sma(closes, w) for w in ma_windows}
+        need.append(max(ma_windows) - 1)
+    if macd_cfg:
+        _, s, sg = macd_cfg
+        need.append(EMA_WARMUP_FACTOR * (int(s) + int(sg)))
+    if rsi_period:
+        need.append(int(rsi_period))
+    if bb_cfg:
+        need.append(int(bb_cfg[0]) - 1)
+    return max(need)
+
+def _indicator_arrays(closes: np.ndarray, ma_windows, macd_cfg, rsi_period, bb_cfg) -> Dict[str, Any]:
+    """closes 為 1-D 或 2-D（多檔 × 日期）；回傳 {"ma": {w: arr}, "macd": {...}, "rsi": arr, "bb": {...}}。"""
+    arrays: Dict[str, Any] = {}
+    if ma_windows:
+        arrays["ma"] = {str(w): sma_array(closes, w) for w in ma_windows}
     if macd_cfg:
         f,s,sg = macd_cfg
-        out["macd"] = ta_macd(closes, f, s, sg)
+        arrays["macd"] = macd_array(closes, f, s, sg)
     if rsi_period:
-        out["rsi"] = rsi(closes, rsi_period)
+        arrays["rsi"] = rsi_array(closes, rsi_period)
     if bb_cfg:
         w,k = bb_cfg
-        out["bb"] = bollinger(closes, int(w), float(k))
+        arrays["bb"] = bollinger_array(closes, int(w), float(k))
+    return arrays
+
+def _indicator_payloads(series: List[Tuple[List[str], List[float]]], date_from: str,
+                        ma_windows, macd_cfg, rsi_period, bb_cfg) -> List[Dict[str, Any]]:
+    """series 為 [(dates, closes), ...]（含暖身資料）。等長的序列疊成 2-D 一起算，再逐檔切回 from 之後。"""
+    out: List[Dict[str, Any]] = [{} for _ in series]
+    by_len: Dict[int, List[int]] = {}
+    for i, (dates, _) in enumerate(series):
+        by_len.setdefault(len(dates), []).append(i)
+    for idx in by_len.values():
+        closes = np.array([series[i][1] for i in idx], dtype=np.float64)
+        arrays = _indicator_arrays(closes, ma_windows, macd_cfg, rsi_period, bb_cfg)
+        for row, i in enumerate(idx):
+            dates = series[i][0]
+            cut = bisect_left(dates, date_from)
+            p: Dict[str, Any] = {"dates": dates[cut:]}
+            for name, v in arrays.items():
+                if isinstance(v, dict):
+                    p[name] = {k: to_list(a[row, cut:]) for k, a in v.items()}
+                else:
+                    p[name] = to_list(v[row, cut:])
+            out[i] = p
+    return out
+
+def _indicators_from_rows(rows: List[Dict[str, Any]], date_from: str,
+                          ma_windows, macd_cfg, rsi_period, bb_cfg) -> Dict[str, Any]:
+    dates = [r["date"] for r in rows]
+    closes = [r["close"] for r in rows]
+    return _indicator_payloads([(dates, closes)], date_from, ma_windows, macd_cfg, rsi_period, bb_cfg)[0]
+
+def _indicators_from_grouped(grouped: Dict[str, List[Dict[str, Any]]], date_from: str,
+                             ma_windows, macd_cfg, rsi_period, bb_cfg) -> Dict[str, Dict[str, Any]]:
+    names = list(grouped)
+    series = [([r["date"] for r in grouped[t]], [r["close"] for r in grouped[t]]) for t in names]
+    payloads = _indicator_payloads(series, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg)
+    return dict(zip(names, payloads))
+
+def _stored_payload(stored, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points: Optional[int] = None) -> Dict[str, Any]:
+    dates, cols = stored
+    p = {"dates": [d.isoformat() for d in dates], **indicator_store.shape(cols, ma_windows, macd_cfg, rsi_period, bb_cfg)}
+    return _thin(p, cols["close"], max_points)
+
+def _row_indicators(rows: List[Dict[str, Any]], date_from: str, ma_windows, macd_cfg, rsi_period, bb_cfg,
+                    max_points: Optional[int] = None) -> Dict[str, Any]:
+    """即時計算 + 降採樣（async 版整段丟 worker thread）。"""
+    p = _indicators_from_rows(rows, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg)
+    return _thin(p, _tail([r["close"] for r in rows], len(p["dates"])), max_points)
+
+def _bars_from(date_from: str, timeframe: str) -> str:
+    """重新取樣時，from 所在週期的第一天（指標切點與 K 棒的 date 對齊）。"""
+    return period_start(date_from, timeframe).isoformat()
+
+def build_indicators(engine: Engine, ticker: str, date_from: str, date_to: str,
+                     ma_windows=None, macd_cfg=(12,26,9), rsi_period=14, bb_cfg=(20,2),
+                     timeframe: str = "1d", max_points: Optional[int] = None) -> Dict[str, Any]:
+    # 週 / 月 / 季 K：指標直接算在彙總後的 K 棒上，暖身筆數即週期數
+    if timeframe != "1d":
+        lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+        rows = get_bars(engine, ticker, date_from, date_to, timeframe, lookback=lookback)
+        return _row_indicators(rows, _bars_from(date_from, timeframe), ma_windows, macd_cfg, rsi_period, bb_cfg, max_points)
+    # 預設參數先讀物化表；沒有完整覆蓋時才即時計算
+    if indicator_store.is_default(ma_windows, macd_cfg, rsi_period, bb_cfg):
+        stored = indicator_store.read(engine, ticker, date_from, date_to)
+        if stored is not None:
+            return _stored_payload(stored, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points)
+    # 同一查詢多抓暖身資料，算完再切掉 from 之前的部分
+    lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+    rows = get_close_series(engine, ticker, date_from, date_to, lookback=lookback)
+    return _row_indicators(rows, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points)
+
+def fetch_series_many(engine: Engine, date_from: str, date_to: str,
+                      tickers: Optional[List[str]] = None, sector: Optional[str] = None):
+    return get_close_series_many(engine, date_from, date_to, tickers=tickers, sector=sector)
+
+def build_indicators_many(engine: Engine, date_from: str, date_to: str,
+                          tickers: Optional[List[str]] = None, sector: Optional[str] = None,
+                          ma_windows=None, macd_cfg=(12,26,9), rsi_period=14, bb_cfg=(20,2)) -> Dict[str, Dict[str, Any]]:
+    lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+    grouped = get_close_series_many(engine, date_from, date_to, tickers=tickers, sector=sector, lookback=lookback)
+    return _indicators_from_grouped(grouped, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg)
+
+# ----- columnar（format=columnar）：平行陣列，日期為 epoch-day int32、數值 float32，NaN 由序列化端轉成 null -----
+
+EPOCH = date(1970, 1, 1)
+
+def epoch_day(d: str) -> int:
+    return (date.fromisoformat(d) - EPOCH).days
+
+def _series_columns(ticker: str, days: np.ndarray, closes: np.ndarray) -> Dict[str, Any]:
+    return {"ticker": ticker, "dates": days, "close": closes.astype(np.float32)}
+
+def _nan_array(values, dtype) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=dtype)
+
+def _bar_days(rows: List[Dict[str, Any]]) -> np.ndarray:
+    return np.array([epoch_day(r["date"]) for r in rows], dtype=np.int32)
+
+def _bar_columns(ticker: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """週 / 月 / 季 K → 平行陣列；volume 保留 float64（加總後超過 float32 的精確範圍）。"""
+    out: Dict[str, Any] = {"ticker": ticker, "dates": _bar_days(rows)}
+    for k in ("open", "high", "low", "close"):
+        out[k] = _nan_array([r[k] for r in rows], np.float32)
+    out["volume"] = _nan_array([r["volume"] for r in rows], np.float64)
     return out
+
+def _indicator_columns(ticker: str, days: np.ndarray, closes: np.ndarray, date_from: str,
+                       ma_windows, macd_cfg, rsi_period, bb_cfg) -> Dict[str, Any]:
+    cut = int(np.searchsorted(days, epoch_day(date_from)))
+    p: Dict[str, Any] = {"ticker": ticker, "dates": days[cut:]}
+    for name, v in _indicator_arrays(closes, ma_windows, macd_cfg, rsi_period, bb_cfg).items():
+        if isinstance(v, dict):
+            p[name] = {k: a[cut:].astype(np.float32) for k, a in v.items()}
+        else:
+            p[name] = v[cut:].astype(np.float32)
+    return p
+
+def _column_indicators(ticker: str, days: np.ndarray, closes: np.ndarray, date_from: str,
+                       ma_windows, macd_cfg, rsi_period, bb_cfg, max_points: Optional[int] = None) -> Dict[str, Any]:
+    p = _indicator_columns(ticker, days, closes, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg)
+    return _thin(p, _tail(closes, len(p["dates"])), max_points)
+
+def _stored_columns(ticker: str, stored, ma_windows, macd_cfg, rsi_period, bb_cfg,
+                    max_points: Optional[int] = None) -> Dict[str, Any]:
+    dates, cols = stored
+    def f32(v):
+        return _nan_array(v, np.float32)
+    p = indicator_store.shape(cols, ma_windows, macd_cfg, rsi_period, bb_cfg)
+    out: Dict[str, Any] = {"ticker": ticker, "dates": np.array([(d - EPOCH).days for d in dates], dtype=np.int32)}
+    for name, v in p.items():
+        out[name] = {k: f32(a) for k, a in v.items()} if isinstance(v, dict) else f32(v)
+    return _thin(out, cols["close"], max_points)
+
+def fetch_series_columns(engine: Engine, ticker: str, date_from: str, date_to: str,
+                         timeframe: str = "1d", max_points: Optional[int] = None) -> Dict[str, Any]:
+    if timeframe != "1d":
+        rows = get_bars(engine, ticker, date_from, date_to, timeframe)
+        return _thin(_bar_columns(ticker, rows), [r["close"] for r in rows], max_points)
+    days, closes = get_close_columns(engine, ticker, date_from, date_to)
+    return _thin(_series_columns(ticker, days, closes), closes, max_points)
+
+def build_indicator_columns(engine: Engine, ticker: str, date_from: str, date_to: str,
+                            ma_windows=None, macd_cfg=(12,26,9), rsi_period=14, bb_cfg=(20,2),
+                            timeframe: str = "1d", max_points: Optional[int] = None) -> Dict[str, Any]:
+    if timeframe != "1d":
+        lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+        rows = get_bars(engine, ticker, date_from, date_to, timeframe, lookback=lookback)
+        days, closes = _bar_days(rows), _nan_array([r["close"] for r in rows], np.float64)
+        date_from = _bars_from(date_from, timeframe)
+    else:
+        if indicator_store.is_default(ma_windows, macd_cfg, rsi_period, bb_cfg):
+            stored = indicator_store.read(engine, ticker, date_from, date_to)
+            if stored is not None:
+                return _stored_columns(ticker, stored, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points)
+        lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+        days, closes = get_close_columns(engine, ticker, date_from, date_to, lookback=lookback)
+    return _column_indicators(ticker, days, closes, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points)
@@ -0,0 +1,75 @@
+# path: backend/app/services/series_ops_async.py
+# series_ops 的 async 版：查詢走 async engine，指標計算（NumPy）丟到 worker thread，不卡 event loop。
+from __future__ import annotations
+from typing import Dict, Any, List, Optional
+from functools import partial
+import anyio
+from sqlalchemy.ext.asyncio import AsyncEngine
+from . import read_ops_async as ra
+from . import indicator_store
+import numpy as np
+from .series_ops import (warmup_bars, _indicators_from_grouped, _row_indicators, _column_indicators,
+                         _series_columns, _stored_payload, _stored_columns,
+                         _bars_from, _bar_days, _bar_columns, _nan_array, _thin)
+
+async def fetch_series(aengine: AsyncEngine, ticker: str, date_from: str, date_to: str, timeframe: str = "1d",
+                       max_points: Optional[int] = None):
+    if timeframe != "1d":
+        rows = await ra.get_bars(aengine, ticker, date_from, date_to, timeframe)
+    else:
+        rows = await ra.get_close_series(aengine, ticker, date_from, date_to)
+    return _thin(rows, [r["close"] for r in rows], max_points)
+
+async def build_indicators(aengine: AsyncEngine, ticker: str, date_from: str, date_to: str,
+                           ma_windows=None, macd_cfg=(12,26,9), rsi_period=14, bb_cfg=(20,2),
+                           timeframe: str = "1d", max_points: Optional[int] = None) -> Dict[str, Any]:
+    if timeframe != "1d":
+        lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+        rows = await ra.get_bars(aengine, ticker, date_from, date_to, timeframe, lookback=lookback)
+        return await anyio.to_thread.run_sync(
+            partial(_row_indicators, rows, _bars_from(date_from, timeframe), ma_windows, macd_cfg, rsi_period, bb_cfg, max_points))
+    if indicator_store.is_default(ma_windows, macd_cfg, rsi_period, bb_cfg):
+        stored = await indicator_store.read_async(aengine, ticker, date_from, date_to)
+        if stored is not None:
+            return _stored_payload(stored, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points)
+    lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+    rows = await ra.get_close_series(aengine, ticker, date_from, date_to, lookback=lookback)
+    return await anyio.to_thread.run_sync(
+        partial(_row_indicators, rows, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points))
+
+async def fetch_series_many(aengine: AsyncEngine, date_from: str, date_to: str,
+                            tickers: Optional[List[str]] = None, sector: Optional[str] = None):
+    return await ra.get_close_series_many(aengine, date_from, date_to, tickers=tickers, sector=sector)
+
+async def build_indicators_many(aengine: AsyncEngine, date_from: str, date_to: str,
+                                tickers: Optional[List[str]] = None, sector: Optional[str] = None,
+                                ma_windows=None, macd_cfg=(12,26,9), rsi_period=14, bb_cfg=(20,2)) -> Dict[str, Dict[str, Any]]:
+    lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+    grouped = await ra.get_close_series_many(aengine, date_from, date_to, tickers=tickers, sector=sector, lookback=lookback)
+    return await anyio.to_thread.run_sync(
+        partial(_indicators_from_grouped, grouped, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg))
+
+async def fetch_series_columns(aengine: AsyncEngine, ticker: str, date_from: str, date_to: str,
+                               timeframe: str = "1d", max_points: Optional[int] = None) -> Dict[str, Any]:
+    if timeframe != "1d":
+        rows = await ra.get_bars(aengine, ticker, date_from, date_to, timeframe)
+        return _thin(_bar_columns(ticker, rows), [r["close"] for r in rows], max_points)
+    days, closes = await ra.get_close_columns(aengine, ticker, date_from, date_to)
+    return _thin(_series_columns(ticker, days, closes), closes, max_points)
+
+async def build_indicator_columns(aengine: AsyncEngine, ticker: str, date_from: str, date_to: str,
+                                  ma_windows=None, macd_cfg=(12,26,9), rsi_period=14, bb_cfg=(20,2),
+                                  timeframe: str = "1d", max_points: Optional[int] = None) -> Dict[str, Any]:
+    lookback = warmup_bars(ma_windows, macd_cfg, rsi_period, bb_cfg)
+    if timeframe != "1d":
+        rows = await ra.get_bars(aengine, ticker, date_from, date_to, timeframe, lookback=lookback)
+        days, closes = _bar_days(rows), _nan_array([r["close"] for r in rows], np.float64)
+        date_from = _bars_from(date_from, timeframe)
+    else:
+        if indicator_store.is_default(ma_windows, macd_cfg, rsi_period, bb_cfg):
+            stored = await indicator_store.read_async(aengine, ticker, date_from, date_to)
+            if stored is not None:
+                return _stored_columns(ticker, stored, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points)
+        days, closes = await ra.get_close_columns(aengine, ticker, date_from, date_to, lookback=lookback)
+    return await anyio.to_thread.run_sync(
+        partial(_column_indicators, ticker, days, closes, date_from, ma_windows, macd_cfg, rsi_period, bb_cfg, max_points))
@@ -1,70 +1,124 @@
 # backend/app/services/ta.py
+# 技術指標（NumPy 版）：*_array 吃 1-D（單檔）或 2-D（多檔 × 日期，時間軸在最後一維），
+# 回傳 ndarray，暖身期為 NaN；同名的 list 版本回傳 JSON 友善的 list（NaN → None）。
 from __future__ import annotations
-from typing import List, Optional, Dict, Any
-import math
-
-def sma(values: List[float], window: int) -> List[Optional[float]]:
-    out: List[Optional[float]] = []
-    s = 0.0
-    q: List[float] = []
-    for v in values:
-        q.append(v); s += v
-        if len(q) < window:
-            out.append(None)
-        else:
-            if len(q) > window:
-                s -= q.pop(0)
-            out.append(s / window)
+from typing import List, Optional, Dict, Any, Sequence, Union
+import numpy as np
+
+ArrayLike = Union[Sequence[float], Sequence[Sequence[float]], np.ndarray]
+
+def _as_array(values: ArrayLike) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+def to_list(arr: np.ndarray) -> List[Any]:
+    """NaN → None 後轉 list（2-D 則為 list of lists）。"""
+    obj = arr.astype(object)
+    obj[np.isnan(arr)] = None
+    return obj.tolist()
+
+def _window_diff(c: np.ndarray, window: int) -> np.ndarray:
+    """累加和 c → 各視窗的和；前 window-1 個為 NaN。"""
+    out = np.full(c.shape, np.nan)
+    out[..., window - 1] = c[..., window - 1]
+    out[..., window:] = c[..., window:] - c[..., :-window]
     return out
 
-def ema(values: List[float], span: int) -> List[Optional[float]]:
-    out: List[Optional[float]] = []
-    k = 2 / (span + 1)
-    prev: Optional[float] = None
-    for v in values:
-        prev = v if prev is None else (v * k + prev * (1 - k))
-        out.append(prev)
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """沿最後一維做滑動視窗和，O(n)；前 window-1 個為 NaN。
+       缺值（close 為 NULL → NaN）只讓涵蓋它的視窗變 NaN，不會污染之後所有的值。"""
+    if window < 1:
+        raise ValueError("window must be >= 1")
+    if x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    missing = np.isnan(x)
+    out = _window_diff(np.cumsum(np.where(missing, 0.0, x), axis=-1), window)
+    if missing.any():
+        out[_window_diff(np.cumsum(missing, axis=-1, dtype=np.float64), window) > 0] = np.nan
     return out
 
-def macd(values: List[float], fast: int=12, slow: int=26, signal: int=9):
-    ef = ema(values, fast)
-    es = ema(values, slow)
-    dif: List[Optional[float]] = []
-    for a, b in zip(ef, es):
-        dif.append(None if a is None or b is None else a - b)
-    sig = ema([x if x is not None else 0.0 for x in dif], signal)
-    hist: List[Optional[float]] = []
-    for d, s in zip(dif, sig):
-        hist.append(None if d is None or s is None else d - s)
-    return {"dif": dif, "signal": sig, "hist": hist}
-
-def rsi(values: List[float], period: int=14) -> List[Optional[float]]:
-    out: List[Optional[float]] = []
-    gains: List[float] = []
-    losses: List[float] = []
-    prev = None
-    for i, v in enumerate(values):
-        if prev is None:
-            out.append(None); prev = v; continue
-        ch = v - prev; prev = v
-        gains.append(max(ch, 0.0)); losses.append(max(-ch, 0.0))
-        if i < period:
-            out.append(None); continue
-        ag = sum(gains[-period:]) / period
-        al = sum(losses[-period:]) / period
-        out.append(100.0 if al == 0 else (100 - (100 / (1 + ag / al))))
+def sma_array(values: ArrayLike, window: int) -> np.ndarray:
+    return _rolling_sum(_as_array(values), window) / window
+
+def ema_array(values: ArrayLike, span: int, seed: Optional[float] = None) -> np.ndarray:
+    # 遞迴式無法沿時間軸向量化；改成逐日一步、同時處理所有檔（2-D 時沿第 0 維向量化）
+    # seed：接續前一日的 EMA 狀態（僅 1-D）；預設以第一筆非缺值當種子
+    # 缺值（NaN）那天沿用前一日的 EMA，不讓之後的值全變 NaN（物化表存的狀態也因此不會斷）
+    x = _as_array(values)
+    out = np.empty_like(x)
+    if x.shape[-1] == 0:
+        return out
+    k = 2 / (span + 1)
+    if x.ndim == 1:
+        res: List[float] = []
+        prev = None if seed is None else float(seed)
+        for v in x.tolist():
+            if v == v:
+                prev = v if prev is None else v * k + prev * (1 - k)
+            res.append(np.nan if prev is None else prev)
+        return np.asarray(res, dtype=np.float64)
+    xt = np.ascontiguousarray(np.moveaxis(x, -1, 0))
+    ot = np.empty_like(xt)
+    prev = xt[0].copy()
+    ot[0] = prev
+    for i in range(1, xt.shape[0]):
+        v = xt[i]
+        step = np.where(np.isnan(prev), v, v * k + prev * (1 - k))
+        prev = np.where(np.isnan(v), prev, step)
+        ot[i] = prev
+    return np.moveaxis(ot, 0, -1)
+
+def macd_array(values: ArrayLike, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    x = _as_array(values)
+    dif = ema_array(x, fast) - ema_array(x, slow)
+    sig = ema_array(dif, signal)
+    return {"dif": dif, "signal": sig, "hist": dif - sig}
+
+def rsi_array(values: ArrayLike, period: int = 14) -> np.ndarray:
+    x = _as_array(values)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < 2:
+        return out
+    ch = np.diff(x, axis=-1)
+    gains = np.clip(ch, 0.0, None)
+    losses = np.clip(-ch, 0.0, None)
+    ag = _rolling_sum(gains, period) / period
+    al = _rolling_sum(losses, period) / period
+    # 視窗內完全沒有下跌 → 100；用整數計數判斷，避免累加誤差讓 0 變成極小值
+    no_loss = _rolling_sum((losses > 0).astype(np.float64), period) == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = 100 - (100 / (1 + ag / al))
+    out[..., 1:] = np.where(no_loss, 100.0, r)
+    out[..., 1:][np.isnan(ag)] = np.nan
     return out
 
-def bollinger(values: List[float], window: int=20, k: float=2.0):
-    mid = sma(values, window)
-    up: List[Optional[float]] = []; lo: List[Optional[float]] = []
-    for i in range(len(values)):
-        if i + 1 < window:
-            up.append(None); lo.append(None); continue
-        seg = values[i-window+1:i+1]
-        m = mid[i]; 
-        if m is None: up.append(None); lo.append(None); continue
-        var = sum((x - m) ** 2 for x in seg) / window
-        sd = math.sqrt(var)
-        up.append(m + k * sd); lo.append(m - k * sd)
-    return {"mid": mid, "upper": up, "lower": lo}
+def bollinger_array(values: ArrayLike, window: int = 20, k: float = 2.0) -> Dict[str, np.ndarray]:
+    x = _as_array(values)
+    # 先平移到各檔第一筆（非缺值）附近再累加平方和，避免大數相減的精度流失；母體標準差
+    if x.shape[-1]:
+        first = np.argmax(~np.isnan(x), axis=-1)[..., None]
+        shift = np.nan_to_num(np.take_along_axis(x, first, axis=-1))
+    else:
+        shift = 0.0
+    y = x - shift
+    mean_y = _rolling_sum(y, window) / window
+    var = _rolling_sum(y * y, window) / window - mean_y * mean_y
+    sd = np.sqrt(np.clip(var, 0.0, None))
+    mid = mean_y + shift
+    return {"mid": mid, "upper": mid + k * sd, "lower": mid - k * sd}
+
+# ----- JSON 形狀（與舊版相同）-----
+
+def sma(values: ArrayLike, window: int) -> List[Optional[float]]:
+    return to_list(sma_array(values, window))
+
+def ema(values: ArrayLike, span: int) -> List[Optional[float]]:
+    return to_list(ema_array(values, span))
+
+def macd(values: ArrayLike, fast: int=12, slow: int=26, signal: int=9):
+    return {k: to_list(v) for k, v in macd_array(values, fast, slow, signal).items()}
+
+def rsi(values: ArrayLike, period: int=14) -> List[Optional[float]]:
+    return to_list(rsi_array(values, period))
+
+def bollinger(values: ArrayLike, window: int=20, k: float=2.0):
+    return {key: to_list(v) for key, v in bollinger_array(values, window, k).items()}
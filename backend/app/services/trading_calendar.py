@@ -0,0 +1,201 @@
+# path: backend/app/services/trading_calendar.py
+# 交易日曆：預設週一～五開市，再以例外日覆寫（國定假日、颱風停市、補班的週六）。
+# 例外日來源優先序：內附假日表 app/sql/twse_holidays.csv（bundled）> 由 daily_price 學到的（prices）> 週間規則。
+# prices 學開市日（補班週六等）；休市日只在假日表沒收錄的早期年份學（見 _learn_from_prices_tx）。
+# 例外日存在 trading_calendar 表，行程內以 TTL 快取整份日曆；回補 / 缺口偵測 / 「應有最新交易日」都從這裡判斷。
+from __future__ import annotations
+import csv
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+from .cache import TTLCache
+
+# 內附假日表只到最後一個收錄的年度；TWSE 每年約 11–12 月公布次年休市日，屆時要補上下一年（含補假、
+# 春節前僅辦理結算交割日）。沒收錄的年份只剩週間規則，國定假日會被當成交易日。
+BUNDLED_CSV = os.path.join(os.path.dirname(__file__), "..", "sql", "twse_holidays.csv")
+
+# 學習規則：某日有價格的公司數 >= 中位數 * OPEN_RATIO → 「密集」的開市日。
+# 休市只在假日表第一年之前學：週間 0 筆、且前後最近的有資料日都密集、相距不超過 CLOSURE_MAX_GAP_DAYS
+# （春節最長約 9 天；整月抓失敗的缺口相距太遠，不會被當成休市）。假日表涵蓋的年份不從「沒有資料」推論休市：
+# 抓取失敗 / 來源中斷也會沒資料，寫成休市後缺口偵測與回補就永遠不會再要那一天。
+LEARN_OPEN_RATIO = 0.5
+LEARN_MIN_COMPANIES = 20
+CLOSURE_MAX_GAP_DAYS = 14
+
+# SQL 版的同一套規則：[:cal_from, :cal_to] 內的交易日（欄位 d），給需要在 DB 端跟日曆 join 的查詢（缺口偵測等）
+TRADING_DAYS_SQL = """
+    SELECT g::date AS d
+    FROM generate_series(CAST(:cal_from AS date), CAST(:cal_to AS date), interval '1 day') AS g
+    LEFT JOIN trading_calendar tc ON tc.trade_date = g::date
+    WHERE COALESCE(tc.is_open, EXTRACT(ISODOW FROM g) < 6)
+"""
+
+_CACHE_KEY = "calendar"
+_calendar_cache = TTLCache("trading_calendar", 1, 3600)
+
+class TradingCalendar:
+    def __init__(self, overrides: Optional[Dict[date, bool]] = None):
+        self.overrides: Dict[date, bool] = dict(overrides or {})
+
+    @classmethod
+    def from_trading_days(cls, start: date, end: date, days: Iterable[date]) -> "TradingCalendar":
+        """由 [start, end] 內的交易日清單還原日曆（腳本從 API 拿到清單時用）。"""
+        opened = set(days)
+        overrides: Dict[date, bool] = {}
+        d = start
+        while d <= end:
+            is_open = d in opened
+            if is_open != (d.weekday() < 5):
+                overrides[d] = is_open
+            d += timedelta(days=1)
+        return cls(overrides)
+
+    def is_trading_day(self, d: date) -> bool:
+        hit = self.overrides.get(d)
+        return (d.weekday() < 5) if hit is None else hit
+
+    def trading_days(self, start: date, end: date) -> List[date]:
+        out: List[date] = []
+        d = start
+        while d <= end:
+            if self.is_trading_day(d):
+                out.append(d)
+            d += timedelta(days=1)
+        return out
+
+    def previous_trading_day(self, d: date) -> date:
+        """d 之前（不含 d）最近的交易日。"""
+        d -= timedelta(days=1)
+        while not self.is_trading_day(d):
+            d -= timedelta(days=1)
+        return d
+
+    def expected_latest_trade_date(self, now: Optional[datetime] = None) -> date:
+        """現在 DB 裡「應該要有」的最新交易日：今天是交易日且已過收盤資料時間（MARKET_CLOSE_HHMM）就是今天，否則是前一個交易日。"""
+        tz = ZoneInfo(settings.MARKET_TZ)
+        now = now.astimezone(tz) if now else datetime.now(tz)
+        hh, mm = (int(x) for x in settings.MARKET_CLOSE_HHMM.split(":"))
+        today = now.date()
+        if self.is_trading_day(today) and now.time() >= time(hh, mm):
+            return today
+        return self.previous_trading_day(today)
+
+def load_bundled(path: str = BUNDLED_CSV) -> Dict[date, Tuple[bool, str]]:
+    """內附假日表：{date: (is_open, note)}。"""
+    out: Dict[date, Tuple[bool, str]] = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            out[date.fromisoformat(row["trade_date"])] = (row["is_open"].strip() == "1", row.get("note") or "")
+    return out
+
+def bundled_calendar() -> TradingCalendar:
+    """不連 DB 的日曆（只有內附假日表），給離線腳本 / parser 預設使用。"""
+    return TradingCalendar({d: v[0] for d, v in load_bundled().items()})
+
+# ----- DB -----
+
+def _ensure_calendar_tx(conn: Connection) -> None:
+    """建表並寫入內附假日表；已由價格資料學到的日期不覆寫。給 ensure_schema 呼叫。"""
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS trading_calendar (
+            trade_date DATE PRIMARY KEY,
+            is_open    BOOLEAN NOT NULL,
+            source     TEXT NOT NULL,
+            note       TEXT,
+            updated_at TIMESTAMP DEFAULT now()
+        );
+    """))
+    rows = sorted(load_bundled().items())
+    if not rows:
+        return
+    conn.execute(text("""
+        INSERT INTO trading_calendar (trade_date, is_open, source, note)
+        SELECT d, o, 'bundled', n
+        FROM unnest(CAST(:ds AS date[]), CAST(:os AS boolean[]), CAST(:ns AS text[])) AS x(d, o, n)
+        ON CONFLICT (trade_date) DO UPDATE
+          SET is_open = EXCLUDED.is_open, source = EXCLUDED.source, note = EXCLUDED.note, updated_at = now()
+    """), {"ds": [d for d, _ in rows], "os": [v[0] for _, v in rows], "ns": [v[1] for _, v in rows]})
+
+def _learn_from_prices_tx(conn: Connection, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """從 daily_price 推論 [start, end]（預設整張表）內的開 / 休市日，寫回 trading_calendar；回傳寫入筆數。
+       開市：密集的日子（含補班週六）。休市：只限假日表第一年之前、夾在兩個密集日之間的 0 筆週間。
+       內附假日表的日子一律不覆寫。"""
+    bundled = load_bundled()
+    closure_before = date(min(bundled).year, 1, 1) if bundled else date.max
+    res = conn.execute(text("""
+        WITH per_day AS (
+            SELECT trade_date, COUNT(*) AS n
+            FROM daily_price
+            WHERE (CAST(:s AS date) IS NULL OR trade_date >= :s)
+              AND (CAST(:e AS date) IS NULL OR trade_date <= :e)
+            GROUP BY trade_date
+        ), st AS (
+            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY n) AS med FROM per_day
+        ), days AS (
+            SELECT p.trade_date, p.n >= st.med * :ratio AS dense,
+                   LAG(p.trade_date) OVER w AS prev_d, LAG(p.n >= st.med * :ratio) OVER w AS prev_dense
+            FROM per_day p CROSS JOIN st
+            WINDOW w AS (ORDER BY p.trade_date)
+        ), learned AS (
+            SELECT trade_date, TRUE AS is_open FROM days WHERE dense
+            UNION ALL
+            SELECT g::date, FALSE
+            FROM days d CROSS JOIN st
+            CROSS JOIN generate_series(d.prev_d + 1, d.trade_date - 1, interval '1 day') AS g
+            WHERE d.dense AND d.prev_dense
+              AND d.trade_date - d.prev_d <= :max_gap
+              AND st.med >= :min_n
+              AND EXTRACT(ISODOW FROM g) < 6
+              AND g < :closure_before
+        )
+        INSERT INTO trading_calendar (trade_date, is_open, source)
+        SELECT trade_date, is_open, 'prices' FROM learned
+        ON CONFLICT (trade_date) DO UPDATE
+          SET is_open = EXCLUDED.is_open, source = EXCLUDED.source, updated_at = now()
+          WHERE trading_calendar.source <> 'bundled'
+    """), {"s": start, "e": end, "ratio": LEARN_OPEN_RATIO, "min_n": LEARN_MIN_COMPANIES,
+           "max_gap": CLOSURE_MAX_GAP_DAYS, "closure_before": closure_before})
+    return res.rowcount or 0
+
+def _load_calendar_tx(conn: Connection) -> TradingCalendar:
+    rows = conn.execute(text("SELECT trade_date, is_open FROM trading_calendar")).all()
+    # 只保留和週間規則不同的日子
+    return TradingCalendar({d: bool(o) for d, o in rows if bool(o) != (d.weekday() < 5)})
+
+def get_calendar(engine: Engine) -> TradingCalendar:
+    hit = _calendar_cache.get(_CACHE_KEY)
+    if hit is not None:
+        return hit
+    with engine.begin() as conn:
+        cal = _load_calendar_tx(conn)
+    _calendar_cache.set(_CACHE_KEY, cal)
+    return cal
+
+async def get_calendar_async(aengine: AsyncEngine) -> TradingCalendar:
+    hit = _calendar_cache.get(_CACHE_KEY)
+    if hit is not None:
+        return hit
+    async with aengine.begin() as conn:
+        cal = await conn.run_sync(_load_calendar_tx)
+    _calendar_cache.set(_CACHE_KEY, cal)
+    return cal
+
+def learn_from_prices(engine: Engine, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    with engine.begin() as conn:
+        n = _learn_from_prices_tx(conn, start, end)
+    _calendar_cache.invalidate()
+    return n
+
+async def learn_from_prices_async(aengine: AsyncEngine, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    async with aengine.begin() as conn:
+        n = await conn.run_sync(_learn_from_prices_tx, start, end)
+    _calendar_cache.invalidate()
+    return n
+
+def invalidate() -> None:
+    _calendar_cache.invalidate()
@@ -1,58 +1,194 @@
 # path: backend/app/services/write_ops.py
 from __future__ import annotations
-from typing import Optional, Iterable
+from datetime import date
+from typing import Optional, Iterable, Dict, List, Any
 from sqlalchemy import text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, Connection
+from . import cache, company_index, indicator_store, price_bus, price_notify
+
+# 與 read_ops 相同：_xxx_tx(conn, ...) 只負責 SQL（write_ops_async 以 run_sync 重用），
+# 同步包裝 xxx(engine, ...) 開交易，commit 後才更新/失效快取。
+
+def _ensure_company_tx(conn: Connection, ticker: str, name: Optional[str] = None, sector: Optional[str] = None) -> int:
+    conn.execute(text("""
+        INSERT INTO companies (ticker, name, sector)
+        VALUES (:t, COALESCE(:n,:t), :s)
+        ON CONFLICT (ticker) DO NOTHING
+    """), {"t": ticker, "n": name, "s": sector})
+    return int(conn.execute(text("SELECT id FROM companies WHERE ticker=:t"), {"t": ticker}).scalar())
 
 def ensure_company(engine: Engine, ticker: str, name: Optional[str] = None, sector: Optional[str] = None) -> int:
+    cid = cache.company_ids.get(ticker)
+    if cid is not None:
+        return cid
     with engine.begin() as conn:
-        conn.execute(text("""
-            INSERT INTO companies (ticker, name, sector)
-            VALUES (:t, COALESCE(:n,:t), :s)
-            ON CONFLICT (ticker) DO NOTHING
-        """), {"t": ticker, "n": name, "s": sector})
-        cid = conn.execute(text("SELECT id FROM companies WHERE ticker=:t"), {"t": ticker}).scalar()
-    return int(cid)
+        cid = _ensure_company_tx(conn, ticker, name, sector)
+    cache.company_ids.set(ticker, cid)
+    company_index.invalidate()
+    return cid
+
+class CompanyIds(Dict[str, int]):
+    """ticker → company_id；created 表示這次有補建公司（commit 後要讓搜尋索引失效）。"""
+    created = False
+
+def resolve_company_ids(conn: Connection, tickers: Iterable[str]) -> CompanyIds:
+    """一次把多個 ticker 轉成 company_id；不存在的公司以 ticker 當名稱補建。
+       必須在呼叫端的交易內執行（共用同一個 conn）；已在快取中的 ticker 不再查 DB。
+       commit 後由呼叫端呼叫 _remember_ids 寫回快取。"""
+    out = CompanyIds()
+    ts: List[str] = []
+    for t in sorted({t for t in tickers if t}):
+        cid = cache.company_ids.get(t)
+        if cid is None:
+            ts.append(t)
+        else:
+            out[t] = cid
+    if not ts:
+        return out
+    created = conn.execute(text("""
+        INSERT INTO companies (ticker, name)
+        SELECT t, t FROM unnest(CAST(:ts AS text[])) AS t
+        ON CONFLICT (ticker) DO NOTHING
+    """), {"ts": ts}).rowcount
+    # 不在這裡讓搜尋索引失效：交易還沒 commit，並行的 /api/search 重載會看不到新公司，又把舊索引當新的用到 TTL
+    out.created = created > 0
+    rows = conn.execute(text("""
+        SELECT ticker, id FROM companies WHERE ticker = ANY(:ts)
+    """), {"ts": ts}).all()
+    for t, cid in rows:
+        out[t] = int(cid)
+    return out
+
+def _remember_ids(ids: Dict[str, int]) -> None:
+    # 交易 commit 後才寫入快取，避免 rollback 掉的新公司 id 被快取住；有補建公司時搜尋索引也在這裡失效
+    for t, cid in ids.items():
+        cache.company_ids.set(t, cid)
+    if getattr(ids, "created", False):
+        company_index.invalidate()
+
+def _upsert_price_tx(conn: Connection, ticker: str, trade_date: str, close: float) -> Dict[str, int]:
+    ids = resolve_company_ids(conn, [ticker])
+    conn.execute(text("""
+        INSERT INTO daily_price (company_id, trade_date, close)
+        VALUES (:cid, :d, :px)
+        ON CONFLICT (company_id, trade_date)
+        DO UPDATE SET close = EXCLUDED.close, created_at = now()
+    """), {"cid": ids[ticker], "d": trade_date, "px": float(close)})
+    indicator_store._refresh_tx(conn, indicator_store.company_since([(ticker, trade_date)], ids))
+    price_notify._notify_tx(conn, [[ticker, str(trade_date), str(trade_date), float(close)]])
+    return ids
 
 def upsert_price(engine: Engine, ticker: str, trade_date: str, close: float, trigger_revalidate: bool = False) -> None:
     with engine.begin() as conn:
-        cid = ensure_company(engine, ticker)
-        conn.execute(text("""
-            INSERT INTO daily_price (company_id, trade_date, close)
-            VALUES (:cid, :d, :px)
-            ON CONFLICT (company_id, trade_date)
-            DO UPDATE SET close = EXCLUDED.close, created_at = now()
-        """), {"cid": cid, "d": trade_date, "px": float(close)})
+        ids = _upsert_price_tx(conn, ticker, trade_date, close)
+    _remember_ids(ids)
+    cache.invalidate_prices([ticker])
+    price_bus.publish(ticker, trade_date, close)
+
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+
+def merge_ohlcv(items: Iterable[Dict[str, Any]]) -> Dict[tuple, Dict[str, Any]]:
+    """同一批內重複的 (ticker, trade_date) 逐欄合併，後到的非 NULL 值優先。"""
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for it in items:
+        key = (it["ticker"], str(it["trade_date"]))
+        row = merged.setdefault(key, dict.fromkeys(OHLCV_FIELDS))
+        for f in OHLCV_FIELDS:
+            if it.get(f) is not None:
+                row[f] = it[f]
+    return merged
+
+def _upsert_ohlcv_tx(conn: Connection, merged: Dict[tuple, Dict[str, Any]]) -> Dict[str, int]:
+    ids = resolve_company_ids(conn, (t for t, _ in merged))
+    cols: Dict[str, List[Any]] = {"cids": [], "ds": [], **{f: [] for f in OHLCV_FIELDS}}
+    for (t, d), row in merged.items():
+        cols["cids"].append(ids[t]); cols["ds"].append(d)
+        for f in ("open", "high", "low", "close"):
+            cols[f].append(None if row[f] is None else float(row[f]))
+        cols["volume"].append(None if row["volume"] is None else int(row["volume"]))
+    conn.execute(text("""
+        INSERT INTO daily_price (company_id, trade_date, open, high, low, close, volume)
+        SELECT * FROM unnest(
+            CAST(:cids AS int[]), CAST(:ds AS date[]),
+            CAST(:open AS numeric[]), CAST(:high AS numeric[]), CAST(:low AS numeric[]),
+            CAST(:close AS numeric[]), CAST(:volume AS bigint[])
+        )
+        ON CONFLICT (company_id, trade_date) DO UPDATE SET
+            open   = COALESCE(EXCLUDED.open,   daily_price.open),
+            high   = COALESCE(EXCLUDED.high,   daily_price.high),
+            low    = COALESCE(EXCLUDED.low,    daily_price.low),
+            close  = COALESCE(EXCLUDED.close,  daily_price.close),
+            volume = COALESCE(EXCLUDED.volume, daily_price.volume),
+            created_at = now()
+    """), cols)
+    # 預設參數的物化指標：從各檔最早異動日往後增量更新（同一個交易）
+    indicator_store._refresh_tx(conn, indicator_store.company_since(merged, ids))
+    # 其他行程（API worker）的快取失效 / 推播；commit 才會送出
+    price_notify._notify_tx(conn, price_notify.rows_from_merged(merged))
+    return ids
+
+def upsert_ohlcv(engine: Engine, items: Iterable[Dict[str, Any]]) -> int:
+    """批次寫入日K：items 為 {ticker, trade_date, open?, high?, low?, close?, volume?}。
+       單一交易、一次查 company_id、一條 INSERT ... SELECT unnest(...) ON CONFLICT。
+       合併規則：各欄 COALESCE(新值, 舊值)，只帶 close 的更新不會把既有 OHLV 洗成 NULL。回傳寫入筆數。"""
+    merged = merge_ohlcv(items)
+    if not merged:
+        return 0
+    with engine.begin() as conn:
+        ids = _upsert_ohlcv_tx(conn, merged)
+    _remember_ids(ids)
+    cache.invalidate_prices({t for t, _ in merged})
+    price_bus.publish_rows(merged)
+    return len(merged)
+
+def _delete_prices_range_tx(conn: Connection, start: str, end: str, tickers: Optional[List[str]] = None) -> None:
+    if tickers:
+        cids = conn.execute(text("""
+            DELETE FROM daily_price dp
+            USING companies c
+            WHERE dp.company_id=c.id
+              AND dp.trade_date BETWEEN :s AND :e
+              AND c.ticker = ANY(:ts)
+            RETURNING dp.company_id
+        """), {"s": start, "e": end, "ts": tickers}).scalars().all()
+    else:
+        cids = conn.execute(text("""
+            DELETE FROM daily_price dp
+            USING companies c
+            WHERE dp.company_id=c.id
+              AND dp.trade_date BETWEEN :s AND :e
+            RETURNING dp.company_id
+        """), {"s": start, "e": end}).scalars().all()
+    d = date.fromisoformat(str(start)[:10])
+    indicator_store._refresh_tx(conn, {int(c): d for c in set(cids)})
+    price_notify._notify_tx(conn, [[t, str(start), str(end), None] for t in tickers] if tickers else None)
 
 def delete_prices_range(engine: Engine, start: str, end: str, tickers: Optional[Iterable[str]] = None) -> None:
+    tickers = list(tickers) if tickers else None
     with engine.begin() as conn:
-        if tickers:
-            conn.execute(text("""
-                DELETE FROM daily_price dp
-                USING companies c
-                WHERE dp.company_id=c.id
-                  AND dp.trade_date BETWEEN :s AND :e
-                  AND c.ticker = ANY(:ts)
-            """), {"s": start, "e": end, "ts": list(tickers)})
-        else:
-            conn.execute(text("""
-                DELETE FROM daily_price dp
-                USING companies c
-                WHERE dp.company_id=c.id
-                  AND dp.trade_date BETWEEN :s AND :e
-            """), {"s": start, "e": end})
+        _delete_prices_range_tx(conn, start, end, tickers)
+    cache.invalidate_prices(tickers)
+
+def _delete_company_cascade_tx(conn: Connection, ticker: str) -> bool:
+    cid = conn.execute(text("SELECT id FROM companies WHERE ticker=:t"), {"t": ticker}).scalar()
+    if not cid:
+        return False
+    conn.execute(text("DELETE FROM daily_price WHERE company_id=:cid"), {"cid": cid})
+    conn.execute(text("DELETE FROM fundamentals WHERE company_id=:cid"), {"cid": cid})
+    conn.execute(text("DELETE FROM companies WHERE id=:cid"), {"cid": cid})
+    price_notify._notify_company_deleted_tx(conn, ticker)
+    return True
 
 def delete_company_cascade(engine: Engine, ticker: str) -> bool:
     with engine.begin() as conn:
-        cid = conn.execute(text("SELECT id FROM companies WHERE ticker=:t"), {"t": ticker}).scalar()
-        if not cid:
+        if not _delete_company_cascade_tx(conn, ticker):
             return False
-        conn.execute(text("DELETE FROM daily_price WHERE company_id=:cid"), {"cid": cid})
-        conn.execute(text("DELETE FROM fundamentals WHERE company_id=:cid"), {"cid": cid})
-        conn.execute(text("DELETE FROM companies WHERE id=:cid"), {"cid": cid})
+    cache.invalidate_company(ticker)
+    company_index.invalidate()
+    price_bus.drop(ticker)
     return True
 
-def upsert_company(engine: Engine, ticker: str, name: str | None, sector: str | None):
+def _upsert_company_tx(conn: Connection, ticker: str, name: str | None, sector: str | None):
     sql = """
     INSERT INTO companies (ticker, name, sector)
     VALUES (:t, :n, :s)
@@ -60,5 +196,9 @@ def upsert_company(engine: Engine, ticker: str, name: str | None, sector: str |
       SET name = COALESCE(EXCLUDED.name, companies.name),
           sector = COALESCE(EXCLUDED.sector, companies.sector)
     """
+    conn.execute(text(sql), {"t": ticker, "n": name, "s": sector})
+
+def upsert_company(engine: Engine, ticker: str, name: str | None, sector: str | None):
     with engine.begin() as conn:
-        conn.execute(text(sql), {"t": ticker, "n": name, "s": sector})
+        _upsert_company_tx(conn, ticker, name, sector)
+    company_index.invalidate()
@@ -0,0 +1,62 @@
+# path: backend/app/services/write_ops_async.py
+# write_ops 的 async 版：SQL 沿用 write_ops._xxx_tx；commit 後才更新/失效快取（與同步版一致）。
+from __future__ import annotations
+from typing import Optional, Iterable, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncEngine
+from . import cache, company_index, price_bus
+from . import write_ops as wo
+
+async def ensure_company(aengine: AsyncEngine, ticker: str, name: Optional[str] = None, sector: Optional[str] = None) -> int:
+    cid = cache.company_ids.get(ticker)
+    if cid is not None:
+        return cid
+    async with aengine.begin() as conn:
+        cid = await conn.run_sync(wo._ensure_company_tx, ticker, name, sector)
+    cache.company_ids.set(ticker, cid)
+    company_index.invalidate()
+    return cid
+
+async def upsert_price(aengine: AsyncEngine, ticker: str, trade_date: str, close: float) -> None:
+    async with aengine.begin() as conn:
+        ids = await conn.run_sync(wo._upsert_price_tx, ticker, trade_date, close)
+    wo._remember_ids(ids)
+    cache.invalidate_prices([ticker])
+    price_bus.publish(ticker, trade_date, close)
+
+async def upsert_ohlcv(aengine: AsyncEngine, items: Iterable[Dict[str, Any]]) -> int:
+    merged = wo.merge_ohlcv(items)
+    if not merged:
+        return 0
+    async with aengine.begin() as conn:
+        ids = await conn.run_sync(wo._upsert_ohlcv_tx, merged)
+    wo._remember_ids(ids)
+    cache.invalidate_prices({t for t, _ in merged})
+    price_bus.publish_rows(merged)
+    return len(merged)
+
+async def delete_prices_range(aengine: AsyncEngine, start: str, end: str, tickers: Optional[Iterable[str]] = None) -> None:
+    tickers = list(tickers) if tickers else None
+    async with aengine.begin() as conn:
+        await conn.run_sync(wo._delete_prices_range_tx, start, end, tickers)
+    cache.invalidate_prices(tickers)
+
+async def delete_company_cascade(aengine: AsyncEngine, ticker: str) -> bool:
+    async with aengine.begin() as conn:
+        if not await conn.run_sync(wo._delete_company_cascade_tx, ticker):
+            return False
+    cache.invalidate_company(ticker)
+    company_index.invalidate()
+    price_bus.drop(ticker)
+    return True
+
+async def upsert_company(aengine: AsyncEngine, ticker: str, name: str | None, sector: str | None):
+    async with aengine.begin() as conn:
+        await conn.run_sync(wo._upsert_company_tx, ticker, name, sector)
+    company_index.invalidate()
+
+async def upsert_companies(aengine: AsyncEngine, items: Iterable[Dict[str, Any]]) -> None:
+    """多筆公司資料同一個交易寫入。"""
+    async with aengine.begin() as conn:
+        for it in items:
+            await conn.run_sync(wo._upsert_company_tx, it["ticker"], it.get("name"), it.get("sector"))
+    company_index.invalidate()
@@ -0,0 +1,76 @@
+# path: backend/scripts/backfill_jobs.py
+# 可續跑的回補（直接連 DB）：
+#   python scripts/backfill_jobs.py plan --source twse --from 2020-01-01 --to 2024-12-31 [--all] [--tickers 2330,2317]
+#   python scripts/backfill_jobs.py run  --source twse [--workers 4] [--procs 4]
+#   python scripts/backfill_jobs.py status
+#   python scripts/backfill_jobs.py retry --source twse
+# 進度存在 backfill_jobs 表；run 中斷後再跑一次就從沒完成的 (ticker, 月份) 繼續。
+import argparse
+import asyncio
+import logging
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import get_context
+from pathlib import Path
+
+# 讓 "from app...." 可以 import 到
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.db import engine  # noqa: E402
+from app.etl import backfill_jobs as jobs  # noqa: E402
+
+def _run_one(source: str, workers, rate, batch: int):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    return asyncio.run(jobs.run(engine, source, workers=workers, rate_per_sec=rate, batch=batch))
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("plan", help="把區間切成 (ticker, 月份) 單位")
+    p.add_argument("--source", default="twse", choices=sorted(jobs.SOURCES))
+    p.add_argument("--from", dest="date_from", required=True, help="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", required=True, help="YYYY-MM-DD")
+    p.add_argument("--tickers", default="", help="comma-separated（預設全部公司）")
+    p.add_argument("--all", action="store_true", help="不只缺口，整段重抓（更新既有資料）")
+
+    r = sub.add_parser("run", help="認領並執行單位直到做完")
+    r.add_argument("--source", default="twse", choices=sorted(jobs.SOURCES))
+    r.add_argument("--workers", type=int, default=None, help="每個行程同時進行的請求數")
+    r.add_argument("--rate", type=float, default=None, help="全部行程合計每秒請求數（預設依來源設定）")
+    r.add_argument("--procs", type=int, default=1, help="平行行程數（共用同一份計畫）")
+    r.add_argument("--batch", type=int, default=50, help="每次認領幾個單位")
+
+    s = sub.add_parser("status")
+    s.add_argument("--source", default=None)
+
+    f = sub.add_parser("retry", help="failed 單位重設為 pending")
+    f.add_argument("--source", default="twse", choices=sorted(jobs.SOURCES))
+
+    args = ap.parse_args()
+
+    if args.cmd == "plan":
+        tickers = [t.strip() for t in args.tickers.split(",") if t.strip()] or None
+        n = jobs.plan(engine, args.source, date.fromisoformat(args.date_from), date.fromisoformat(args.date_to),
+                      tickers=tickers, only_gaps=not args.all)
+        print(f"[plan] {args.source}: {n} units queued")
+    elif args.cmd == "run":
+        # 來源限速是全域的：平均分給各行程
+        rate = (args.rate or jobs.SOURCES[args.source][2]) / max(1, args.procs)
+        if args.procs <= 1:
+            stats = _run_one(args.source, args.workers, rate, args.batch)
+            print(f"[run] {args.source}: {stats}")
+        else:
+            with ProcessPoolExecutor(args.procs, mp_context=get_context("spawn")) as ex:
+                futs = [ex.submit(_run_one, args.source, args.workers, rate, args.batch) for _ in range(args.procs)]
+                for i, fut in enumerate(futs):
+                    print(f"[run] {args.source} proc#{i}: {fut.result()}")
+        print(f"[status] {jobs.status(engine, args.source)}")
+    elif args.cmd == "status":
+        for src, counts in jobs.status(engine, args.source).items():
+            print(f"{src}: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    elif args.cmd == "retry":
+        print(f"[retry] {args.source}: {jobs.retry_failed(engine, args.source)} units reset")
+
+if __name__ == "__main__":
+    main()
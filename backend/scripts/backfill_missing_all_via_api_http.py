@@ -1,32 +1,42 @@
 # backend/scripts/backfill_missing_all_via_api_http.py
 import os
+from collections import defaultdict
 from datetime import date, timedelta
 from app.clients import admin_client
-from app.etl.daily_price_parser import fetch_close_for
+from app.etl.daily_price_parser import fetch_ranges_for, use_calendar
+from app.services.trading_calendar import TradingCalendar
 
 LOOKBACK = int(os.getenv("BACKFILL_LOOKBACK_DAYS", "7"))
 
-def daterange(d1: date, d2: date):
-    cur = d1
-    while cur <= d2:
-        yield cur
-        cur += timedelta(days=1)
-
 def main():
-    end = date.today()
-    start = end - timedelta(days=LOOKBACK)
-    companies = admin_client.list_companies(limit=100000)
-    tickers = [c["ticker"] for c in companies]
-    for t in tickers:
-        batch = []
-        for d in daterange(start, end):
-            px = fetch_close_for(t, d)
-            if px is None: continue
-            batch.append({"ticker": t, "trade_date": d.isoformat(), "close": float(px)})
-            if len(batch) >= 1000:
-                admin_client.bulk_upsert_prices(batch); batch.clear()
-        if batch: admin_client.bulk_upsert_prices(batch)
-        print(f"[ok] {t}")
+    end = admin_client.expected_latest_trade_date()
+    start = date.today() - timedelta(days=LOOKBACK)
+    if start > end:
+        print(f"nothing to backfill ({start} > {end})"); return
+    days = admin_client.trading_days(start, end)
+    # parser 依日曆略過休市日 / 沒有交易日的月份
+    use_calendar(TradingCalendar.from_trading_days(start, end, days))
+    # 只抓真正的缺口：(ticker, 月份) → 缺的日期，依月份分組後每組一次併發抓取
+    by_month = defaultdict(dict)
+    for g in admin_client.price_gaps(start, end):
+        by_month[g["month"]][g["ticker"]] = {date.fromisoformat(d) for d in g["days"]}
+    print(f"[gaps] {sum(len(v) for v in by_month.values())} (ticker, month) units in {start} ~ {end}")
+    batch = []
+    for month, wanted in sorted(by_month.items()):
+        lo = min(min(ds) for ds in wanted.values())
+        hi = max(max(ds) for ds in wanted.values())
+        results = fetch_ranges_for(wanted.keys(), lo, hi)
+        for t, ds in wanted.items():
+            res = results[t]
+            if not res.ok:
+                print(f"[fail] {t} {month} {res.reason} ({res.error}, attempts={res.attempts})")
+            rows = [(d, bar) for d, bar in sorted((res.data or {}).items()) if d in ds]
+            for d, bar in rows:
+                batch.append({"ticker": t, "trade_date": d.isoformat(), **bar})
+                if len(batch) >= 1000:
+                    admin_client.bulk_upsert_prices(batch); batch.clear()
+            print(f"[ok] {t} {month} ({len(rows)}/{len(ds)} rows)")
+    if batch: admin_client.bulk_upsert_prices(batch)
     print("done.")
 
 if __name__ == "__main__":
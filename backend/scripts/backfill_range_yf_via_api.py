@@ -1,6 +1,8 @@
 #!/usr/bin/env python
+# 單行程、一檔一檔跑；多年份的大量回補改用可續跑、可平行的 scripts/backfill_jobs.py --source yf
 import argparse, os, sys, json, time
 import datetime as dt
+import urllib.parse
 import urllib.request
 
 import yfinance as yf
@@ -15,11 +17,20 @@ def post_json(url: str, obj):
     with urllib.request.urlopen(req, timeout=120) as resp:
         return resp.status, resp.read().decode("utf-8","ignore")
 
-def fetch_companies(api_base: str, limit: int=100000):
-    status, body = http_get(f"{api_base}/api/admin/companies?limit={limit}")
-    if status != 200:
-        raise RuntimeError(f"companies list failed: {status} {body[:200]}")
-    return json.loads(body)
+def iter_companies(api_base: str, prefix: str = "", page_size: int = 1000):
+    """keyset 分頁逐頁取公司（after=上一頁最後一個 ticker）；prefix 為數字時由 API 走代號前綴索引。"""
+    params = {"limit": page_size}
+    if prefix:
+        params["q"] = prefix
+    while True:
+        status, body = http_get(f"{api_base}/api/admin/companies?{urllib.parse.urlencode(params)}")
+        if status != 200:
+            raise RuntimeError(f"companies list failed: {status} {body[:200]}")
+        page = json.loads(body)
+        yield from page
+        if len(page) < page_size:
+            return
+        params["after"] = page[-1]["ticker"]
 
 def to_iso(d: dt.date) -> str:
     return d.strftime("%Y-%m-%d")
@@ -39,8 +50,12 @@ def main():
     args = ap.parse_args()
 
     api = args.api_base.rstrip("/")
-    comps = fetch_companies(api, args.limit)
-    tickers = [c["ticker"] for c in comps if c.get("ticker","").startswith(args.ticker_prefix)]
+    tickers = []
+    for c in iter_companies(api, args.ticker_prefix):
+        if c.get("ticker", "").startswith(args.ticker_prefix):
+            tickers.append(c["ticker"])
+            if len(tickers) >= args.limit:
+                break
     print(f"[info] companies: {len(tickers)}")
 
     # yfinance 代碼轉換（台股常見: 2330.TW）
@@ -72,6 +87,8 @@ def main():
                     "close":float(row["Close"])if row["Close"]==row["Close"] else None,
                     "volume": int(row["Volume"]) if row["Volume"]==row["Volume"] else None,
                 })
+            # /prices/bulk 要求 close；沒有收盤價的列直接略過
+            arr = [x for x in arr if x["close"] is not None]
 
             for chunk in chunked(arr, args.batch):
                 status, body = post_json(url_bulk, chunk)
@@ -1,24 +1,61 @@
 # backend/scripts/daily_fetch_all_via_api.py
 import sys
-from datetime import date
+from collections import Counter
+from datetime import date, timedelta
 from app.clients import admin_client
-from app.etl.daily_price_parser import fetch_close_for
+from app.etl.daily_price_parser import fetch_closes_for, fetch_snapshot_for
+
+def upload_snapshot(snapshot, tickers, today):
+    """全市場模式：只保留 companies 裡有的代號，整批 OHLCV 寫入。"""
+    known = set(tickers)
+    rows = [{"ticker": t, "trade_date": today.isoformat(), **bar} for t, bar in snapshot.items() if t in known]
+    for i in range(0, len(rows), 1000):
+        admin_client.bulk_upsert_prices(rows[i:i+1000])
+    print(f"[daily] snapshot rows={len(snapshot)}, upserted={len(rows)}, missing={len(known) - len(rows)}")
+
+def refresh_calendar(today):
+    # 用最近一個月的實際資料修正日曆（臨時停市、補班日）
+    try:
+        n = admin_client.refresh_calendar(today - timedelta(days=31), today)
+        print(f"[daily] calendar refreshed ({n} days)")
+    except Exception as e:
+        print(f"[daily] calendar refresh failed: {e!r}")
 
 def main():
     today = date.today()
-    companies = admin_client.list_companies(limit=100000)
-    tickers = [c["ticker"] for c in companies]
+    # 休市日（假日 / 颱風停市）不抓；補班日照常
+    if today not in admin_client.trading_days(today, today):
+        print(f"[daily] {today} is not a trading day, skip")
+        return
+    tickers = [c["ticker"] for c in admin_client.iter_companies()]
     print(f"[daily] {len(tickers)} symbols")
 
+    snapshot = fetch_snapshot_for(today)
+    if snapshot is not None:
+        upload_snapshot(snapshot, tickers, today)
+        refresh_calendar(today)
+        print("done.")
+        return
+
+    results = fetch_closes_for(tickers, today)
+    failures = Counter()
     batch = []
     for t in tickers:
-        px = fetch_close_for(t, today)
-        if px is None:
+        res = results[t]
+        if not res.ok:
+            failures[res.reason] += 1
+            print(f"[fail] {t} {today} {res.reason} ({res.error}, attempts={res.attempts})"); continue
+        if res.data is None:
             print(f"[skip] {t} {today} no data"); continue
-        batch.append({"ticker": t, "trade_date": today.isoformat(), "close": float(px)})
+        batch.append({"ticker": t, "trade_date": today.isoformat(), "close": float(res.data)})
         if len(batch) >= 1000:
             admin_client.bulk_upsert_prices(batch); batch.clear(); print("...bulk committed")
     if batch: admin_client.bulk_upsert_prices(batch)
+    if failures:
+        # 有抓取失敗時不更新日曆：缺資料不代表休市，留給回補
+        print(f"[daily] failures by reason: {dict(failures)}; calendar refresh skipped")
+    else:
+        refresh_calendar(today)
     print("done.")
 
 if __name__ == "__main__":
@@ -2,7 +2,8 @@
 set -euo pipefail
 
 TZ="${TZ:-Asia/Taipei}"
-DAILY_CRON="${DAILY_CRON:-5 17 * * 1-5}"
+# 每天都排；非交易日由腳本依交易日曆略過（補班的週六也會抓）
+DAILY_CRON="${DAILY_CRON:-5 17 * * *}"
 LOOKBACK="${BACKFILL_LOOKBACK_DAYS:-7}"
 API_BASE_FOR_ETL="${API_BASE_FOR_ETL:-http://api:8000}"
 export TZ
@@ -19,6 +20,8 @@ touch "$LOG_DIR/cron_backfill.log" "$LOG_DIR/cron_fetch.log"
 
 # 2) 用 API 修表
 curl -fsS -X POST "${API_BASE_FOR_ETL}/api/admin/ensure_schema"
+# 3) 由既有 daily_price 學習假日表之外的開市日（補班週六）；休市日只來自內附假日表
+curl -fsS -X POST "${API_BASE_FOR_ETL}/api/admin/calendar/refresh" || echo "[WARN] calendar refresh failed"
 
 echo "[INFO] One-shot backfill on start (LOOKBACK=${LOOKBACK})..."
 set +e
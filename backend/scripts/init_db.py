@@ -3,9 +3,9 @@ import os
 from pathlib import Path
 from sqlalchemy import text
 from app.db import engine
+from app.services import schema
 
 BASE_DIR = Path(__file__).resolve().parents[1]
-schema_path = BASE_DIR / "app" / "sql" / "schema.sql"
 seed_path = BASE_DIR / "app" / "sql" / "seed.sql"
 
 def run_sql_file(path: Path):
@@ -18,8 +18,9 @@ def run_sql_file(path: Path):
             conn.execute(text(stmt))
 
 if __name__ == "__main__":
+    # 建表與 /api/admin/ensure_schema 同一套（app/services/schema.py）
     print(">> Creating schema ...")
-    run_sql_file(schema_path)
+    schema.ensure_schema(engine)
     print(">> Seeding data ...")
     run_sql_file(seed_path)
     print(">> Done.")
@@ -0,0 +1,16 @@
+# path: backend/scripts/partition_daily_price.py
+# 一次性：把既有的一般 daily_price 轉成年度分區表（新環境由 ensure_schema 直接建成分區表，不需要跑）。
+#   python scripts/partition_daily_price.py
+# 整表複製、全程鎖表，請在排程停止（沒有寫入）時執行；之後的年度分區由 ensure_schema 維護。
+import sys
+from pathlib import Path
+
+# 讓 "from app...." 可以 import 到
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.db import engine  # noqa: E402
+from app.services import schema  # noqa: E402
+
+if __name__ == "__main__":
+    n = schema.partition_daily_price(engine)
+    print(f">> moved {n} rows" if n else ">> daily_price is not a plain table (already partitioned or missing)")
+    schema.ensure_schema(engine)
@@ -0,0 +1,81 @@
+# path: backend/tests/test_market_snapshot.py
+# 全市場收盤行情 parser：以本機 fixture（與上游相同的 cp950 CSV）驗證，不連網。
+import asyncio
+import os
+from datetime import date
+import httpx
+from app.etl.fetcher import NETWORK
+from app.etl.parsers.market_snapshot import MarketSnapshotParser, parse_snapshot_csv, _split_lines
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "market_snapshot")
+DAY = date(2025, 1, 2)
+
+def _read(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="cp950", newline="") as f:
+        return f.read()
+
+def test_twse_stock_section_only():
+    snap = parse_snapshot_csv(_read("twse_20250102.csv").splitlines())
+    # 指數區段、備註都不會被當成個股；收盤為 -- 的停牌股略過
+    assert sorted(snap) == ["0050", "2330", "2409"]
+
+def test_twse_values():
+    snap = parse_snapshot_csv(_read("twse_20250102.csv").splitlines())
+    # ="0050" 去掉引號與等號、保留前導 0
+    assert snap["0050"] == {"open": 195.5, "high": 196.8, "low": 194.9, "close": 196.2, "volume": 12345678}
+    # 千分位
+    assert snap["2330"]["close"] == 1075.0
+    assert snap["2330"]["volume"] == 30123456
+    # 單欄 -- → None，其他欄照常
+    assert snap["2409"]["open"] is None
+    assert snap["2409"]["close"] == 14.0
+
+def test_tpex_headers_with_padding():
+    snap = parse_snapshot_csv(_read("tpex_20250102.csv").splitlines())
+    # 表頭「收盤 」「成交股數  」帶空白；---- 的無成交列略過；「共3筆」不是資料列
+    assert sorted(snap) == ["006201", "6488"]
+    assert snap["6488"] == {"open": 455.0, "high": 456.0, "low": 448.0, "close": 450.0, "volume": 1234567}
+
+def test_streamed_chunks_match_whole_file():
+    text = _read("twse_20250102.csv")
+    chunks = [text[i:i + 37] for i in range(0, len(text), 37)]
+    assert parse_snapshot_csv(_split_lines(chunks)) == parse_snapshot_csv(text.splitlines())
+
+def test_header_without_close_is_ignored():
+    lines = ['"證券代號","證券名稱","成交股數"', '"2330","台積電","100"']
+    assert parse_snapshot_csv(lines) == {}
+
+def test_parser_reads_fixture_dir():
+    p = MarketSnapshotParser(fixture_dir=FIXTURE_DIR)
+    snap = p.fetch_snapshot(DAY)
+    # 上市 + 上櫃合併
+    assert sorted(snap) == ["0050", "006201", "2330", "2409", "6488"]
+    assert p.fetch_close("2330", DAY) == 1075.0
+    assert p.fetch_close("9958", DAY) is None
+    assert p.fetch_range("6488", DAY, DAY) == {DAY: snap["6488"]}
+
+def test_parser_fixture_missing_or_holiday():
+    p = MarketSnapshotParser(fixture_dir=FIXTURE_DIR)
+    # 交易日但沒有 fixture 檔 → 空
+    assert p.fetch_snapshot(date(2025, 1, 3)) == {}
+    # 內附假日表的休市日不讀檔
+    assert p.fetch_snapshot(date(2025, 1, 1)) == {}
+
+def test_parser_single_market():
+    p = MarketSnapshotParser(markets=("tpex",), fixture_dir=FIXTURE_DIR)
+    assert sorted(p.fetch_snapshot(DAY)) == ["006201", "6488"]
+
+def test_range_survives_failed_day():
+    p = MarketSnapshotParser(fixture_dir=FIXTURE_DIR)
+    read = p._parse_market
+    def flaky(market, d):
+        if d == date(2025, 1, 3):
+            raise httpx.ConnectTimeout("timeout")
+        return read(market, d)
+    p._parse_market = flaky
+    # 單檔：失敗的日子略過，其他日子照常
+    assert p.fetch_range("2330", DAY, date(2025, 1, 3)) == {DAY: p.fetch_snapshot(DAY)["2330"]}
+    # 多檔：標為 NETWORK 失敗，已抓到的日子仍在 data
+    res = asyncio.run(p.fetch_ranges(["2330", "6488"], DAY, date(2025, 1, 3)))
+    assert not res["2330"].ok and res["2330"].reason == NETWORK
+    assert list(res["6488"].data) == [DAY]
@@ -0,0 +1,39 @@
+# path: backend/tests/test_ta.py
+# 技術指標遇到缺值（daily_price.close 為 NULL → NaN）：只影響涵蓋它的視窗，之後的值照常。
+import math
+import numpy as np
+from app.services import ta
+
+def _series(n=40, gap=10):
+    x = list(np.linspace(100.0, 130.0, n))
+    x[gap] = float("nan")
+    return x
+
+def test_sma_recovers_after_gap():
+    x = _series()
+    out = ta.sma(x, 5)
+    assert out[10:15] == [None] * 5
+    assert out[15] is not None
+    assert math.isclose(out[-1], sum(x[-5:]) / 5)
+
+def test_rsi_and_bollinger_recover_after_gap():
+    x = _series()
+    assert ta.rsi(x, 14)[-1] is not None
+    assert math.isclose(ta.bollinger(x, 20)["mid"][-1], sum(x[-20:]) / 20)
+
+def test_ema_carries_state_over_gap():
+    x = _series()
+    out = ta.ema(x, 12)
+    assert out[10] == out[9]
+    assert out[-1] is not None
+    assert ta.macd(x)["signal"][-1] is not None
+
+def test_ema_2d_matches_1d():
+    x = _series()
+    y = np.array([x, [float("nan")] + x[1:]])
+    np.testing.assert_allclose(ta.ema_array(y, 12)[0], ta.ema_array(np.array(x), 12))
+    assert np.isnan(ta.ema_array(y, 12)[1][0])
+
+def test_no_gap_unchanged():
+    assert ta.sma([1, 2, 3, 4, 5], 2) == [None, 1.5, 2.5, 3.5, 4.5]
+    assert ta.ema([1, 2, 3], 2)[0] == 1.0
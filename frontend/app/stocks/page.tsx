@@ -1,7 +1,12 @@
 // app/stocks/page.tsx  — Server Component
 import LineChart from '@/components/LineChart';
+import TickerSearch from '@/components/TickerSearch';
 
 type SP = { [k: string]: string | string[] | undefined };
+// /series?format=columnar：dates 為 epoch-day（1970-01-01 起算的天數），close 與 dates 等長
+// max_points：伺服端 LTTB 降採樣，點數不超過圖寬（像素）
+const CHART_WIDTH = 900;
+type SeriesColumns = { ticker: string; dates: number[]; close: (number | null)[] };
 type PriceRow = {
   trade_date: string;
   open: number | null;
@@ -24,21 +29,27 @@ export default async function Page({
   const base =
     process.env.NEXT_PUBLIC_API_BASE?.replace(/\/$/, '') || 'http://localhost:8000';
 
-  // 抓公司清單 + 區間序列（都在伺服端取，避免 hydration 差異）
-  const [companies, series]: [any[], PriceRow[]] = await Promise.all([
-    fetch(`${base}/api/admin/companies?limit=20000`, { cache: 'no-store' }).then((r) =>
-      r.json(),
-    ),
-    fetch(
-      `${base}/api/stocks/${encodeURIComponent(
-        ticker,
-      )}/series?from=${from}&to=${to}`,
-      { cache: 'no-store' },
-    ).then((r) => r.json()),
-  ]);
+  // 區間序列在伺服端取（公司搜尋改由 TickerSearch 打 /api/search，不再整份清單下載）
+  const cols: SeriesColumns = await fetch(
+    `${base}/api/stocks/${encodeURIComponent(
+      ticker,
+    )}/series?from=${from}&to=${to}&format=columnar&max_points=${CHART_WIDTH}`,
+    // 後端帶 ETag + max-age=60；交給 Next fetch cache，過期後以 If-None-Match 重新驗證
+    { next: { revalidate: 60 } },
+  ).then((r) => r.json());
+
+  // 平行陣列轉回列（只有收盤價；OHLV 欄位留空）
+  const series: PriceRow[] = (cols?.dates ?? []).map((d, i) => ({
+    trade_date: new Date(d * 864e5).toISOString().slice(0, 10),
+    open: null,
+    high: null,
+    low: null,
+    close: cols.close[i],
+    volume: null,
+  }));
 
   // 做一些展示用的衍生資料
-  const valid = (series || []).filter((d) => Number.isFinite(d.close as any));
+  const valid = series.filter((d) => Number.isFinite(d.close as any));
   const latest = valid.at(-1);
   const first = valid.at(0);
   const retPct =
@@ -51,15 +62,7 @@ export default async function Page({
     <main style={{ padding: 24 }}>
       {/* 查詢表單 */}
       <form method="get" style={{ display: 'flex', gap: 8, alignItems: 'center' }}>
-        <input list="tickers" name="ticker" defaultValue={ticker} placeholder="Ticker" />
-        <datalist id="tickers">
-          {Array.isArray(companies) &&
-            companies.map((c: any) => (
-              <option key={c.ticker} value={c.ticker}>
-                {c.name || c.ticker}
-              </option>
-            ))}
-        </datalist>
+        <TickerSearch name="ticker" defaultValue={ticker} />
 
         <input type="date" name="from" defaultValue={from} />
         <input type="date" name="to" defaultValue={to} />
@@ -94,7 +97,7 @@ export default async function Page({
       <section style={{ marginTop: 16 }}>
         <LineChart
           data={chartData.map((d) => ({ date: d.date, value: d.value }))}
-          width={900}
+          width={CHART_WIDTH}
           height={300}
         />
       </section>
@@ -1,10 +1,10 @@
 'use client';
 
-import { useEffect, useMemo, useState } from 'react';
+import { useMemo, useState } from 'react';
+import TickerSearch from '@/components/TickerSearch';
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE ?? 'http://localhost:8000';
 
-type Company = { ticker: string; name?: string | null; sector?: string | null; };
 type SeriesItem = { date: string; close: number };
 type Indicators = {
   dates: string[];
@@ -15,7 +15,6 @@ type Indicators = {
 };
 
 export default function TAPlayground() {
-  const [companies, setCompanies] = useState<Company[]>([]);
   const [ticker, setTicker] = useState('2330');
   const [from, setFrom] = useState<string>(new Date(Date.now() - 90*864e5).toISOString().slice(0,10));
   const [to, setTo] = useState<string>(new Date().toISOString().slice(0,10));
@@ -31,18 +30,6 @@ export default function TAPlayground() {
   const [loading, setLoading] = useState<string | null>(null);
   const [err, setErr] = useState<string | null>(null);
 
-  useEffect(() => {
-    (async () => {
-      try {
-        const r = await fetch(`${API_BASE}/api/admin/companies?limit=5000`);
-        if (!r.ok) throw new Error(`companies ${r.status}`);
-        setCompanies(await r.json());
-      } catch (e:any) {
-        console.warn('load companies failed', e);
-      }
-    })();
-  }, []);
-
   async function runSeries() {
     setLoading('series'); setErr(null);
     try {
@@ -93,12 +80,7 @@ export default function TAPlayground() {
       <div className="grid gap-4 sm:grid-cols-3">
         <label className="flex flex-col gap-1">
           <span>Ticker</span>
-          <input list="tickers" className="border rounded p-2" value={ticker} onChange={e=>setTicker(e.target.value.trim())}/>
-          <datalist id="tickers">
-            {companies.map(c => (
-              <option key={c.ticker} value={c.ticker}>{c.ticker} {c.name ? `- ${c.name}` : ''}</option>
-            ))}
-          </datalist>
+          <TickerSearch className="border rounded p-2" defaultValue={ticker} onChange={setTicker}/>
         </label>
         <label className="flex flex-col gap-1">
           <span>From</span>
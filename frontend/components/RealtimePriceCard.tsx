@@ -4,7 +4,7 @@ import { useEffect, useState } from 'react';
 
 type PriceData = {
   price: number;
-  ts: string;
+  trade_date: string;
 };
 
 export default function RealtimePriceCard({ ticker }: { ticker: string }) {
@@ -12,38 +12,27 @@ export default function RealtimePriceCard({ ticker }: { ticker: string }) {
   const [err, setErr] = useState<string | null>(null);
 
   useEffect(() => {
-    let mounted = true;
     // 1) 優先吃你 .env.local 的
     // 2) 沒有的話就直接打後端的預設
     const base =
       process.env.NEXT_PUBLIC_API_BASE ||
       'http://localhost:8000';
 
-    async function load() {
-      try {
-        const r = await fetch(`${base}/api/stocks/${ticker}/price`, {
-          cache: 'no-store',
-        }); // <-- 這次一定會是 http://localhost:8000/... 不是 /api/...
-        if (!r.ok) throw new Error(`price fetch failed: ${r.status}`);
-        const j = await r.json();
-        if (mounted) {
-          setData({ price: j.price, ts: j.ts });
-          setErr(null);
-        }
-      } catch (e: any) {
-        console.error(e);
-        if (mounted) {
-          setErr(e?.message ?? 'fetch error');
-        }
-      }
-    }
-
-    load();
-    const id = setInterval(load, 5000);
-    return () => {
-      mounted = false;
-      clearInterval(id);
+    // 後端推播（SSE）：連上先收到目前值，之後每次入庫才推一筆，不再每 5 秒輪詢；斷線由 EventSource 自動重連
+    const es = new EventSource(`${base}/api/stocks/${encodeURIComponent(ticker)}/price/stream`);
+    es.addEventListener('price', (ev) => {
+      const j = JSON.parse((ev as MessageEvent).data);
+      setData({ price: j.price, trade_date: j.trade_date });
+      setErr(null);
+    });
+    es.addEventListener('deleted', () => {
+      es.close();
+      setErr('ticker deleted');
+    });
+    es.onerror = () => {
+      setErr(es.readyState === EventSource.CLOSED ? 'stream closed' : 'reconnecting…');
     };
+    return () => es.close();
   }, [ticker]);
 
   return (
@@ -52,7 +41,7 @@ export default function RealtimePriceCard({ ticker }: { ticker: string }) {
       {err && <p style={{ color: 'tomato' }}>{err}</p>}
       {data ? (
         <p>
-          {data.price} @ {data.ts}
+          {data.price} @ {data.trade_date}
         </p>
       ) : (
         <p>Loading…</p>
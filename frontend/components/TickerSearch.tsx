@@ -0,0 +1,74 @@
+// components/TickerSearch.tsx
+'use client';
+
+import { useEffect, useId, useState } from 'react';
+
+// 公司 typeahead：輸入時（debounce）打 /api/search（後端記憶體索引；代號前綴 / 名稱 / 拼音 / 注音）
+type Hit = { ticker: string; name?: string | null };
+
+const API_BASE = process.env.NEXT_PUBLIC_API_BASE?.replace(/\/$/, '') || 'http://localhost:8000';
+
+export default function TickerSearch({
+  name,
+  defaultValue = '',
+  onChange,
+  className,
+  placeholder = 'Ticker / 名稱 / 拼音',
+}: {
+  name?: string;
+  defaultValue?: string;
+  onChange?: (ticker: string) => void;
+  className?: string;
+  placeholder?: string;
+}) {
+  const listId = useId();
+  const [q, setQ] = useState(defaultValue);
+  const [hits, setHits] = useState<Hit[]>([]);
+
+  useEffect(() => {
+    const term = q.trim();
+    if (!term) {
+      setHits([]);
+      return;
+    }
+    const ctrl = new AbortController();
+    const t = setTimeout(async () => {
+      try {
+        const r = await fetch(`${API_BASE}/api/search?q=${encodeURIComponent(term)}&limit=10`, {
+          signal: ctrl.signal,
+        });
+        if (r.ok) setHits(await r.json());
+      } catch {
+        // 取消或網路錯誤：保留上一次的建議
+      }
+    }, 150);
+    return () => {
+      clearTimeout(t);
+      ctrl.abort();
+    };
+  }, [q]);
+
+  return (
+    <>
+      <input
+        list={listId}
+        name={name}
+        value={q}
+        className={className}
+        placeholder={placeholder}
+        onChange={(e) => {
+          const v = e.target.value.trim();
+          setQ(v);
+          onChange?.(v);
+        }}
+      />
+      <datalist id={listId}>
+        {hits.map((c) => (
+          <option key={c.ticker} value={c.ticker}>
+            {c.ticker} {c.name ? `- ${c.name}` : ''}
+          </option>
+        ))}
+      </datalist>
+    </>
+  );
+}